@@ -0,0 +1,258 @@
+"""
+Teste de carga ponta a ponta da API com o provedor LLM local (LLM_PROVIDER=fake).
+
+Sobe a aplicação no próprio processo (httpx.ASGITransport, com o lifespan) e, para cada nível
+de `--concorrencia`, dispara `--requisicoes` chamadas por cenário: /v1/chat, /v1/gerar (um
+projeto novo por requisição) e /v1/conversas (listagem + detalhe). Mede p50/p95/p99,
+requisições/s, erros e RSS do processo e grava tudo em benchmarks/resultados/ como JSON;
+`--comparar` mostra a variação em relação a um resultado anterior.
+
+Os limites por cliente da admissão ficam desligados (todas as requisições vêm do mesmo
+"cliente"); latência, tamanho e falhas do provedor fake vêm das variáveis LLM_FAKE_*.
+
+Uso: PYTHONPATH=src python benchmarks/bench_carga_api.py --concorrencia 1 8 32 --requisicoes 200
+     PYTHONPATH=src python benchmarks/bench_carga_api.py --comparar benchmarks/resultados/<x>.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+CENARIOS = ("chat", "gerar", "conversas")
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+
+
+def percentil(amostras: list[float], fracao: float) -> float:
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    return ordenadas[min(len(ordenadas) - 1, int(fracao * len(ordenadas)))]
+
+
+def rss_mb() -> float:
+    try:
+        paginas = int(Path("/proc/self/statm").read_text().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "sem-git"
+
+
+async def disparar(
+    requisicao: Callable[[int], Awaitable[httpx.Response]], total: int, concorrencia: int
+) -> dict:
+    latencias: list[float] = []
+    erros: dict[str, int] = {}
+    proximo = iter(range(total))
+
+    async def trabalhador() -> None:
+        for indice in proximo:
+            inicio = time.perf_counter()
+            try:
+                resposta = await requisicao(indice)
+                status = str(resposta.status_code) if resposta.status_code >= 400 else None
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencias.append(time.perf_counter() - inicio)
+            if status is not None:
+                erros[status] = erros.get(status, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    return {
+        "requisicoes": total,
+        "concorrencia": concorrencia,
+        "duracao_s": round(duracao, 3),
+        "req_por_s": round(total / duracao, 2) if duracao else 0.0,
+        "p50_ms": round(percentil(latencias, 0.50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 0.95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 0.99) * 1000, 2),
+        "erros": erros,
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+async def executar(args: argparse.Namespace, saida: Path) -> list[dict]:
+    from loguru import logger
+
+    from app.main import app
+
+    logger.remove()  # um log JSON por requisição distorceria as medidas
+    rodada = f"{os.getpid()}-{int(time.time())}"
+    resultados: list[dict] = []
+
+    async def chat(indice: int) -> httpx.Response:
+        return await cliente.post(
+            "/v1/chat",
+            json={"mensagens": [{"conteudo": f"Landing page {rodada} número {indice}"}]},
+        )
+
+    async def gerar(indice: int) -> httpx.Response:
+        return await cliente.post(
+            "/v1/gerar",
+            json={
+                "objetivo": f"API de tarefas {rodada} número {indice}",
+                "path_saida": str(saida / f"projeto_{indice}"),
+                "overwrite": True,
+                "paralelo": args.paralelo,
+            },
+        )
+
+    ids: list[str] = []
+
+    async def conversas(indice: int) -> httpx.Response:
+        if indice % 2 == 0 or not ids:
+            return await cliente.get("/v1/conversas", params={"limite": 50})
+        return await cliente.get(f"/v1/conversas/{ids[indice % len(ids)]}")
+
+    funcoes = {"chat": chat, "gerar": gerar, "conversas": conversas}
+    transporte = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transporte, base_url="http://bench", timeout=None
+        ) as cliente:
+            if "conversas" in args.cenarios:
+                await disparar(chat, args.conversas_iniciais, min(8, args.conversas_iniciais))
+                lista = await cliente.get("/v1/conversas", params={"limite": 50})
+                ids.extend(item["id"] for item in lista.json())
+            for concorrencia in args.concorrencia:
+                for cenario in args.cenarios:
+                    medida = await disparar(funcoes[cenario], args.requisicoes, concorrencia)
+                    resultados.append({"cenario": cenario, **medida})
+                    print(formatar(resultados[-1]), flush=True)
+    return resultados
+
+
+def formatar(medida: dict, anterior: dict | None = None, comparando: bool = False) -> str:
+    erros = sum(medida["erros"].values())
+    linha = (
+        f"{medida['cenario']:<10} {medida['concorrencia']:>5} {medida['req_por_s']:>9.1f} "
+        f"{medida['p50_ms']:>9.1f} {medida['p95_ms']:>9.1f} {medida['p99_ms']:>9.1f} "
+        f"{erros:>6} {medida['rss_mb']:>8.1f}"
+    )
+    if anterior:
+        variacoes = []
+        for campo in ("req_por_s", "p50_ms", "p95_ms", "p99_ms"):
+            base = anterior[campo]
+            variacoes.append(f"{(medida[campo] - base) / base * 100:+.1f}%" if base else "n/d")
+        linha += "   " + " ".join(f"{v:>8}" for v in variacoes)
+    elif anterior is None and comparando:
+        linha += "   (sem medida anterior)"
+    return linha
+
+
+def cabecalho(comparando: bool = False) -> str:
+    linha = (
+        f"{'cenario':<10} {'conc.':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'erros':>6} {'RSS MB':>8}"
+    )
+    if comparando:
+        linha += "   " + " ".join(f"{c:>8}" for c in ("Δreq/s", "Δp50", "Δp95", "Δp99"))
+    return linha
+
+
+def comparar(atual: dict, anterior: dict) -> None:
+    base = {(m["cenario"], m["concorrencia"]): m for m in anterior["medidas"]}
+    print(f"\ncomparado com {anterior['commit']} ({anterior['inicio']}):")
+    print(cabecalho(comparando=True))
+    for medida in atual["medidas"]:
+        chave = (medida["cenario"], medida["concorrencia"])
+        print(formatar(medida, base.get(chave), comparando=True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requisicoes", type=int, default=100, help="por cenário e nível")
+    parser.add_argument("--cenarios", nargs="+", choices=CENARIOS, default=list(CENARIOS))
+    parser.add_argument("--paralelo", action="store_true", help="/v1/gerar com paralelo=true")
+    parser.add_argument("--conversas-iniciais", type=int, default=20)
+    parser.add_argument("--latencia-ms", type=float, help="sobrepõe LLM_FAKE_LATENCIA_MS")
+    parser.add_argument("--saida", type=Path, help="arquivo JSON (padrão: benchmarks/resultados)")
+    parser.add_argument("--comparar", type=Path, help="resultado anterior para comparar")
+    args = parser.parse_args()
+
+    temporario = Path(tempfile.mkdtemp(prefix="bench_carga_"))
+    os.environ["LLM_PROVIDER"] = "fake"
+    if args.latencia_ms is not None:
+        os.environ["LLM_FAKE_LATENCIA_MS"] = str(args.latencia_ms)
+    os.environ.setdefault("BASE_DIR_CONVERSAS", str(temporario / "conversas"))
+    os.environ.setdefault("BASE_DIR_SAIDA", str(temporario / "saida"))
+    os.environ.setdefault("ADMISSAO_TAXA_CLIENTE", "0")
+    os.environ.setdefault("ADMISSAO_REQUISICOES_CLIENTE", "0")
+
+    inicio = datetime.now(timezone.utc)
+    print(cabecalho())
+    try:
+        medidas = asyncio.run(executar(args, temporario / "projetos"))
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+    from app.core.settings import settings
+
+    resultado = {
+        "commit": commit_atual(),
+        "inicio": inicio.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {
+            "requisicoes": args.requisicoes,
+            "paralelo": args.paralelo,
+            "conversas_backend": settings.conversas_backend,
+            "admissao_max_concorrencia": settings.admissao_max_concorrencia,
+            "llm_fake": {
+                nome.removeprefix("llm_fake_"): valor
+                for nome, valor in settings.model_dump().items()
+                if nome.startswith("llm_fake_")
+            },
+        },
+        "rss_pico_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (1024 * 1024 if sys.platform == "darwin" else 1024),
+            1,
+        ),
+        "medidas": medidas,
+    }
+    destino = args.saida or RESULTADOS_DIR / (
+        f"{inicio.strftime('%Y%m%dT%H%M%SZ')}-{resultado['commit']}.json"
+    )
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nresultado salvo em {destino}")
+
+    if args.comparar:
+        comparar(resultado, json.loads(args.comparar.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
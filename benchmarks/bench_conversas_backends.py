@@ -0,0 +1,91 @@
+"""
+Compara os backends de conversas (arquivos JSON + índice vs SQLite) em volumes crescentes.
+
+Para cada volume popula um diretório temporário e mede: listagem da primeira página,
+página filtrada por prefixo, leitura de uma conversa e um turno novo em conversa existente.
+
+Uso: PYTHONPATH=src python benchmarks/bench_conversas_backends.py --conversas 1000 10000 100000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from typing import Callable
+
+from app.schemas.chat import MensagemChat
+from app.services.conversas import ConversasService
+from app.services.conversas_sqlite import ConversasSQLiteService
+
+TEMAS = ["Blog", "Loja", "Dashboard", "Portfólio", "Landing page"]
+
+
+def popular(servico: ConversasService, total: int, mensagens_por_conversa: int) -> list[str]:
+    ids: list[str] = []
+    for indice in range(total):
+        historico = [
+            MensagemChat(conteudo=f"pedido {indice}-{posicao} " + "detalhe " * 20)
+            for posicao in range(mensagens_por_conversa)
+        ]
+        resumo = servico.registrar(
+            historico, f"resposta {indice}", contexto=f"{TEMAS[indice % len(TEMAS)]} {indice}"
+        )
+        ids.append(resumo.id)
+    return ids
+
+
+def cronometrar(funcao: Callable[[], object], repeticoes: int) -> float:
+    amostras: list[float] = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        amostras.append(time.perf_counter() - inicio)
+    amostras.sort()
+    return amostras[len(amostras) // 2] * 1000
+
+
+def medir(nome: str, servico: ConversasService, total: int, args: argparse.Namespace) -> None:
+    inicio = time.perf_counter()
+    ids = popular(servico, total, args.mensagens)
+    populacao = time.perf_counter() - inicio
+    alvo = random.choice(ids)
+    detalhe = servico.obter(alvo)
+    historico = [MensagemChat(papel=m.papel, conteudo=m.conteudo) for m in detalhe.mensagens]
+
+    def turno() -> None:
+        historico.append(MensagemChat(conteudo="novo ajuste"))
+        servico.registrar(historico, "nova resposta", conversa_id=alvo)
+        historico.append(MensagemChat(papel="agente", conteudo="nova resposta"))
+
+    resultados = {
+        "listar (50)": cronometrar(lambda: servico.listar(limite=50), args.repeticoes),
+        "prefixo (50)": cronometrar(
+            lambda: servico.listar(limite=50, prefixo="dash"), args.repeticoes
+        ),
+        "obter": cronometrar(lambda: servico.obter(alvo), args.repeticoes),
+        "turno": cronometrar(turno, args.repeticoes),
+    }
+    colunas = " ".join(f"{valor:>12.2f}" for valor in resultados.values())
+    print(f"{total:>8} {nome:<9} {populacao:>12.1f} {colunas}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversas", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--mensagens", type=int, default=4, help="mensagens por conversa")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'conversas':>8} {'backend':<9} {'popular (s)':>12} {'listar (ms)':>12} "
+        f"{'prefixo (ms)':>12} {'obter (ms)':>12} {'turno (ms)':>12}"
+    )
+    for total in args.conversas:
+        for nome, classe in (("arquivos", ConversasService), ("sqlite", ConversasSQLiteService)):
+            with tempfile.TemporaryDirectory() as base_dir:
+                medir(nome, classe(base_dir), total, args)
+
+
+if __name__ == "__main__":
+    main()
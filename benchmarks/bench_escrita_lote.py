@@ -0,0 +1,81 @@
+"""
+Mede a gravação de projetos gerados com centenas de arquivos.
+
+Compara a escrita antiga (resolve + mkdir + exists + write_text por arquivo, sem atomicidade)
+com FSClient.escrever_lote (temporário + rename atômico, mkdir uma vez por diretório) com
+uma e com várias threads.
+
+Uso: PYTHONPATH=src python benchmarks/bench_escrita_lote.py --arquivos 100 500 2000
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from app.adapters.fs_client import FSClient
+
+
+def escrever_legado(base: Path, itens: list[tuple[str, str]]) -> None:
+    raiz = base.resolve()
+    for rel_path, conteudo in itens:
+        destino = raiz.joinpath(rel_path).resolve()
+        if not destino.is_relative_to(raiz):
+            raise ValueError(rel_path)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        if destino.exists():
+            raise FileExistsError(rel_path)
+        destino.write_text(conteudo, encoding="utf-8")
+
+
+def projeto_sintetico(arquivos: int, tamanho: int) -> list[tuple[str, str]]:
+    linha = "def funcao():\n    return 'conteúdo gerado pelo modelo'\n"
+    corpo = linha * max(1, tamanho // len(linha))
+    return [
+        (f"projeto/src/modulo_{indice % 20}/sub_{indice % 7}/arquivo_{indice}.py", corpo)
+        for indice in range(arquivos)
+    ]
+
+
+def medir(gravar: Callable[[Path], None], repeticoes: int, diretorio: str | None) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        base = Path(tempfile.mkdtemp(prefix="bench_escrita_", dir=diretorio))
+        try:
+            inicio = time.perf_counter()
+            gravar(base)
+            melhor = min(melhor, time.perf_counter() - inicio)
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+    return melhor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--arquivos", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--tamanho", type=int, default=4096, help="bytes por arquivo")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--dir", help="onde gravar (o padrão é o temp do sistema, às vezes tmpfs)")
+    args = parser.parse_args()
+
+    print(f"{'arquivos':>9} {'variante':<22} {'melhor (ms)':>12} {'arquivos/s':>11}")
+    for arquivos in args.arquivos:
+        itens = projeto_sintetico(arquivos, args.tamanho)
+        variantes: dict[str, Callable[[Path], None]] = {
+            "legado (1 a 1)": lambda base: escrever_legado(base, itens),
+            "lote, 1 thread": lambda base: FSClient(str(base)).escrever_lote(itens),
+            f"lote, {args.workers} threads": lambda base: FSClient(str(base)).escrever_lote(
+                itens, workers=args.workers
+            ),
+        }
+        for nome, gravar in variantes.items():
+            tempo = medir(gravar, args.repeticoes, args.dir)
+            print(f"{arquivos:>9} {nome:<22} {tempo * 1000:>12.2f} {arquivos / tempo:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark do extrator de blocos cercados (```caminho ... ```).
+
+Compara a implementação antiga (split + strip + partition sobre a resposta inteira) com o
+ExtratorBlocos de passagem única, tanto com a resposta completa quanto alimentada em trechos.
+
+Uso: PYTHONPATH=src python benchmarks/bench_extrair_blocos.py --mb 1 4 16
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable
+
+from app.utils.blocos import ExtratorBlocos, extrair_blocos
+
+
+def extrair_legado(resposta: str) -> list[tuple[str, str]]:
+    pares: list[tuple[str, str]] = []
+    blocos = resposta.split("```")
+    for indice in range(1, len(blocos), 2):
+        bloco = blocos[indice].strip()
+        if not bloco:
+            continue
+        primeira_linha, sep, restante = bloco.partition("\n")
+        if not sep:
+            continue
+        caminho = primeira_linha.strip().strip("/")
+        conteudo = restante.rstrip()
+        if not caminho or not conteudo:
+            continue
+        pares.append((caminho, conteudo))
+    return pares
+
+
+def extrair_passagem_unica(resposta: str) -> list[tuple[str, str]]:
+    return list(extrair_blocos(resposta))
+
+
+def extrair_em_trechos(resposta: str, tamanho: int = 64) -> list[tuple[str, str]]:
+    extrator = ExtratorBlocos()
+    pares: list[tuple[str, str]] = []
+    for inicio in range(0, len(resposta), tamanho):
+        pares.extend(extrator.alimentar(resposta[inicio : inicio + tamanho]))
+    pares.extend(extrator.finalizar())
+    return pares
+
+
+def resposta_sintetica(megabytes: float, tamanho_arquivo: int = 20_000) -> str:
+    linha = "    console.log('linha de conteúdo gerado pelo modelo');\n"
+    corpo = linha * max(1, tamanho_arquivo // len(linha))
+    partes: list[str] = []
+    total = 0
+    indice = 0
+    while total < megabytes * 1024 * 1024:
+        bloco = f"Arquivo {indice}:\n```src/modulo_{indice}.js\n{corpo}```\n\n"
+        partes.append(bloco)
+        total += len(bloco)
+        indice += 1
+    return "".join(partes)
+
+
+def medir(
+    funcao: Callable[[str], list[tuple[str, str]]], resposta: str, repeticoes: int
+) -> tuple[float, float]:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(resposta)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcao(resposta)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return melhor, pico / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    variantes: dict[str, Callable[[str], list[tuple[str, str]]]] = {
+        "legado (split)": extrair_legado,
+        "passagem única": extrair_passagem_unica,
+        "trechos de 64B": extrair_em_trechos,
+    }
+    print(f"{'MB':>6} {'variante':<16} {'melhor (ms)':>12} {'pico mem (MB)':>14}")
+    for megabytes in args.mb:
+        resposta = resposta_sintetica(megabytes)
+        esperado = extrair_legado(resposta)
+        for nome, funcao in variantes.items():
+            assert funcao(resposta) == esperado, nome
+            tempo, pico = medir(funcao, resposta, args.repeticoes)
+            print(f"{megabytes:>6.1f} {nome:<16} {tempo * 1000:>12.2f} {pico:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
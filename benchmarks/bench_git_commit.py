@@ -0,0 +1,96 @@
+"""
+Mede o commit de regerações sobre um projeto grande já versionado.
+
+Compara o GitClient antigo (Repo novo a cada commit + `git add --all` + `is_dirty`) com o
+atual (Repo em cache + só os caminhos alterados no índice) e com vários commits agrupados
+em um só. Em cada rodada, `--alterados` arquivos mudam de conteúdo.
+
+Uso: PYTHONPATH=src python benchmarks/bench_git_commit.py --arquivos 200 2000
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from git import Repo
+
+from app.adapters.git_client import GitClient
+
+
+def commit_legado(repo_dir: Path, mensagem: str) -> str:
+    repo = Repo(repo_dir)
+    repo.git.add(all=True)
+    if repo.is_dirty(index=True, working_tree=False, untracked_files=False):
+        return repo.index.commit(mensagem).hexsha
+    return repo.head.commit.hexsha
+
+
+def criar_projeto(arquivos: int) -> Path:
+    base = Path(tempfile.mkdtemp(prefix="bench_git_"))
+    for indice in range(arquivos):
+        destino = base / f"src/modulo_{indice % 20}/arquivo_{indice}.py"
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_text(f"VALOR = {indice}\n" * 40, encoding="utf-8")
+    GitClient(str(base)).commit_tudo("inicial")
+    return base
+
+
+def alterar(base: Path, rodada: int, alterados: int, arquivos: int) -> list[str]:
+    caminhos: list[str] = []
+    for deslocamento in range(alterados):
+        indice = (rodada * alterados + deslocamento) % arquivos
+        destino = base / f"src/modulo_{indice % 20}/arquivo_{indice}.py"
+        destino.write_text(f"VALOR = {indice} # rodada {rodada}\n" * 40, encoding="utf-8")
+        caminhos.append(str(destino))
+    return caminhos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--arquivos", type=int, nargs="+", default=[200, 2000])
+    parser.add_argument("--alterados", type=int, default=5)
+    parser.add_argument("--rodadas", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'arquivos':>9} {'variante':<26} {'ms por geração':>15}")
+    for arquivos in args.arquivos:
+        base = criar_projeto(arquivos)
+        try:
+            rodada = 0
+            inicio = time.perf_counter()
+            for _ in range(args.rodadas):
+                alterar(base, rodada, args.alterados, arquivos)
+                commit_legado(base, f"rodada {rodada}")
+                rodada += 1
+            legado = (time.perf_counter() - inicio) / args.rodadas
+
+            inicio = time.perf_counter()
+            for _ in range(args.rodadas):
+                caminhos = alterar(base, rodada, args.alterados, arquivos)
+                GitClient(str(base)).commit_tudo(f"rodada {rodada}", caminhos)
+                rodada += 1
+            explicito = (time.perf_counter() - inicio) / args.rodadas
+
+            inicio = time.perf_counter()
+            pendentes: list[str] = []
+            for _ in range(args.rodadas):
+                pendentes += alterar(base, rodada, args.alterados, arquivos)
+                rodada += 1
+            GitClient(str(base)).commit_tudo("agrupado", pendentes)
+            agrupado = (time.perf_counter() - inicio) / args.rodadas
+
+            for nome, tempo in (
+                ("legado (add --all)", legado),
+                ("caminhos + Repo em cache", explicito),
+                (f"{args.rodadas} gerações, 1 commit", agrupado),
+            ):
+                print(f"{arquivos:>9} {nome:<26} {tempo * 1000:>15.2f}")
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Compara a stdlib `json` com o orjson nos caminhos quentes de conversas grandes.
+
+Para cada tamanho de conversa (em mensagens) mede: leitura do <id>.json, gravação com
+indentação, parse do payload do LLM no /v1/chat (JSON com arquivos embutidos) e a
+serialização do ConversaDetalhe devolvido por GET /v1/conversas/{id} (encoder padrão do
+JSONResponse, RespostaJSONRapida e o caminho direto do Pydantic usado com response_model).
+
+Uso: PYTHONPATH=src python benchmarks/bench_json_conversas.py --mensagens 100 1000 5000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.main import RespostaJSONRapida
+from app.schemas.chat import MensagemChat
+from app.services.conversas import ConversasService
+
+
+def cronometrar(funcao: Callable[[], object], repeticoes: int) -> float:
+    # como o timeit: sem o coletor de lixo, que pesa em quem roda logo depois de outra medida
+    funcao()
+    gc.collect()
+    gc.disable()
+    try:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        return (time.perf_counter() - inicio) / repeticoes
+    finally:
+        gc.enable()
+
+
+def gravar_legado(caminho: Path, dados: dict) -> None:
+    with caminho.open("w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+
+
+def ler_legado(caminho: Path) -> dict:
+    with caminho.open("r", encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def payload_llm(tamanho: int) -> str:
+    conteudo = "<div class=\"cartão\">conteúdo gerado — ação</div>\n" * (tamanho // 48)
+    return json.dumps(
+        {
+            "mensagem": "Projeto criado.",
+            "slug_projeto": "projeto",
+            "arquivos": [
+                {"caminho": caminho, "conteudo": conteudo}
+                for caminho in ("index.html", "assets/styles.css", "assets/script.js")
+            ],
+        },
+        ensure_ascii=False,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mensagens", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'mensagens':>9} {'operação':<28} {'json ms':>10} {'orjson ms':>10} {'ganho':>7}")
+    for total in args.mensagens:
+        base = Path(tempfile.mkdtemp(prefix="bench_json_"))
+        try:
+            servico = ConversasService(str(base))
+            historico = [
+                MensagemChat(conteudo=f"mensagem {indice} " + "texto com acentuação " * 20)
+                for indice in range(total)
+            ]
+            resumo = servico.registrar(historico, "resposta final", contexto="Conversa grande")
+            caminho = Path(resumo.arquivo)
+            dados = servico._ler_dados(caminho)
+            detalhe = servico.obter(resumo.id)
+            payload = payload_llm(total * 100)
+            rep = args.repeticoes
+            resposta_padrao = cronometrar(lambda: JSONResponse(jsonable_encoder(detalhe)), rep)
+
+            linhas = [
+                (
+                    "ler <id>.json",
+                    cronometrar(lambda: ler_legado(caminho), rep),
+                    cronometrar(lambda: servico._ler_dados(caminho), rep),
+                ),
+                (
+                    "gravar <id>.json (indent=2)",
+                    cronometrar(lambda: gravar_legado(caminho, dados), rep),
+                    cronometrar(lambda: servico._gravar_dados(caminho, dados), rep),
+                ),
+                (
+                    f"payload do LLM ({len(payload) // 1024} KiB)",
+                    cronometrar(lambda: json.loads(payload), rep),
+                    cronometrar(lambda: orjson.loads(payload), rep),
+                ),
+                (
+                    "ConversaDetalhe: orjson",
+                    resposta_padrao,
+                    cronometrar(
+                        lambda: RespostaJSONRapida(detalhe.model_dump(mode="json")), rep
+                    ),
+                ),
+                (
+                    "ConversaDetalhe: Pydantic",
+                    resposta_padrao,
+                    cronometrar(lambda: detalhe.model_dump_json(), rep),
+                ),
+            ]
+            for nome, antes, depois in linhas:
+                print(
+                    f"{total:>9} {nome:<28} {antes * 1000:>10.2f} {depois * 1000:>10.2f} "
+                    f"{antes / depois:>6.1f}x"
+                )
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
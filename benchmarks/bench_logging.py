@@ -0,0 +1,120 @@
+"""
+Mede o custo dos logs por requisição.
+
+Cada requisição passa pelo MiddlewareContextoLog até um app ASGI mínimo que emite o que uma
+chamada ao /v1/chat costuma emitir: a linha do httpx (logging padrão, via InterceptHandler)
+e o DEBUG de uso do LLM (loguru), além da linha de acesso. Compara a configuração antiga
+(`serialize=True` + `enqueue=True`, nível consultado a cada registro, acesso do uvicorn)
+com os formatos atuais, com e sem amostragem. "chamador" é o tempo gasto na requisição;
+"total" inclui esvaziar a fila da thread de escrita. O destino é /dev/null.
+
+Uso: PYTHONPATH=src python benchmarks/bench_logging.py --requisicoes 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable
+
+from loguru import logger
+
+from app.core import logging_config
+from app.core.logging_config import MiddlewareContextoLog, configurar_logging
+from app.core.settings import Settings
+
+httpx_logger = logging.getLogger("httpx")
+acesso_uvicorn = logging.getLogger("uvicorn.access")
+
+
+class InterceptHandlerLegado(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level: Any = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        logger.log(level, record.getMessage())
+
+
+def configurar_legado(destino: Any) -> None:
+    logger.remove()
+    logger.configure(patcher=logging_config._contexto_log)
+    logger.add(destino, serialize=True, enqueue=True, backtrace=False, diagnose=False)
+    logging.basicConfig(handlers=[InterceptHandlerLegado()], level=logging.INFO, force=True)
+    for nome in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        registro = logging.getLogger(nome)
+        registro.handlers, registro.propagate, registro.disabled = [], True, False
+    logging_config._log_acesso = False
+
+
+async def app_chat(scope: dict, receive: Callable, send: Callable) -> None:
+    httpx_logger.info(
+        'HTTP Request: POST https://api.openai.com/v1/chat/completions "HTTP/1.1 200 OK"'
+    )
+    logger.debug("Uso do LLM: prompt=607 (cache=0) resposta=1079")
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def requisicoes(total: int, legado: bool) -> float:
+    app = MiddlewareContextoLog(app_chat)
+    escopo = {"type": "http", "method": "POST", "path": "/v1/chat", "headers": []}
+
+    async def receber() -> dict:
+        return {"type": "http.request", "body": b""}
+
+    async def enviar(_: dict) -> None:
+        return None
+
+    inicio = time.perf_counter()
+    for _ in range(total):
+        await app(escopo, receber, enviar)
+        if legado:
+            acesso_uvicorn.info('127.0.0.1:5000 - "POST /v1/chat HTTP/1.1" 200')
+    return time.perf_counter() - inicio
+
+
+def medir(nome: str, total: int, configurar: Callable[[Any], None], legado: bool = False) -> None:
+    with open(os.devnull, "w", encoding="utf-8") as destino:
+        configurar(destino)
+        chamador = asyncio.run(requisicoes(total, legado))
+        inicio = time.perf_counter()
+        logger.remove()  # espera a thread de escrita esvaziar a fila
+        drenagem = time.perf_counter() - inicio
+    print(
+        f"{nome:<34} {chamador / total * 1e6:>12.1f} {(chamador + drenagem) / total * 1e6:>12.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requisicoes", type=int, default=20000)
+    args = parser.parse_args()
+
+    def atual(**campos: Any) -> Callable[[Any], None]:
+        return lambda destino: configurar_logging(Settings(**campos), destino)
+
+    def sem_logs(_: Any) -> None:
+        logger.remove()
+        logging.basicConfig(handlers=[logging.NullHandler()], level=logging.INFO, force=True)
+        logging_config._log_acesso = False
+
+    amostragem = {
+        "log_amostragem_acesso": 0.1,
+        "log_amostragem": "httpx=0.1,__main__=0.1",
+    }
+    print(f"{'variante':<34} {'µs chamador':>12} {'µs total':>12}   (por requisição)")
+    medir("sem logs", args.requisicoes, sem_logs)
+    medir("legado (serialize + enqueue)", args.requisicoes, configurar_legado, legado=True)
+    medir("json orjson síncrono", args.requisicoes, atual(log_assincrono=False))
+    medir("json orjson assíncrono", args.requisicoes, atual())
+    medir("json assíncrono + amostragem 10%", args.requisicoes, atual(**amostragem))
+    medir("texto assíncrono", args.requisicoes, atual(log_formato="texto"))
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
 from __future__ import annotations
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Sequence
+from app.adapters.manifesto import ManifestoProjeto, hash_conteudo
 from app.core.errors import ErroEscritaArquivo
+from app.core.metricas import bytes_escritos
+from app.core.rastreamento import rastreador
 
 
 class FSClient:
@@ -13,12 +22,258 @@ class FSClient:
             raise ErroEscritaArquivo("Caminho inválido (path traversal detectado).")
         return destino
 
+    def lote(
+        self, overwrite: bool = False, manifesto: ManifestoProjeto | None = None
+    ) -> LoteEscrita:
+        return LoteEscrita(self, overwrite, manifesto)
+
     def escrever(self, rel_path: str, conteudo: str, overwrite: bool = False) -> str:
-        destino = self.caminho(rel_path)
-        destino.parent.mkdir(parents=True, exist_ok=True)
+        return self.escrever_lote([(rel_path, conteudo)], overwrite).escritos[0]
+
+    def escrever_lote(
+        self,
+        itens: Sequence[tuple[str, str]],
+        overwrite: bool = False,
+        ao_escrever: Callable[[str], None] | None = None,
+        workers: int = 1,
+        manifesto: ManifestoProjeto | None = None,
+    ) -> LoteEscrita:
+        """
+        Grava vários arquivos de uma vez: prepara todos (em até `workers` threads) e só então
+        os coloca no lugar. Se qualquer arquivo falhar, nenhum arquivo novo fica no destino.
+        Retorna o lote confirmado, com os caminhos escritos e o relatório de alterações.
+        """
+        lote = self.lote(overwrite, manifesto)
+        atributos = {"fs.arquivos": len(itens), "fs.workers": workers}
+        with rastreador.span("fs.escrever_lote", **atributos):
+            try:
+                if workers > 1 and len(itens) > 1:
+                    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fs") as pool:
+                        destinos = list(pool.map(lambda item: lote.preparar(*item), itens))
+                else:
+                    destinos = [lote.preparar(rel_path, conteudo) for rel_path, conteudo in itens]
+                lote.confirmar(ao_escrever, ordem=destinos)
+                return lote
+            except BaseException:
+                lote.descartar()
+                raise
+
+
+class LoteEscrita:
+    """
+    Escrita em duas fases de um conjunto de arquivos sob `FSClient.base`.
+
+    `preparar` valida o caminho, cria cada diretório pai uma única vez e grava o conteúdo
+    num arquivo temporário ao lado do destino, com fsync; `confirmar` move cada temporário
+    para o lugar com rename atômico (ou hard link, quando não pode sobrescrever, para não
+    apagar um arquivo criado nesse meio-tempo) e sincroniza os diretórios. Antes de
+    sobrescrever, a versão anterior é guardada num `.bak` ao lado (hard link, sem cópia).
+
+    `descartar` desfaz o lote, inclusive um `confirmar` que falhou no meio: apaga os
+    temporários e os arquivos novos, restaura os sobrescritos a partir do `.bak` e remove os
+    diretórios criados. Cada arquivo é trocado atomicamente, mas o lote não: se o processo
+    morrer durante `confirmar`, parte dos arquivos já é a nova versão e os `.bak` ficam no
+    disco.
 
-        if destino.exists() and not overwrite:
+    Com um `manifesto`, arquivos cujo conteúdo não mudou não são regravados; depois de
+    `confirmar`, `adicionados`, `modificados` e `inalterados` dizem o que aconteceu com cada um.
+    """
+
+    def __init__(
+        self, fs: FSClient, overwrite: bool = False, manifesto: ManifestoProjeto | None = None
+    ) -> None:
+        self.fs = fs
+        self.overwrite = overwrite
+        self.manifesto = manifesto
+        self.escritos: list[str] = []
+        self.adicionados: list[str] = []
+        self.modificados: list[str] = []
+        self.inalterados: list[str] = []
+        self.manifesto_gravado = False
+        self._lock = threading.Lock()
+        self._pais: dict[Path, Path] = {}
+        self._diretorios_criados: list[Path] = []
+        self._preparados: dict[Path, tuple[str, Path, str | None, bool]] = {}
+        self._sem_mudanca: dict[Path, str] = {}
+        self._confirmados: list[Path] = []
+        self._backups: dict[Path, Path] = {}
+        self._ordem: dict[Path, None] = {}
+
+    def preparar(self, rel_path: str, conteudo: str) -> Path:
+        """Grava `conteudo` num temporário (nada, se não mudou); pode rodar em várias threads."""
+        destino = self._destino(rel_path)
+        with self._lock:
+            self._ordem.setdefault(destino)
+        existia = destino.exists()
+        if existia and not self.overwrite:
             raise ErroEscritaArquivo(f"Arquivo já existe: {rel_path}")
+        digest = hash_conteudo(conteudo) if self.manifesto is not None else None
+        if existia and digest is not None and self.manifesto.inalterado(destino, digest):
+            self._descartar_anterior(destino)
+            with self._lock:
+                self._sem_mudanca[destino] = rel_path
+            return destino
+
+        temporario = destino.with_name(f".{destino.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(temporario, "w", encoding="utf-8", newline="") as arquivo:
+            arquivo.write(conteudo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        bytes_escritos.inc(len(conteudo.encode("utf-8")), origem="projeto")
+        self._descartar_anterior(destino)  # o mesmo caminho repetido no lote: vale o último
+        with self._lock:
+            self._preparados[destino] = (rel_path, temporario, digest, existia)
+        return destino
+
+    def confirmar(
+        self,
+        ao_escrever: Callable[[str], None] | None = None,
+        ordem: Sequence[Path] | None = None,
+    ) -> list[str]:
+        """Coloca os arquivos no lugar; `ordem` define a ordem de `escritos` (padrão: preparo)."""
+        with rastreador.span("fs.confirmar_lote") as span:
+            self._confirmar(ordem)
+            span.definir("fs.adicionados", len(self.adicionados))
+            span.definir("fs.modificados", len(self.modificados))
+            span.definir("fs.inalterados", len(self.inalterados))
+        if ao_escrever is not None:
+            for caminho in self.escritos:
+                ao_escrever(caminho)
+        return self.escritos
+
+    def _confirmar(self, ordem: Sequence[Path] | None) -> None:
+        for destino, (rel_path, temporario, digest, existia) in list(self._preparados.items()):
+            if self.overwrite:
+                self._guardar(destino)
+                os.replace(temporario, destino)
+            else:
+                self._vincular(temporario, destino, rel_path)
+            del self._preparados[destino]
+            self._confirmados.append(destino)
+            if self.manifesto is not None and digest is not None:
+                self.manifesto.registrar(destino, digest)
+            (self.modificados if existia else self.adicionados).append(str(destino))
+        self._sincronizar_diretorios()
+        self.inalterados = [str(destino) for destino in self._sem_mudanca]
+        if self.manifesto is not None:
+            self.manifesto_gravado = self.manifesto.salvar()
+        for backup in self._backups.values():
+            backup.unlink(missing_ok=True)
+        self._backups.clear()
+
+        posicao = {destino: indice for indice, destino in enumerate(ordem or self._ordem)}
+        self.escritos = sorted(
+            [*self.adicionados, *self.modificados, *self.inalterados],
+            key=lambda caminho: posicao.get(Path(caminho), len(posicao)),
+        )
+        self._confirmados.clear()
+        self._diretorios_criados.clear()
+        self._sem_mudanca.clear()
+        self._ordem.clear()
+
+    def alterados(self) -> list[str]:
+        """Caminhos do projeto gravados de fato (novos e modificados)."""
+        return [*self.adicionados, *self.modificados]
+
+    def relatorio(self) -> dict[str, list[str]]:
+        return {
+            "adicionados": self.adicionados,
+            "modificados": self.modificados,
+            "inalterados": self.inalterados,
+        }
+
+    def descartar(self) -> None:
+        for _, temporario, _, _ in self._preparados.values():
+            temporario.unlink(missing_ok=True)
+        for destino in reversed(self._confirmados):
+            backup = self._backups.pop(destino, None)
+            if backup is not None:
+                os.replace(backup, destino)
+            else:
+                destino.unlink(missing_ok=True)
+        for backup in self._backups.values():  # guardado, mas o replace não chegou a rodar
+            backup.unlink(missing_ok=True)
+        for diretorio in sorted(self._diretorios_criados, key=lambda d: len(d.parts), reverse=True):
+            try:
+                diretorio.rmdir()
+            except OSError:
+                pass
+        self._preparados.clear()
+        self._sem_mudanca.clear()
+        self._confirmados.clear()
+        self._backups.clear()
+        self._diretorios_criados.clear()
+        self._ordem.clear()
+
+    def _guardar(self, destino: Path) -> None:
+        """Preserva a versão atual de `destino` para `descartar` poder restaurá-la."""
+        backup = destino.with_name(f".{destino.name}.{uuid.uuid4().hex[:8]}.bak")
+        try:
+            os.link(destino, backup)
+        except FileNotFoundError:
+            return  # nada a preservar: o arquivo é novo
+        except OSError:
+            # sistema de arquivos sem hard link
+            try:
+                shutil.copy2(destino, backup)
+            except FileNotFoundError:
+                return
+        self._backups[destino] = backup
+
+    def _sincronizar_diretorios(self) -> None:
+        """fsync dos diretórios alterados, para os renames sobreviverem a uma queda."""
+        for diretorio in {destino.parent for destino in self._confirmados}:
+            try:
+                descritor = os.open(diretorio, os.O_RDONLY)
+            except OSError:
+                return  # ex.: Windows não abre diretórios
+            try:
+                os.fsync(descritor)
+            except OSError:
+                pass
+            finally:
+                os.close(descritor)
+
+    def _descartar_anterior(self, destino: Path) -> None:
+        with self._lock:
+            anterior = self._preparados.pop(destino, None)
+            self._sem_mudanca.pop(destino, None)
+        if anterior is not None:
+            anterior[1].unlink(missing_ok=True)
+
+    def _destino(self, rel_path: str) -> Path:
+        bruto = self.fs.base.joinpath(rel_path)
+        if bruto.name in ("", ".", ".."):
+            raise ErroEscritaArquivo(f"Caminho inválido: {rel_path}")
+        with self._lock:
+            pai = self._pais.get(bruto.parent)
+        if pai is None:
+            pai = bruto.parent.resolve()
+            if not pai.is_relative_to(self.fs.base):
+                raise ErroEscritaArquivo("Caminho inválido (path traversal detectado).")
+            with self._lock:
+                self._criar_diretorio(pai)
+                self._pais[bruto.parent] = pai
+        return pai / bruto.name
+
+    def _criar_diretorio(self, diretorio: Path) -> None:
+        faltando: list[Path] = []
+        atual = diretorio
+        while not atual.exists():
+            faltando.append(atual)
+            atual = atual.parent
+        diretorio.mkdir(parents=True, exist_ok=True)
+        self._diretorios_criados.extend(faltando)
 
-        destino.write_text(conteudo, encoding="utf-8")
-        return str(destino)
+    def _vincular(self, temporario: Path, destino: Path, rel_path: str) -> None:
+        try:
+            os.link(temporario, destino)
+        except FileExistsError as exc:
+            raise ErroEscritaArquivo(f"Arquivo já existe: {rel_path}") from exc
+        except OSError:
+            # sistema de arquivos sem hard link: cai para checagem + rename
+            if destino.exists():
+                raise ErroEscritaArquivo(f"Arquivo já existe: {rel_path}") from None
+            os.replace(temporario, destino)
+            return
+        temporario.unlink()
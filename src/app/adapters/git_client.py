@@ -1,29 +1,176 @@
 from __future__ import annotations
+import asyncio
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Sequence
 
-from git import Repo
+from git import Actor, Repo
 from git.exc import BadName
 
+from app.core.concorrencia import executar_io
+from app.core.rastreamento import rastreador
+from app.core.settings import settings
+
+MAX_REPOS_EM_CACHE = 32
+
+_repos: OrderedDict[Path, tuple[Repo, threading.Lock]] = OrderedDict()
+_repos_lock = threading.Lock()
+_agrupadores: dict[Path, _CommitAgrupado] = {}
+
+
+def obter_repo(repo_dir: str | Path) -> tuple[Repo, threading.Lock]:
+    """
+    Repo do diretório (aberto ou inicializado) e a trava para usá-lo, reaproveitados entre
+    commits: o objeto mantém os processos `git cat-file` e as configurações já lidas.
+    """
+    caminho = Path(repo_dir).resolve()
+    descartados: list[tuple[Repo, threading.Lock]] = []
+    with _repos_lock:
+        item = _repos.get(caminho)
+        if item is not None:
+            if (caminho / ".git").exists():
+                _repos.move_to_end(caminho)
+                return item
+            descartados.append(_repos.pop(caminho))  # .git apagado: o objeto não serve mais
+
+    repo = Repo(caminho) if (caminho / ".git").exists() else Repo.init(caminho)
+    with _repos_lock:
+        item = _repos.setdefault(caminho, (repo, threading.Lock()))
+        if item[0] is not repo:
+            descartados.append((repo, threading.Lock()))  # outra thread abriu antes
+        _repos.move_to_end(caminho)
+        while len(_repos) > MAX_REPOS_EM_CACHE:
+            descartados.append(_repos.popitem(last=False)[1])
+    for antigo, trava in descartados:
+        with trava:
+            antigo.close()
+    return item
+
 
 class GitClient:
     def __init__(self, repo_dir: str):
         self.repo_path = Path(repo_dir)
-        if (self.repo_path / ".git").exists():
-            self.repo = Repo(self.repo_path)
-        else:
-            self.repo = Repo.init(self.repo_path)
+        self.repo, self._trava = obter_repo(repo_dir)
+
+    def commit_tudo(self, mensagem: str, caminhos: Sequence[str] | None = None) -> str:
+        """
+        Cria um commit e retorna o hash (ou o do HEAD, se nada mudou). Com `caminhos`, só
+        esses arquivos são adicionados ao índice, sem varrer a árvore de trabalho; sem eles,
+        ou no primeiro commit do repositório, vale `git add --all`.
+
+        Hooks: com `caminhos` o commit é feito por plumbing (`write-tree`, `commit-tree` e
+        `update-ref`), que não roda pre-commit, commit-msg nem post-commit. Sem `caminhos`
+        (e no primeiro commit) o `index.commit` do GitPython roda esses hooks.
+        """
+        atributos = {"git.caminhos": -1 if caminhos is None else len(caminhos)}
+        with rastreador.span("git.commit", **atributos) as span, self._trava:
+            commit = self._commit(mensagem, caminhos)
+            span.definir("git.commit", commit)
+            return commit
+
+    async def commit_async(self, mensagem: str, caminhos: Sequence[str] | None = None) -> str:
+        """
+        `commit_tudo` no pool de I/O. Com GIT_AGRUPAR_COMMITS_SEGUNDOS > 0, os commits pedidos
+        para o mesmo repositório dentro dessa janela viram um só (todos recebem o mesmo hash).
+        """
+        janela = settings.git_agrupar_commits_segundos
+        if janela <= 0:
+            return await executar_io(self.commit_tudo, mensagem, caminhos)
+        chave = self.repo_path.resolve()
+        agrupador = _agrupadores.get(chave)
+        if agrupador is None or agrupador.loop is not asyncio.get_running_loop():
+            # um agrupador de outro event loop (já encerrado) nunca descarregaria
+            agrupador = _agrupadores[chave] = _CommitAgrupado(self, chave, janela)
+        return await agrupador.adicionar(mensagem, caminhos)
 
-    def commit_tudo(self, mensagem: str) -> str:
+    def _commit(self, mensagem: str, caminhos: Sequence[str] | None) -> str:
         repo = self.repo
-        repo.git.add(all=True)
 
         try:
             head_valido = repo.head.is_valid()
         except (TypeError, ValueError, BadName):
             head_valido = False
 
-        if not head_valido or repo.is_dirty(index=True, working_tree=False, untracked_files=False):
-            commit = repo.index.commit(mensagem)
-            return commit.hexsha
+        if caminhos is None or not head_valido:
+            repo.git.add(all=True)
+            if not head_valido or repo.is_dirty(
+                index=True, working_tree=False, untracked_files=False
+            ):
+                return repo.index.commit(mensagem).hexsha
+            return repo.head.commit.hexsha
 
-        return repo.head.commit.hexsha
+        if not caminhos:
+            return repo.head.commit.hexsha
+        raiz = Path(repo.working_tree_dir or self.repo_path).resolve()
+        relativos = [Path(caminho).resolve().relative_to(raiz).as_posix() for caminho in caminhos]
+        # plumbing do git: o índice do GitPython é lido e regravado inteiro em Python a cada
+        # commit, o que domina o tempo em projetos com milhares de arquivos
+        repo.git.add("--", *relativos)
+        if not repo.git.diff("--cached", "--name-only", "--", *relativos):
+            return repo.head.commit.hexsha
+        arvore = repo.git.write_tree()
+        config = repo.config_reader()
+        autor, committer = Actor.author(config), Actor.committer(config)
+        identidade = {
+            "GIT_AUTHOR_NAME": autor.name or "",
+            "GIT_AUTHOR_EMAIL": autor.email or "",
+            "GIT_COMMITTER_NAME": committer.name or "",
+            "GIT_COMMITTER_EMAIL": committer.email or "",
+        }
+        commit = repo.git.commit_tree(arvore, "-p", "HEAD", "-m", mensagem, env=identidade)
+        repo.git.update_ref("-m", f"commit: {mensagem.splitlines()[0]}", "HEAD", commit)
+        return commit
+
+
+class _CommitAgrupado:
+    """
+    Junta os commits pedidos para um repositório durante `janela` segundos. Fica em
+    `_agrupadores` enquanto há pedidos pendentes e pertence ao event loop que o criou.
+    """
+
+    def __init__(self, cliente: GitClient, chave: Path, janela: float) -> None:
+        self.cliente = cliente
+        self.chave = chave
+        self.janela = janela
+        self.loop = asyncio.get_running_loop()
+        self.pendentes: list[tuple[str, Sequence[str] | None, asyncio.Future[str]]] = []
+        self._tarefa: asyncio.Task[None] | None = None
+
+    async def adicionar(self, mensagem: str, caminhos: Sequence[str] | None) -> str:
+        futuro: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self.pendentes.append((mensagem, caminhos, futuro))
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._descarregar())
+        return await asyncio.shield(futuro)
+
+    async def _descarregar(self) -> None:
+        await asyncio.sleep(self.janela)
+        pendentes, self.pendentes, self._tarefa = self.pendentes, [], None
+        if len(pendentes) == 1:
+            mensagem = pendentes[0][0]
+        else:
+            mensagem = f"feat: {len(pendentes)} gerações agrupadas\n\n" + "\n".join(
+                f"- {item[0]}" for item in pendentes
+            )
+        caminhos: list[str] | None = []
+        for _, arquivos, _ in pendentes:
+            if arquivos is None or caminhos is None:
+                caminhos = None
+            else:
+                caminhos.extend(arquivos)
+        caminhos = list(dict.fromkeys(caminhos)) if caminhos is not None else None
+
+        try:
+            resultado = await executar_io(self.cliente.commit_tudo, mensagem, caminhos)
+        except Exception as exc:  # noqa: BLE001 - repassado a cada geração do grupo
+            for _, _, futuro in pendentes:
+                if not futuro.done():
+                    futuro.set_exception(exc)
+        else:
+            for _, _, futuro in pendentes:
+                if not futuro.done():
+                    futuro.set_result(resultado)
+        finally:
+            if not self.pendentes and _agrupadores.get(self.chave) is self:
+                del _agrupadores[self.chave]
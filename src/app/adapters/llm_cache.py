@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from loguru import logger
+
+from app.core.settings import Settings, settings
+
+_cache: CacheLLM | None = None
+_cache_iniciado = False
+
+
+class CacheLLM:
+    """
+    Cache de respostas do LLM endereçado por conteúdo.
+    A chave é o SHA-256 de (provedor, modelo, temperatura, mensagens); a camada em memória
+    (LRU) fica na frente da camada em disco (um JSON por chave), que expira por TTL e é
+    podada pelos arquivos menos usados quando passa de `max_bytes_disco`.
+    """
+
+    def __init__(
+        self,
+        diretorio: str | Path,
+        max_itens_memoria: int = 256,
+        max_bytes_disco: int = 100 * 1024 * 1024,
+        ttl_segundos: float = 7 * 24 * 3600,
+    ) -> None:
+        self.diretorio = Path(diretorio).expanduser()
+        self.max_itens_memoria = max(0, max_itens_memoria)
+        self.max_bytes_disco = max(0, max_bytes_disco)
+        self.ttl_segundos = ttl_segundos
+        self._memoria: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes_disco: int | None = None
+        self.acertos_memoria = 0
+        self.acertos_disco = 0
+        self.falhas = 0
+
+    @staticmethod
+    def chave(
+        provedor: str, modelo: str, temperatura: float, mensagens: list[dict[str, str]]
+    ) -> str:
+        material = json.dumps(
+            [provedor.lower(), modelo, temperatura, mensagens],
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def obter_memoria(self, chave: str) -> str | None:
+        """Consulta só a camada em memória (sem I/O, pode rodar no event loop)."""
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is None:
+                return None
+            expira_em, texto = item
+            if expira_em < time.time():
+                del self._memoria[chave]
+                return None
+            self._memoria.move_to_end(chave)
+            self.acertos_memoria += 1
+            return texto
+
+    def obter_disco(self, chave: str) -> str | None:
+        """Consulta a camada em disco e promove o item para a memória; conta a falha se faltar."""
+        caminho = self._caminho(chave)
+        texto: str | None = None
+        expira_em = 0.0
+        try:
+            dados = json.loads(caminho.read_text(encoding="utf-8"))
+            expira_em = float(dados["criado_em"]) + self.ttl_segundos
+            if expira_em < time.time():
+                self._remover_arquivo(caminho)
+            else:
+                texto = dados["resposta"]
+                os.utime(caminho)  # marca o uso para a poda por LRU
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning(f"Entrada inválida no cache do LLM ({caminho.name}): {exc}")
+            self._remover_arquivo(caminho)
+
+        with self._lock:
+            if texto is None:
+                self.falhas += 1
+                return None
+            self.acertos_disco += 1
+            self._guardar_memoria(chave, texto, expira_em)
+        return texto
+
+    def guardar(self, chave: str, texto: str) -> None:
+        """Grava nas duas camadas. A escrita em disco é atômica (arquivo temporário + rename)."""
+        with self._lock:
+            self._guardar_memoria(chave, texto, time.time() + self.ttl_segundos)
+        if self.max_bytes_disco == 0:
+            return
+
+        with self._lock:
+            self._total_disco()  # conta o que já existe antes de somar a nova entrada
+        caminho = self._caminho(chave)
+        dados = json.dumps({"criado_em": time.time(), "resposta": texto}, ensure_ascii=False)
+        try:
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            temporario = caminho.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            temporario.write_text(dados, encoding="utf-8")
+            anterior = caminho.stat().st_size if caminho.exists() else 0
+            os.replace(temporario, caminho)
+        except OSError as exc:
+            logger.warning(f"Não foi possível gravar no cache do LLM: {exc}")
+            return
+
+        with self._lock:
+            total = (self._bytes_disco or 0) + len(dados.encode("utf-8")) - anterior
+            self._bytes_disco = total
+        if total > self.max_bytes_disco:
+            self._podar_disco()
+
+    def estatisticas(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "acertos_memoria": self.acertos_memoria,
+                "acertos_disco": self.acertos_disco,
+                "falhas": self.falhas,
+                "itens_memoria": len(self._memoria),
+                "bytes_disco": self._bytes_disco or 0,
+            }
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._memoria.clear()
+            self._bytes_disco = 0
+        for caminho in self.diretorio.glob("*/*.json"):
+            caminho.unlink(missing_ok=True)
+
+    def _caminho(self, chave: str) -> Path:
+        return self.diretorio / chave[:2] / f"{chave}.json"
+
+    def _guardar_memoria(self, chave: str, texto: str, expira_em: float) -> None:
+        if self.max_itens_memoria == 0:
+            return
+        self._memoria[chave] = (expira_em, texto)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    def _total_disco(self) -> int:
+        if self._bytes_disco is None:
+            self._bytes_disco = sum(
+                caminho.stat().st_size for caminho in self.diretorio.glob("*/*.json")
+            )
+        return self._bytes_disco
+
+    def _remover_arquivo(self, caminho: Path) -> None:
+        try:
+            tamanho = caminho.stat().st_size
+            caminho.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._bytes_disco is not None:
+                self._bytes_disco = max(0, self._bytes_disco - tamanho)
+
+    def _podar_disco(self) -> None:
+        """Remove as entradas menos usadas (mtime mais antigo) até ficar em 90% do limite."""
+        entradas: list[tuple[float, int, Path]] = []
+        for caminho in self.diretorio.glob("*/*.json"):
+            try:
+                info = caminho.stat()
+            except FileNotFoundError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, caminho))
+        entradas.sort()
+
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        alvo = int(self.max_bytes_disco * 0.9)
+        for _, tamanho, caminho in entradas:
+            if total <= alvo:
+                break
+            caminho.unlink(missing_ok=True)
+            total -= tamanho
+        with self._lock:
+            self._bytes_disco = total
+
+
+def obter_cache_llm(app_settings: Settings | None = None) -> CacheLLM | None:
+    """Retorna o cache do processo quando LLM_CACHE_ATIVO=true (criado sob demanda)."""
+    global _cache, _cache_iniciado
+    if not _cache_iniciado:
+        cfg = app_settings or settings
+        if cfg.llm_cache_ativo:
+            diretorio = cfg.llm_cache_dir or str(Path(cfg.base_dir_conversas).parent / "cache_llm")
+            _cache = CacheLLM(
+                diretorio,
+                max_itens_memoria=cfg.llm_cache_memoria_itens,
+                max_bytes_disco=cfg.llm_cache_disco_max_bytes,
+                ttl_segundos=cfg.llm_cache_ttl_segundos,
+            )
+        _cache_iniciado = True
+    return _cache
@@ -1,44 +1,467 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import deque
+from contextlib import ExitStack
+from email.utils import parsedate_to_datetime
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable
+
 import httpx
+import orjson
+from loguru import logger
 
+from app.adapters.llm_cache import CacheLLM, obter_cache_llm
+from app.adapters.llm_fake import URL_FAKE, TransporteLLMFake
+from app.core.admissao import controle_admissao
+from app.core.concorrencia import executar_io
 from app.core.errors import ErroLLM
-from app.core.settings import settings
+from app.core.metricas import erros_llm, uso_llm
+from app.core.rastreamento import cabecalhos_propagacao, rastreador, span_atual
+from app.core.settings import Settings, settings
+
+_http_client: httpx.AsyncClient | None = None
+_voos: dict[str, _Voo] = {}
+
+STATUS_RETENTAVEIS = frozenset({429, 500, 502, 503, 504})
+
+
+def criar_http_client(app_settings: Settings | None = None) -> httpx.AsyncClient:
+    """
+    Cria um AsyncClient com pool de conexões (keep-alive e HTTP/2) conforme as configurações.
+    """
+    cfg = app_settings or settings
+    limites = httpx.Limits(
+        max_connections=cfg.http_max_conexoes,
+        max_keepalive_connections=cfg.http_max_conexoes_keepalive,
+        keepalive_expiry=cfg.http_keepalive_expiracao,
+    )
+    timeout = httpx.Timeout(cfg.llm_timeout_leitura, connect=cfg.llm_timeout_conexao)
+    if cfg.llm_provider.lower() == "fake":
+        return httpx.AsyncClient(transport=TransporteLLMFake(cfg), limits=limites, timeout=timeout)
+    return httpx.AsyncClient(http2=cfg.http_http2, limits=limites, timeout=timeout)
+
+
+def iniciar_http_client(app_settings: Settings | None = None) -> httpx.AsyncClient:
+    """Inicializa o cliente compartilhado do processo (chamado no lifespan da API)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = criar_http_client(app_settings)
+    return _http_client
+
+
+def obter_http_client() -> httpx.AsyncClient:
+    """Retorna o cliente compartilhado, criando-o sob demanda (ex.: uso via CLI)."""
+    return iniciar_http_client()
+
+
+async def fechar_http_client() -> None:
+    """Fecha o cliente compartilhado e libera as conexões do pool."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class _Voo:
+    """Chamada ao provedor em andamento, compartilhada pelos chamadores com a mesma chave."""
+
+    def __init__(self, tarefa: asyncio.Task[str]) -> None:
+        self.tarefa = tarefa
+        self.aguardando = 0
+
+
+async def _aguardar_voo(chave: str, iniciar: Callable[[], Awaitable[str]]) -> str:
+    """
+    Single-flight: chamadores concorrentes com a mesma chave aguardam a mesma tarefa.
+    A tarefa fica protegida (shield) do cancelamento de cada chamador e só é cancelada
+    quando o último deles desiste (ex.: todos os clientes desconectaram).
+    """
+    voo = _voos.get(chave)
+    if voo is None or voo.tarefa.get_loop() is not asyncio.get_running_loop():
+        voo = _Voo(asyncio.create_task(iniciar()))
+        _voos[chave] = voo
+        voo.tarefa.add_done_callback(partial(_encerrar_voo, chave, voo))
+    voo.aguardando += 1
+    try:
+        return await asyncio.shield(voo.tarefa)
+    finally:
+        voo.aguardando -= 1
+        if voo.aguardando == 0 and not voo.tarefa.done():
+            voo.tarefa.cancel()
+            _encerrar_voo(chave, voo)
+
+
+def _encerrar_voo(chave: str, voo: _Voo, _tarefa: asyncio.Task[str] | None = None) -> None:
+    if _voos.get(chave) is voo:
+        del _voos[chave]
+
+
+class _HistoricoLatencias:
+    """Latências recentes (s) das chamadas ao provedor; o p95 define o atraso do hedging."""
+
+    def __init__(self, tamanho: int = 200, minimo_amostras: int = 20) -> None:
+        self._amostras: deque[float] = deque(maxlen=tamanho)
+        self._minimo_amostras = minimo_amostras
+
+    def registrar(self, segundos: float) -> None:
+        self._amostras.append(segundos)
+
+    def p95(self) -> float | None:
+        if len(self._amostras) < self._minimo_amostras:
+            return None
+        ordenadas = sorted(self._amostras)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+
+
+_latencias = _HistoricoLatencias()
+
+
+def _tempo_retry_after(resposta: httpx.Response) -> float | None:
+    """Interpreta `Retry-After` em segundos ou como data HTTP."""
+    valor = resposta.headers.get("retry-after")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, data.timestamp() - time.time())
 
 
 class LLMClient:
     """
     Cliente simples para OpenAI ou HuggingFace (inference API) no modo chat.
+    Usa o httpx.AsyncClient compartilhado do processo, reaproveitando conexões.
+    Com LLM_CACHE_ATIVO=true, respostas para o mesmo (provedor, modelo, temperatura,
+    mensagens) vêm do cache; `usar_cache=False` ignora o cache naquela chamada.
+    Chamadas idênticas simultâneas em `chat` compartilham uma única requisição ao provedor.
+    Falhas transitórias (rede, 429, 5xx) são repetidas com backoff; com LLM_HEDGING=true,
+    uma segunda requisição é disparada quando a primeira passa do p95 recente.
+    Cada chamada ao provedor ocupa uma vaga do controle de admissão (ADMISSAO_*); a
+    requisição de hedge ocupa outra, e só é enviada se houver vaga livre na hora.
+
+    `prefixo` indica quantas mensagens iniciais formam o prefixo estável do prompt (igual
+    entre requisições); no OpenAI ele vira o `prompt_cache_key` do cache de prompt.
     """
 
-    async def chat(self, mensagens: list[dict[str, str]]) -> str:
+    def __init__(self, client: httpx.AsyncClient | None = None) -> None:
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or obter_http_client()
+
+    async def chat(
+        self, mensagens: list[dict[str, str]], usar_cache: bool = True, prefixo: int = 1
+    ) -> str:
+        with rastreador.span("llm.chat", "CLIENT", **self._atributos_span(mensagens)) as span:
+            cache = obter_cache_llm() if usar_cache else None
+            chave = self._chave(mensagens)
+            if cache is not None:
+                texto = await self._ler_cache(cache, chave)
+                if texto is not None:
+                    span.definir("llm.cache", "acerto")
+                    return texto
+            if not settings.llm_coalescer_chamadas:
+                return await self._chat_e_guardar(mensagens, cache, chave, prefixo)
+            return await _aguardar_voo(
+                chave, partial(self._chat_e_guardar, mensagens, cache, chave, prefixo)
+            )
+
+    def chat_stream(
+        self, mensagens: list[dict[str, str]], usar_cache: bool = True, prefixo: int = 1
+    ) -> AsyncIterator[str]:
+        """
+        Versão em streaming do chat: produz os trechos de texto conforme o provedor os envia.
+        Provedores sem suporte a streaming (e acertos no cache) entregam a resposta inteira em
+        um único trecho. A resposta só vai para o cache se o stream terminar por completo.
+        """
+        atributos = {**self._atributos_span(mensagens), "llm.stream": True}
+        return rastreador.rastrear_iterador(
+            "llm.chat", self._chat_stream(mensagens, usar_cache, prefixo), **atributos
+        )
+
+    async def _chat_stream(
+        self, mensagens: list[dict[str, str]], usar_cache: bool, prefixo: int
+    ) -> AsyncIterator[str]:
+        cache = obter_cache_llm() if usar_cache else None
+        if cache is None:
+            async with controle_admissao.vaga():
+                async for trecho in self._chat_stream_provedor(mensagens, prefixo):
+                    yield trecho
+            return
+        chave = self._chave(mensagens)
+        texto = await self._ler_cache(cache, chave)
+        if texto is not None:
+            atual = span_atual()
+            if atual is not None:
+                atual.definir("llm.cache", "acerto")
+            yield texto
+            return
+        trechos: list[str] = []
+        async with controle_admissao.vaga():
+            async for trecho in self._chat_stream_provedor(mensagens, prefixo):
+                trechos.append(trecho)
+                yield trecho
+        await executar_io(cache.guardar, chave, "".join(trechos))
+
+    def _atributos_span(self, mensagens: list[dict[str, str]]) -> dict[str, object]:
+        # nomes das convenções semânticas de GenAI do OpenTelemetry
+        return {
+            "gen_ai.system": settings.llm_provider.lower(),
+            "gen_ai.request.model": settings.model_llm,
+            "llm.mensagens": len(mensagens),
+        }
+
+    def _chave(self, mensagens: list[dict[str, str]]) -> str:
+        return CacheLLM.chave(
+            settings.llm_provider, settings.model_llm, settings.llm_temperatura, mensagens
+        )
+
+    async def _ler_cache(self, cache: CacheLLM, chave: str) -> str | None:
+        texto = cache.obter_memoria(chave)
+        if texto is None:
+            texto = await executar_io(cache.obter_disco, chave)
+        return texto
+
+    async def _chat_e_guardar(
+        self, mensagens: list[dict[str, str]], cache: CacheLLM | None, chave: str, prefixo: int
+    ) -> str:
+        async with controle_admissao.vaga():
+            texto = await self._chat_provedor(mensagens, prefixo)
+        if cache is not None:
+            await executar_io(cache.guardar, chave, texto)
+        return texto
+
+    async def _chat_provedor(self, mensagens: list[dict[str, str]], prefixo: int = 1) -> str:
         prov = settings.llm_provider.lower()
         try:
-            if prov == "openai":
-                return await self._chat_openai(mensagens)
+            if prov in ("openai", "fake"):
+                return await self._chat_openai(mensagens, prefixo)
             if prov == "huggingface":
                 return await self._chat_hf(mensagens)
         except httpx.HTTPError as exc:
-            raise ErroLLM(f"Falha ao chamar provedor {prov}: {exc}") from exc
-        except (KeyError, IndexError, TypeError) as exc:
+            raise ErroLLM(
+                f"Falha ao chamar provedor {prov}: {exc}", tentativas_esgotadas=True
+            ) from exc
+        except (KeyError, IndexError, TypeError, json.JSONDecodeError) as exc:
+            erros_llm.inc(provedor=prov, status="resposta_invalida")
+            raise ErroLLM("Resposta inesperada do provedor LLM") from exc
+        raise ValueError("LLM_PROVIDER inválido. Use 'openai', 'huggingface' ou 'fake'.")
+
+    async def _chat_stream_provedor(
+        self, mensagens: list[dict[str, str]], prefixo: int = 1
+    ) -> AsyncIterator[str]:
+        prov = settings.llm_provider.lower()
+        try:
+            if prov in ("openai", "fake"):
+                async for trecho in self._chat_openai_stream(mensagens, prefixo):
+                    yield trecho
+                return
+            if prov == "huggingface":
+                yield await self._chat_hf(mensagens)
+                return
+        except httpx.HTTPError as exc:
+            raise ErroLLM(
+                f"Falha ao chamar provedor {prov}: {exc}", tentativas_esgotadas=True
+            ) from exc
+        except (KeyError, IndexError, TypeError, json.JSONDecodeError) as exc:
+            erros_llm.inc(provedor=prov, status="resposta_invalida")
             raise ErroLLM("Resposta inesperada do provedor LLM") from exc
-        raise ValueError("LLM_PROVIDER inválido. Use 'openai' ou 'huggingface'.")
+        raise ValueError("LLM_PROVIDER inválido. Use 'openai', 'huggingface' ou 'fake'.")
 
-    async def _chat_openai(self, mensagens: list[dict[str, str]]) -> str:
-        if not settings.openai_api_key:
+    def _requisicao_openai(
+        self, mensagens: list[dict[str, str]], stream: bool = False, prefixo: int = 1
+    ) -> tuple[str, dict[str, str], dict]:
+        if settings.llm_provider.lower() == "fake":
+            url, headers = URL_FAKE, {}
+        elif not settings.openai_api_key:
             raise RuntimeError("OPENAI_API_KEY não configurada")
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {"Authorization": f"Bearer {settings.openai_api_key}"}
-        payload = {
+        else:
+            url = "https://api.openai.com/v1/chat/completions"
+            headers = {"Authorization": f"Bearer {settings.openai_api_key}"}
+        payload: dict = {
             "model": settings.model_llm,
             "messages": mensagens,
-            "temperature": 0.2,
+            "temperature": settings.llm_temperatura,
         }
-        async with httpx.AsyncClient(timeout=120) as client:
-            resposta = await client.post(url, headers=headers, json=payload)
-            resposta.raise_for_status()
-            data = resposta.json()
-            return data["choices"][0]["message"]["content"]
+        if settings.llm_prompt_cache_key and prefixo > 0:
+            # agrupa no mesmo cache do provedor as requisições que compartilham o prefixo
+            estavel = json.dumps(mensagens[:prefixo], ensure_ascii=False, sort_keys=True)
+            payload["prompt_cache_key"] = hashlib.sha256(estavel.encode("utf-8")).hexdigest()[:32]
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return url, headers, payload
+
+    def _registrar_uso(self, uso: dict | None) -> None:
+        """Registra os tokens do campo `usage`, incluindo os servidos pelo cache de prompt."""
+        if not uso:
+            return
+        tokens_prompt = int(uso.get("prompt_tokens") or 0)
+        tokens_cache = int((uso.get("prompt_tokens_details") or {}).get("cached_tokens") or 0)
+        tokens_resposta = int(uso.get("completion_tokens") or 0)
+        uso_llm.registrar(tokens_prompt, tokens_cache, tokens_resposta)
+        atual = span_atual()
+        if atual is not None:
+            atual.definir("gen_ai.usage.input_tokens", tokens_prompt)
+            atual.definir("gen_ai.usage.output_tokens", tokens_resposta)
+            atual.definir("llm.tokens_prompt_cache", tokens_cache)
+        logger.debug(
+            f"Uso do LLM: prompt={tokens_prompt} (cache={tokens_cache}) resposta={tokens_resposta}"
+        )
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(settings.llm_timeout_leitura, connect=settings.llm_timeout_conexao)
+
+    def _espera(self, tentativa: int, resposta: httpx.Response | None = None) -> float:
+        """Backoff exponencial com jitter total; `Retry-After` do provedor tem precedência."""
+        if resposta is not None:
+            retry_after = _tempo_retry_after(resposta)
+            if retry_after is not None:
+                return min(retry_after, settings.llm_backoff_maximo)
+        teto = min(settings.llm_backoff_maximo, settings.llm_backoff_base * 2 ** (tentativa - 1))
+        return random.uniform(0, teto)
+
+    async def _enviar(
+        self, url: str, headers: dict[str, str], payload: dict, stream: bool = False
+    ) -> httpx.Response:
+        """
+        Envia a requisição repetindo falhas de transporte e respostas 429/5xx até
+        LLM_TENTATIVAS vezes. Cada tentativa é limitada por LLM_TIMEOUT_TOTAL (no streaming,
+        até a chegada dos cabeçalhos; depois vale o timeout de leitura por trecho).
+        """
+        tentativas = max(1, settings.llm_tentativas)
+        provedor = settings.llm_provider.lower()
+        tentativa = 0
+        while True:
+            tentativa += 1
+            inicio = time.perf_counter()
+            try:
+                resposta = await self._tentativa(url, headers, payload, stream, tentativa)
+            except httpx.TransportError as exc:
+                expirou = isinstance(exc, httpx.TimeoutException)
+                erros_llm.inc(provedor=provedor, status="timeout" if expirou else "rede")
+                if tentativa >= tentativas:
+                    raise
+                espera = self._espera(tentativa)
+                logger.warning(f"Falha de rede no LLM ({exc!r}); nova tentativa em {espera:.2f}s")
+                await asyncio.sleep(espera)
+                continue
+
+            if resposta.is_error:
+                erros_llm.inc(provedor=provedor, status=str(resposta.status_code))
+            if resposta.status_code in STATUS_RETENTAVEIS and tentativa < tentativas:
+                espera = self._espera(tentativa, resposta)
+                await resposta.aclose()
+                logger.warning(
+                    f"LLM respondeu {resposta.status_code}; nova tentativa em {espera:.2f}s"
+                )
+                await asyncio.sleep(espera)
+                continue
+            if resposta.is_error:
+                await resposta.aclose()
+                resposta.raise_for_status()
+            if not stream:
+                _latencias.registrar(time.perf_counter() - inicio)
+            return resposta
+
+    async def _tentativa(
+        self, url: str, headers: dict[str, str], payload: dict, stream: bool, tentativa: int
+    ) -> httpx.Response:
+        """Uma requisição ao provedor, num span CLIENT que propaga o `traceparent`."""
+        atributos = {"http.method": "POST", "http.url": url, "llm.tentativa": tentativa}
+        with rastreador.span("llm.http", "CLIENT", **atributos) as span:
+            requisicao = self.client.build_request(
+                "POST",
+                url,
+                headers={**headers, **cabecalhos_propagacao()},
+                json=payload,
+                timeout=self._timeout(),
+            )
+            try:
+                async with asyncio.timeout(settings.llm_timeout_total):
+                    resposta = await self.client.send(requisicao, stream=stream)
+            except TimeoutError as exc:
+                raise httpx.TimeoutException(
+                    f"tempo total de {settings.llm_timeout_total}s excedido", request=requisicao
+                ) from exc
+            span.definir("http.status_code", resposta.status_code)
+            return resposta
+
+    async def _postar(self, url: str, headers: dict[str, str], payload: dict) -> httpx.Response:
+        """
+        `_enviar` com hedging opcional: se a resposta não chega dentro do p95 recente
+        (ou LLM_HEDGING_ATRASO_PADRAO, enquanto há poucas amostras), dispara uma segunda
+        requisição idêntica e fica com a primeira que responder com sucesso; a outra é
+        cancelada. O hedge ocupa uma vaga própria da admissão, sem esperar na fila: sem vaga
+        livre, segue só a requisição original.
+        """
+        if not settings.llm_hedging:
+            return await self._enviar(url, headers, payload)
+
+        atraso = _latencias.p95() or settings.llm_hedging_atraso_padrao
+        tarefas = [asyncio.create_task(self._enviar(url, headers, payload))]
+        with ExitStack() as vagas:  # a vaga do hedge é devolvida ao sair
+            try:
+                concluidas, _ = await asyncio.wait(tarefas, timeout=atraso)
+                if not concluidas and vagas.enter_context(controle_admissao.vaga_livre()):
+                    logger.info(
+                        f"LLM sem resposta após {atraso:.2f}s; enviando requisição de hedge"
+                    )
+                    tarefas.append(asyncio.create_task(self._enviar(url, headers, payload)))
+                pendentes = set(tarefas)
+                while pendentes:
+                    concluidas, pendentes = await asyncio.wait(
+                        pendentes, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    sucesso = [tarefa for tarefa in concluidas if tarefa.exception() is None]
+                    if sucesso:
+                        return sucesso[0].result()
+                return tarefas[0].result()  # todas falharam: propaga o erro da original
+            finally:
+                for tarefa in tarefas:
+                    tarefa.cancel()
+
+    async def _chat_openai(self, mensagens: list[dict[str, str]], prefixo: int = 1) -> str:
+        url, headers, payload = self._requisicao_openai(mensagens, prefixo=prefixo)
+        resposta = await self._postar(url, headers, payload)
+        data = orjson.loads(resposta.content)
+        self._registrar_uso(data.get("usage"))
+        return data["choices"][0]["message"]["content"]
+
+    async def _chat_openai_stream(
+        self, mensagens: list[dict[str, str]], prefixo: int = 1
+    ) -> AsyncIterator[str]:
+        url, headers, payload = self._requisicao_openai(mensagens, stream=True, prefixo=prefixo)
+        resposta = await self._enviar(url, headers, payload, stream=True)
+        try:
+            async for linha in resposta.aiter_lines():
+                if not linha.startswith("data:"):
+                    continue
+                dado = linha[5:].strip()
+                if dado == "[DONE]":
+                    break
+                evento = orjson.loads(dado)
+                # com include_usage, o último evento traz só o `usage` (choices vazio)
+                self._registrar_uso(evento.get("usage"))
+                escolhas = evento.get("choices") or []
+                if not escolhas:
+                    continue
+                trecho = (escolhas[0].get("delta") or {}).get("content")
+                if trecho:
+                    yield trecho
+        finally:
+            await resposta.aclose()
 
     async def _chat_hf(self, mensagens: list[dict[str, str]]) -> str:
         if not settings.huggingface_api_key:
@@ -54,14 +477,12 @@ class LLMClient:
         headers = {"Authorization": f"Bearer {settings.huggingface_api_key}"}
         payload = {
             "inputs": prompt,
-            "parameters": {"max_new_tokens": 1500, "temperature": 0.2},
+            "parameters": {"max_new_tokens": 1500, "temperature": settings.llm_temperatura},
         }
-        async with httpx.AsyncClient(timeout=240) as client:
-            resposta = await client.post(url, headers=headers, json=payload)
-            resposta.raise_for_status()
-            data = resposta.json()
-            if isinstance(data, list) and data and "generated_text" in data[0]:
-                return data[0]["generated_text"]
-            if isinstance(data, dict) and data.get("generated_text"):
-                return str(data["generated_text"])
-            return str(data)
+        resposta = await self._postar(url, headers, payload)
+        data = orjson.loads(resposta.content)
+        if isinstance(data, list) and data and "generated_text" in data[0]:
+            return data[0]["generated_text"]
+        if isinstance(data, dict) and data.get("generated_text"):
+            return str(data["generated_text"])
+        return str(data)
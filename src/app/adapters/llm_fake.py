@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+
+from app.core.settings import Settings, settings
+
+URL_FAKE = "http://llm-fake.local/v1/chat/completions"
+ARQUIVOS_CHAT = ("index.html", "assets/styles.css", "assets/script.js")
+
+
+class TransporteLLMFake(httpx.AsyncBaseTransport):
+    """
+    Provedor local e determinístico (LLM_PROVIDER=fake) que imita a API de chat do OpenAI.
+
+    Fica no lugar da rede dentro do httpx.AsyncClient compartilhado, então novas tentativas,
+    streaming, cache e métricas do LLMClient rodam como em produção. A mesma conversa sempre
+    gera o mesmo conteúdo: blocos ```caminho``` para os pedidos de /v1/gerar, texto para os
+    resumos de contexto e o JSON do chat nos demais. Latência até o primeiro byte, tamanho da
+    resposta, trechos do streaming e falhas injetadas (429, 5xx, JSON inválido) vêm das
+    configurações LLM_FAKE_*; LLM_FAKE_SEMENTE torna a sequência de sorteios reproduzível.
+    """
+
+    def __init__(self, app_settings: Settings | None = None) -> None:
+        self.settings = app_settings or settings
+        self._aleatorio = random.Random(self.settings.llm_fake_semente)
+        self._resposta_fixa: str | None = None
+        if self.settings.llm_fake_resposta_arquivo:
+            caminho = Path(self.settings.llm_fake_resposta_arquivo).expanduser()
+            self._resposta_fixa = caminho.read_text(encoding="utf-8")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(await request.aread())
+        mensagens: list[dict[str, str]] = payload.get("messages") or []
+        await asyncio.sleep(self._latencia())
+
+        cfg = self.settings
+        sorteio = self._aleatorio.random()
+        if sorteio < cfg.llm_fake_taxa_429:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={"error": "rate limit"})
+        if sorteio < cfg.llm_fake_taxa_429 + cfg.llm_fake_taxa_5xx:
+            status = self._aleatorio.choice((500, 502, 503))
+            return httpx.Response(status, json={"error": "falha injetada"})
+        invalido = self._aleatorio.random() < cfg.llm_fake_taxa_json_invalido
+
+        texto = self._resposta_fixa or self._conteudo(mensagens)
+        uso = {
+            "prompt_tokens": sum(len(m.get("content", "")) for m in mensagens) // 4,
+            "completion_tokens": len(texto) // 4,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        if payload.get("stream"):
+            return httpx.Response(
+                200,
+                headers={"Content-Type": "text/event-stream"},
+                stream=_EventosFake(texto, uso, invalido, cfg),
+            )
+        if invalido:
+            return httpx.Response(200, content=b'{"choices": [{"message": {"content": "')
+        corpo = {"choices": [{"message": {"role": "assistant", "content": texto}}], "usage": uso}
+        return httpx.Response(200, json=corpo)
+
+    def _latencia(self) -> float:
+        cfg = self.settings
+        media = max(0.0, cfg.llm_fake_latencia_ms / 1000)
+        desvio = max(0.0, cfg.llm_fake_latencia_desvio_ms / 1000)
+        distribuicao = cfg.llm_fake_latencia_distribuicao.lower()
+        aleatorio = self._aleatorio
+        if media == 0:
+            return 0.0
+        if distribuicao == "uniforme":
+            valor = aleatorio.uniform(media - desvio, media + desvio)
+        elif distribuicao == "normal":
+            valor = aleatorio.gauss(media, desvio)
+        elif distribuicao == "exponencial":
+            valor = aleatorio.expovariate(1 / media)
+        elif distribuicao == "lognormal":
+            # parâmetros da normal subjacente para que média e desvio sejam os configurados
+            sigma2 = math.log(1 + (desvio / media) ** 2)
+            valor = aleatorio.lognormvariate(math.log(media) - sigma2 / 2, math.sqrt(sigma2))
+        else:
+            valor = media
+        return max(0.0, valor)
+
+    def _conteudo(self, mensagens: list[dict[str, str]]) -> str:
+        semente = hashlib.sha256(
+            json.dumps(mensagens, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        tamanho = max(1, self.settings.llm_fake_tamanho_resposta)
+        ultima = next((m["content"] for m in reversed(mensagens) if m.get("role") == "user"), "")
+
+        if any("```{caminho_do_arquivo}" in m.get("content", "") for m in mensagens):
+            linhas = ultima.splitlines()
+            arquivos = [linha[2:].strip() for linha in linhas if linha.startswith("- ")]
+            if "PASSOS_EXECUCAO.md" in ultima and "PASSOS_EXECUCAO.md" not in arquivos:
+                arquivos.append("PASSOS_EXECUCAO.md")
+            por_arquivo = tamanho // max(1, len(arquivos))
+            return "".join(
+                f"```{arquivo}\n{_corpo(semente, arquivo, por_arquivo)}\n```\n\n"
+                for arquivo in arquivos
+            )
+        if ultima.startswith("Resumo anterior:"):
+            return _corpo(semente, "resumo", min(tamanho, 800))
+
+        por_arquivo = tamanho // len(ARQUIVOS_CHAT)
+        return json.dumps(
+            {
+                "mensagem": f"Projeto fake {semente[:8]} gerado para teste de carga.",
+                "slug_projeto": f"projeto-fake-{semente[:8]}",
+                "arquivos": [
+                    {"caminho": arquivo, "conteudo": _corpo(semente, arquivo, por_arquivo)}
+                    for arquivo in ARQUIVOS_CHAT
+                ],
+            },
+            ensure_ascii=False,
+        )
+
+
+class _EventosFake(httpx.AsyncByteStream):
+    """Corpo SSE no formato do OpenAI, em trechos de LLM_FAKE_TRECHO_CARACTERES."""
+
+    def __init__(self, texto: str, uso: dict, invalido: bool, cfg: Settings) -> None:
+        self.texto = texto
+        self.uso = uso
+        self.invalido = invalido
+        self.tamanho = max(1, cfg.llm_fake_trecho_caracteres)
+        self.intervalo = max(0.0, cfg.llm_fake_intervalo_trecho_ms / 1000)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for inicio in range(0, len(self.texto), self.tamanho):
+            if self.invalido and inicio >= len(self.texto) // 2:
+                yield b'data: {"choices": [{"delta": {"content": \n\n'
+                return
+            trecho = self.texto[inicio : inicio + self.tamanho]
+            evento = {"choices": [{"index": 0, "delta": {"content": trecho}}]}
+            yield f"data: {json.dumps(evento, ensure_ascii=False)}\n\n".encode("utf-8")
+            if self.intervalo:
+                await asyncio.sleep(self.intervalo)
+        yield f"data: {json.dumps({'choices': [], 'usage': self.uso})}\n\n".encode("utf-8")
+        yield b"data: [DONE]\n\n"
+
+
+def _corpo(semente: str, nome: str, tamanho: int) -> str:
+    """Conteúdo sintético determinístico com aproximadamente `tamanho` caracteres."""
+    linha = f"// {nome} {semente[:16]} conteúdo sintético do provedor fake\n"
+    return (linha * (tamanho // len(linha) + 1))[: max(1, tamanho)].rstrip()
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import orjson
+from loguru import logger
+
+from app.core.settings import settings
+
+
+def hash_conteudo(conteudo: str) -> str:
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class ManifestoProjeto:
+    """
+    Hashes do conteúdo de cada arquivo gerado em um projeto.
+
+    Cada entrada guarda o SHA-256 do conteúdo e o tamanho/mtime do arquivo quando foi
+    gravado. Se o arquivo no disco ainda tem esse tamanho/mtime, basta comparar o hash; se
+    foi mexido fora do agente (ou não há entrada), o conteúdo atual é lido e comparado.
+    O manifesto fica fora do projeto, em `<MANIFESTOS_DIR>/<hash do caminho da raiz>.json`,
+    para não acabar no repositório do usuário.
+    """
+
+    def __init__(self, raiz: str | Path, diretorio: str | Path | None = None) -> None:
+        self.raiz = Path(raiz)
+        diretorio = (
+            diretorio
+            or settings.manifestos_dir
+            or Path(settings.base_dir_conversas).parent / "manifestos"
+        )
+        nome = hashlib.sha256(str(self.raiz.resolve()).encode("utf-8")).hexdigest()[:32]
+        self.caminho = Path(diretorio).expanduser() / f"{nome}.json"
+        self._lock = threading.Lock()
+        self._entradas = self._carregar()
+        self._alterado = False
+
+    def chave(self, destino: Path) -> str | None:
+        """Caminho relativo à raiz, ou None se `destino` está fora do projeto."""
+        try:
+            return destino.relative_to(self.raiz).as_posix()
+        except ValueError:
+            return None
+
+    def inalterado(self, destino: Path, digest: str) -> bool:
+        """True se `destino` já tem o conteúdo de hash `digest`."""
+        chave = self.chave(destino)
+        if chave is None:
+            return False
+        try:
+            info = destino.stat()
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            entrada = self._entradas.get(chave)
+        if (
+            entrada is not None
+            and entrada.get("tamanho") == info.st_size
+            and entrada.get("mtime_ns") == info.st_mtime_ns
+        ):
+            return entrada.get("sha256") == digest
+
+        try:
+            with open(destino, encoding="utf-8", newline="") as arquivo:
+                atual = hash_conteudo(arquivo.read())
+        except (OSError, UnicodeDecodeError):
+            return False
+        if atual != digest:
+            return False
+        self.registrar(destino, digest)  # atualiza a entrada desatualizada
+        return True
+
+    def registrar(self, destino: Path, digest: str) -> None:
+        chave = self.chave(destino)
+        if chave is None:
+            return
+        info = destino.stat()
+        entrada = {"sha256": digest, "tamanho": info.st_size, "mtime_ns": info.st_mtime_ns}
+        with self._lock:
+            if self._entradas.get(chave) != entrada:
+                self._entradas[chave] = entrada
+                self._alterado = True
+
+    def salvar(self) -> bool:
+        """Grava o manifesto (atômico) se algo mudou; retorna se gravou."""
+        with self._lock:
+            if not self._alterado:
+                return False
+            dados = orjson.dumps(self._entradas, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+            self._alterado = False
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        # nome único por gravação: duas threads podem salvar o manifesto do mesmo projeto
+        temporario = self.caminho.with_name(f"{self.caminho.name}.{uuid.uuid4().hex[:8]}.tmp")
+        temporario.write_bytes(dados)
+        os.replace(temporario, self.caminho)
+        return True
+
+    def _carregar(self) -> dict[str, dict]:
+        try:
+            dados = orjson.loads(self.caminho.read_bytes())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Manifesto ilegível em {self.caminho}, ignorando: {exc}")
+            return {}
+        return dados if isinstance(dados, dict) else {}
@@ -1,15 +1,29 @@
-import json
+import os
 import re
+import shutil
+import time
+import uuid
 from pathlib import Path
+from typing import AsyncIterator, Callable
 
-from fastapi import APIRouter
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from loguru import logger
 
+from app.adapters.manifesto import ManifestoProjeto, hash_conteudo
+from app.core.admissao import controle_admissao
+from app.core.concorrencia import executar_io
+from app.core.logging_config import vincular_contexto
+from app.core.metricas import bytes_escritos, duracao_etapa
 from app.schemas.chat import RequisicaoChat, RespostaChat
+from app.schemas.conversa import ResumoConversa
 from app.services.agente import AgenteDev
-from app.services.conversas import ConversasService
+from app.services.conversas import criar_conversas_service
+from app.utils.json_stream import ExtratorArquivosJSON
 
 router = APIRouter()
-conversas_service = ConversasService()
+conversas_service = criar_conversas_service()
 
 
 def _slugify(value: str) -> str:
@@ -20,60 +34,242 @@ def _slugify(value: str) -> str:
     return texto or "site"
 
 
+def _evento_sse(evento: str, dados: dict) -> str:
+    return f"event: {evento}\ndata: {orjson.dumps(dados).decode()}\n\n"
+
+
 @router.post("/chat", response_model=RespostaChat)
-async def chat(req: RequisicaoChat) -> RespostaChat:
+async def chat(req: RequisicaoChat, request: Request) -> RespostaChat:
     """Conversa livre: ideação, refino e rascunhos de código."""
     agente = AgenteDev()
+    vincular_contexto(conversa_id=req.conversa_id)
+    with controle_admissao.cliente(request):
+        with duracao_etapa.medir(rota="chat", etapa="contexto"):
+            mensagens, novo_resumo = await _historico_limitado(agente, req)
+        with duracao_etapa.medir(rota="chat", etapa="llm"):
+            resposta = await agente.conversar(mensagens, req.contexto, req.usar_cache)
+    return await executar_io(_finalizar_chat, req, resposta, novo_resumo)
+
+
+@router.post("/chat/stream")
+async def chat_stream(req: RequisicaoChat, request: Request) -> StreamingResponse:
+    """
+    Mesmo fluxo do /chat, mas repassa os trechos do LLM via Server-Sent Events.
+    Emite eventos `delta` durante a geração e um evento `fim` com a RespostaChat final
+    (após salvar arquivos e registrar a conversa) ou `erro` em caso de falha.
+    """
+    vincular_contexto(conversa_id=req.conversa_id)
+    cliente = controle_admissao.admitir(request)  # 429 antes de abrir o stream
+    return StreamingResponse(
+        _eventos_chat(req, cliente),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _eventos_chat(req: RequisicaoChat, cliente: str) -> AsyncIterator[str]:
+    agente = AgenteDev()
+    extrator = ExtratorArquivosJSON()
+    staging = conversas_service.base_dir / ".staging" / uuid.uuid4().hex
+    arquivos_staging: list[Path] = []
+    segundos_staging = 0.0
+    try:
+        with duracao_etapa.medir(rota="chat_stream", etapa="contexto"):
+            mensagens, novo_resumo = await _historico_limitado(agente, req)
+        inicio = time.perf_counter()
+        async for trecho in agente.conversar_stream(mensagens, req.contexto, req.usar_cache):
+            yield _evento_sse("delta", {"conteudo": trecho})
+            # cada arquivo completo vai para o disco enquanto o modelo gera o próximo
+            for item in extrator.alimentar(trecho):
+                inicio_arquivo = time.perf_counter()
+                relativo = await executar_io(_salvar_arquivo, staging, item)
+                segundos_staging += time.perf_counter() - inicio_arquivo
+                if relativo is not None:
+                    arquivos_staging.append(relativo)
+        duracao_etapa.observar(
+            time.perf_counter() - inicio - segundos_staging, rota="chat_stream", etapa="llm"
+        )
+
+        with duracao_etapa.medir(rota="chat_stream", etapa="parse"):
+            payload = extrator.finalizar()
+            mensagem_resumo, _, slug_projeto = _interpretar_payload(
+                payload, extrator.texto_restante
+            )
+        # como no /chat, resposta que não é um JSON válido (truncada, cercada por ```) não
+        # salva arquivos: o staging é descartado no finally
+        resultado = await executar_io(
+            _concluir_chat,
+            req,
+            mensagem_resumo,
+            slug_projeto,
+            (lambda destino: _promover_staging(staging, arquivos_staging, destino))
+            if arquivos_staging and isinstance(payload, dict)
+            else None,
+            novo_resumo,
+            "chat_stream",
+            segundos_staging,
+        )
+    except HTTPException as exc:
+        erro = {"status": exc.status_code, "detalhe": exc.detail}
+        if exc.headers and "Retry-After" in exc.headers:
+            erro["retry_after"] = int(exc.headers["Retry-After"])
+        yield _evento_sse("erro", erro)
+        return
+    except Exception:
+        # o 200 e os primeiros deltas já foram enviados: o cliente só fica sabendo pelo evento
+        logger.exception("Falha no chat em streaming")
+        yield _evento_sse("erro", {"status": 500, "detalhe": "Erro interno"})
+        return
+    finally:
+        controle_admissao.liberar(cliente)
+        await executar_io(shutil.rmtree, staging, ignore_errors=True)
+    yield _evento_sse("fim", resultado.model_dump(mode="json"))
+
+
+async def _historico_limitado(
+    agente: AgenteDev, req: RequisicaoChat
+) -> tuple[list[dict[str, str]], ResumoConversa | None]:
+    """Histórico da requisição dentro do orçamento de contexto, usando o resumo já salvo."""
     mensagens = [mensagem.to_llm_payload() for mensagem in req.mensagens]
-    resposta = await agente.conversar(mensagens, req.contexto)
+    salvo = None
+    if req.conversa_id and agente.settings.contexto_max_tokens > 0:
+        salvo = await executar_io(conversas_service.obter_contexto, req.conversa_id)
+    return await agente.limitar_historico(mensagens, salvo)
+
+
+def _finalizar_chat(
+    req: RequisicaoChat, resposta: str, novo_resumo: ResumoConversa | None = None
+) -> RespostaChat:
+    """Interpreta o JSON do LLM, registra a conversa e salva os arquivos gerados."""
+    with duracao_etapa.medir(rota="chat", etapa="parse"):
+        try:
+            payload = orjson.loads(resposta)
+        except orjson.JSONDecodeError:
+            payload = None
+        mensagem_resumo, arquivos_payload, slug_projeto = _interpretar_payload(payload, resposta)
+
+    def salvar(projeto_dir: Path) -> list[str]:
+        manifesto = ManifestoProjeto(projeto_dir)
+        salvos: list[str] = []
+        for item in arquivos_payload:
+            relativo = _salvar_arquivo(projeto_dir, item, manifesto)
+            if relativo is not None:
+                salvos.append(str((projeto_dir / relativo).resolve()))
+        manifesto.salvar()
+        return salvos
+
+    return _concluir_chat(
+        req, mensagem_resumo, slug_projeto, salvar if arquivos_payload else None, novo_resumo
+    )
+
+
+def _interpretar_payload(payload: object, resposta: str) -> tuple[str, list[dict], str | None]:
     arquivos_payload: list[dict] = []
     slug_projeto: str | None = None
     mensagem_resumo = resposta.strip()
 
-    try:
-        payload = json.loads(resposta)
-        if isinstance(payload, dict):
-            mensagem_resumo = str(payload.get("mensagem") or "").strip() or mensagem_resumo
-            arquivos_payload = payload.get("arquivos") or []
-            if not isinstance(arquivos_payload, list):
-                arquivos_payload = []
-            slug_projeto = payload.get("slug_projeto") or payload.get("slug") or None
-    except json.JSONDecodeError:
-        payload = None
+    if isinstance(payload, dict):
+        mensagem_resumo = str(payload.get("mensagem") or "").strip() or mensagem_resumo
+        arquivos_payload = payload.get("arquivos") or []
+        if not isinstance(arquivos_payload, list):
+            arquivos_payload = []
+        slug_projeto = payload.get("slug_projeto") or payload.get("slug") or None
 
     if not mensagem_resumo:
         mensagem_resumo = "Estrutura criada com sucesso."
+    return mensagem_resumo, arquivos_payload, slug_projeto
+
+
+def _salvar_arquivo(
+    raiz: Path, item: object, manifesto: ManifestoProjeto | None = None
+) -> Path | None:
+    """
+    Grava um item {"caminho", "conteudo"} sob `raiz`; retorna o caminho relativo ou None.
+    Com `manifesto`, um arquivo que já tem esse conteúdo não é regravado.
+    """
+    if not isinstance(item, dict):
+        return None
+    caminho_raw = item.get("caminho")
+    conteudo = item.get("conteudo")
+    if not isinstance(caminho_raw, str) or not caminho_raw.strip():
+        return None
+    if not isinstance(conteudo, str):
+        return None
+    caminho = Path(caminho_raw.strip())
+    if caminho.is_absolute() or ".." in caminho.parts:
+        return None
+    destino = raiz / caminho
+    digest = hash_conteudo(conteudo) if manifesto is not None else None
+    if manifesto is not None and digest is not None and manifesto.inalterado(destino, digest):
+        return caminho
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(conteudo, encoding="utf-8")
+    bytes_escritos.inc(len(conteudo.encode("utf-8")), origem="chat")
+    if manifesto is not None and digest is not None:
+        manifesto.registrar(destino, digest)
+    return caminho
 
+
+def _promover_staging(staging: Path, relativos: list[Path], projeto_dir: Path) -> list[str]:
+    """
+    Move os arquivos já gravados no staging para a pasta definitiva do projeto, mantendo
+    (sem regravar) os que já estão lá com o mesmo conteúdo.
+    """
+    manifesto = ManifestoProjeto(projeto_dir)
+    salvos: list[str] = []
+    for relativo in dict.fromkeys(relativos):
+        origem = staging / relativo
+        destino = projeto_dir / relativo
+        with open(origem, encoding="utf-8", newline="") as arquivo:
+            digest = hash_conteudo(arquivo.read())
+        if manifesto.inalterado(destino, digest):
+            origem.unlink()
+        else:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(origem, destino)
+            manifesto.registrar(destino, digest)
+        salvos.append(str(destino.resolve()))
+    manifesto.salvar()
+    return salvos
+
+
+def _concluir_chat(
+    req: RequisicaoChat,
+    mensagem_resumo: str,
+    slug_projeto: str | None,
+    salvar: Callable[[Path], list[str]] | None,
+    novo_resumo: ResumoConversa | None = None,
+    rota: str = "chat",
+    segundos_arquivos: float = 0.0,
+) -> RespostaChat:
+    """
+    Registra a conversa e salva os arquivos do projeto. `segundos_arquivos` soma ao tempo da
+    etapa "arquivos" o que já foi gasto gravando antes (o staging do streaming).
+    """
+    inicio = time.perf_counter()
     registro = conversas_service.registrar(
         mensagens=req.mensagens,
         resposta_agente=mensagem_resumo,
         conversa_id=req.conversa_id,
         contexto=req.contexto,
     )
+    vincular_contexto(conversa_id=registro.id)
+    if novo_resumo is not None:
+        conversas_service.salvar_resumo(registro.id, novo_resumo)
+    segundos_registro = time.perf_counter() - inicio
 
     arquivos_salvos: list[str] = []
     projeto_dir: Path | None = None
 
-    if arquivos_payload:
-        conversa_dir = Path(registro.arquivo).parent
+    if salvar is not None:
+        inicio = time.perf_counter()
+        conversa_dir = conversas_service.diretorio(registro.id)
         slug = _slugify(slug_projeto or mensagem_resumo.splitlines()[0])
         projeto_dir = conversa_dir / slug
         projeto_dir.mkdir(parents=True, exist_ok=True)
-
-        for item in arquivos_payload:
-            caminho_raw = item.get("caminho")
-            conteudo = item.get("conteudo")
-            if not isinstance(caminho_raw, str) or not caminho_raw.strip():
-                continue
-            if not isinstance(conteudo, str):
-                continue
-            caminho = Path(caminho_raw.strip())
-            if caminho.is_absolute() or ".." in caminho.parts:
-                continue
-            destino = projeto_dir / caminho
-            destino.parent.mkdir(parents=True, exist_ok=True)
-            destino.write_text(conteudo, encoding="utf-8")
-            arquivos_salvos.append(str(destino.resolve()))
+        arquivos_salvos = salvar(projeto_dir)
+        segundos_arquivos += time.perf_counter() - inicio
+        duracao_etapa.observar(segundos_arquivos, rota=rota, etapa="arquivos")
 
     mensagem_final = mensagem_resumo
     if arquivos_salvos:
@@ -85,7 +281,10 @@ async def chat(req: RequisicaoChat) -> RespostaChat:
         blocos.append(lista)
         blocos.append("🚀 Pode abrir o index.html para validar e pedir ajustes quando quiser.")
         mensagem_final = "\n\n".join(blocos)
+        inicio = time.perf_counter()
         conversas_service.atualizar_ultima_resposta(registro.id, mensagem_final)
+        segundos_registro += time.perf_counter() - inicio
+    duracao_etapa.observar(segundos_registro, rota=rota, etapa="registrar")
 
     return RespostaChat(
         resposta=mensagem_final,
@@ -1,21 +1,64 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 
+from app.core.logging_config import vincular_contexto
+from app.core.metricas import duracao_etapa, registro_metricas
+from app.core.settings import settings
 from app.schemas.conversa import ConversaDetalhe, ConversaResumo
-from app.services.conversas import ConversasService
+from app.services.conversas import criar_conversas_service
 
 router = APIRouter()
-conversas_service = ConversasService()
+conversas_service = criar_conversas_service()
+registro_metricas.medidor(
+    "agente_conversas", "Conversas armazenadas", funcao=conversas_service.total
+)
 
 
 @router.get("/conversas", response_model=list[ConversaResumo])
-def listar_conversas() -> list[ConversaResumo]:
-    return conversas_service.listar()
+def listar_conversas(
+    response: Response,
+    limite: int | None = Query(
+        default=None,
+        ge=1,
+        le=settings.conversas_limite_maximo,
+        description=(
+            "Itens por página; sem `limite` nem `cursor` a listagem vem inteira "
+            "(com só o cursor, vale CONVERSAS_LIMITE_PADRAO)"
+        ),
+    ),
+    cursor: str | None = Query(
+        default=None, description="Valor do cabeçalho X-Proximo-Cursor da página anterior"
+    ),
+    prefixo: str | None = Query(
+        default=None, description="Filtra pelo início do título ou do contexto"
+    ),
+) -> list[ConversaResumo]:
+    """
+    Lista as conversas mais recentes primeiro. Sem `limite` nem `cursor` devolve todas (como
+    antes da paginação); paginando, o cursor da próxima página vem no cabeçalho
+    `X-Proximo-Cursor`.
+    """
+    if limite is None and cursor is not None:
+        limite = settings.conversas_limite_padrao
+    try:
+        with duracao_etapa.medir(rota="conversas", etapa="listar"):
+            pagina = conversas_service.listar(
+                limite=limite,
+                cursor=cursor,
+                prefixo=prefixo,
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if pagina.proximo_cursor:
+        response.headers["X-Proximo-Cursor"] = pagina.proximo_cursor
+    return pagina.itens
 
 
 @router.get("/conversas/{conversa_id}", response_model=ConversaDetalhe)
 def obter_conversa(conversa_id: str) -> ConversaDetalhe:
+    vincular_contexto(conversa_id=conversa_id)
     try:
-        return conversas_service.obter(conversa_id)
+        with duracao_etapa.medir(rota="conversas", etapa="obter"):
+            return conversas_service.obter(conversa_id)
     except FileNotFoundError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -25,6 +68,7 @@ def obter_conversa(conversa_id: str) -> ConversaDetalhe:
 
 @router.delete("/conversas/{conversa_id}", status_code=status.HTTP_204_NO_CONTENT)
 def remover_conversa(conversa_id: str) -> None:
+    vincular_contexto(conversa_id=conversa_id)
     try:
         conversas_service.remover(conversa_id)
     except FileNotFoundError as exc:
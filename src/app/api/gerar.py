@@ -1,19 +1,49 @@
-from fastapi import APIRouter
-from app.schemas.gerar import RequisicaoGerar, RespostaGerar
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from app.core.admissao import controle_admissao
+from app.core.logging_config import vincular_contexto
+from app.schemas.gerar import JobGerar, RequisicaoGerar, RespostaGerar
 from app.services.agente import AgenteDev
+from app.services.jobs_gerar import fila_gerar
 
 router = APIRouter()
 
 @router.post("/gerar", response_model=RespostaGerar)
-async def gerar(req: RequisicaoGerar) -> RespostaGerar:
+async def gerar(req: RequisicaoGerar, request: Request) -> RespostaGerar:
     """
     Gera um projeto completo em disco (planeja -> escreve arquivos -> git opcional).
     """
     agente = AgenteDev()
-    plano, arquivos_escritos, commit_hash = await agente.gerar_projeto(
-        objetivo=req.objetivo,
-        path_saida=req.path_saida,
-        overwrite=req.overwrite,
-        git=req.git,
-    )
+    with controle_admissao.cliente(request):
+        plano, arquivos_escritos, commit_hash = await agente.gerar_projeto(
+            objetivo=req.objetivo,
+            path_saida=req.path_saida,
+            overwrite=req.overwrite,
+            git=req.git,
+            paralelo=req.paralelo,
+            usar_cache=req.usar_cache,
+        )
     return RespostaGerar(plano=plano, arquivos=arquivos_escritos, commit=commit_hash)
+
+
+@router.post("/gerar/jobs", response_model=JobGerar, status_code=status.HTTP_202_ACCEPTED)
+async def submeter_geracao(
+    req: RequisicaoGerar, request: Request, response: Response
+) -> JobGerar:
+    """
+    Enfileira a geração e responde na hora com o id do job; acompanhe em GET /v1/gerar/jobs/{id}.
+    """
+    with controle_admissao.cliente(request):
+        job = await fila_gerar.submeter(req)
+    vincular_contexto(job_id=job.id)
+    response.headers["Location"] = f"/v1/gerar/jobs/{job.id}"
+    return job
+
+
+@router.get("/gerar/jobs/{job_id}", response_model=JobGerar)
+async def obter_geracao(job_id: str) -> JobGerar:
+    """Estado, progresso (etapa e arquivos feitos/total) e, ao final, o resultado da geração."""
+    vincular_contexto(job_id=job_id)
+    job = await fila_gerar.obter(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return job
@@ -1,7 +1,30 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.adapters.llm_cache import obter_cache_llm
+from app.core.admissao import controle_admissao
+from app.core.metricas import (
+    TIPO_CONTEUDO_PROMETHEUS,
+    monitor_event_loop,
+    registro_metricas,
+    uso_llm,
+)
 
 router = APIRouter()
 
 @router.get("/saude")
 def saude():
-    return {"ok": True}
+    cache = obter_cache_llm()
+    return {
+        "ok": True,
+        "lag_event_loop_ms": monitor_event_loop.resumo(),
+        "cache_llm": cache.estatisticas() if cache else None,
+        "uso_llm": uso_llm.resumo(),
+        "admissao": controle_admissao.resumo(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Métricas no formato texto do Prometheus (durações por etapa, tokens, erros, disco)."""
+    return PlainTextResponse(registro_metricas.exportar(), media_type=TIPO_CONTEUDO_PROMETHEUS)
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+from fastapi import Request
+
+from app.core.errors import ErroFilaCheia, ErroLimiteTaxa
+from app.core.metricas import registro_metricas
+from app.core.settings import Settings, settings
+
+MAX_CLIENTES_RASTREADOS = 10_000
+
+espera_admissao = registro_metricas.histograma(
+    "agente_admissao_espera_segundos",
+    "Espera por uma vaga de chamada ao provedor LLM na admissão (0 quando havia vaga livre)",
+)
+
+
+class BaldeTokens:
+    """Token bucket: `capacidade` requisições de rajada, repostas a `taxa` por segundo."""
+
+    __slots__ = ("capacidade", "taxa", "tokens", "atualizado")
+
+    def __init__(self, capacidade: float, taxa: float) -> None:
+        self.capacidade = capacidade
+        self.taxa = taxa
+        self.tokens = capacidade
+        self.atualizado = time.monotonic()
+
+    def consumir(self) -> float:
+        """Consome um token; retorna 0 se havia saldo ou os segundos até o próximo token."""
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.taxa
+
+    def cheio(self) -> bool:
+        decorrido = time.monotonic() - self.atualizado
+        return self.tokens + decorrido * self.taxa >= self.capacidade
+
+
+class ControleAdmissao:
+    """
+    Controle de admissão das rotas que chamam o LLM.
+
+    Por cliente (chave de API ou IP), `cliente()` aplica um token bucket e um limite de
+    requisições simultâneas, respondendo 429 na hora. No processo, `vaga()` limita as
+    chamadas simultâneas ao provedor: as excedentes aguardam numa fila limitada e recebem
+    503 quando a fila está cheia ou a espera passa de ADMISSAO_ESPERA_MAXIMA. As duas
+    respostas trazem Retry-After.
+    """
+
+    def __init__(self, app_settings: Settings | None = None) -> None:
+        self.settings = app_settings or settings
+        self._em_uso = 0
+        self._espera: deque[asyncio.Future[None]] = deque()
+        self._ativas_cliente: dict[str, int] = {}
+        self._baldes: dict[str, BaldeTokens] = {}
+        self._ocupacao_media = 0.0
+        self.espera_media_ms = 0.0
+        self.espera_maxima_ms = 0.0
+        self.rejeitadas_taxa = 0
+        self.rejeitadas_cliente = 0
+        self.rejeitadas_sobrecarga = 0
+
+    @contextmanager
+    def cliente(self, request: Request) -> Iterator[str]:
+        """Admite a requisição do cliente (ou levanta ErroLimiteTaxa) até o fim do bloco."""
+        chave = self.admitir(request)
+        try:
+            yield chave
+        finally:
+            self.liberar(chave)
+
+    def admitir(self, request: Request) -> str:
+        """Versão sem bloco de `cliente()`, para respostas em streaming: chame `liberar` no fim."""
+        cfg = self.settings
+        chave = identificar_cliente(request)
+        if cfg.admissao_taxa_cliente > 0:
+            balde = self._baldes.get(chave)
+            if balde is None:
+                self._podar_baldes()
+                balde = BaldeTokens(
+                    max(1.0, cfg.admissao_rajada_cliente), cfg.admissao_taxa_cliente
+                )
+                self._baldes[chave] = balde
+            espera = balde.consumir()
+            if espera > 0:
+                self.rejeitadas_taxa += 1
+                raise ErroLimiteTaxa("Limite de requisições por cliente excedido", espera)
+
+        ativas = self._ativas_cliente.get(chave, 0)
+        if 0 < cfg.admissao_requisicoes_cliente <= ativas:
+            self.rejeitadas_cliente += 1
+            raise ErroLimiteTaxa(
+                "Muitas requisições simultâneas deste cliente", self._previsao_espera(1)
+            )
+        self._ativas_cliente[chave] = ativas + 1
+        return chave
+
+    def liberar(self, chave: str) -> None:
+        ativas = self._ativas_cliente.get(chave, 0) - 1
+        if ativas > 0:
+            self._ativas_cliente[chave] = ativas
+        else:
+            self._ativas_cliente.pop(chave, None)
+
+    @asynccontextmanager
+    async def vaga(self) -> AsyncIterator[None]:
+        """Ocupa uma das ADMISSAO_MAX_CONCORRENCIA vagas de chamada ao provedor."""
+        if self.settings.admissao_max_concorrencia <= 0:
+            yield
+            return
+        await self._ocupar()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self._ocupacao_media = (
+                duracao if self._ocupacao_media == 0 else 0.9 * self._ocupacao_media + 0.1 * duracao
+            )
+            self._desocupar()
+
+    @contextmanager
+    def vaga_livre(self) -> Iterator[bool]:
+        """Como `vaga()`, mas sem entrar na fila: indica se havia vaga livre e a ocupa."""
+        cfg = self.settings
+        if cfg.admissao_max_concorrencia <= 0:
+            yield True
+            return
+        if self._em_uso >= cfg.admissao_max_concorrencia or self._espera:
+            yield False
+            return
+        self._em_uso += 1
+        try:
+            yield True
+        finally:
+            self._desocupar()
+
+    def resumo(self) -> dict[str, float]:
+        return {
+            "em_execucao": self._em_uso,
+            "na_fila": len(self._espera),
+            "clientes_ativos": len(self._ativas_cliente),
+            "espera_media_ms": round(self.espera_media_ms, 3),
+            "espera_maxima_ms": round(self.espera_maxima_ms, 3),
+            "rejeitadas_taxa": self.rejeitadas_taxa,
+            "rejeitadas_cliente": self.rejeitadas_cliente,
+            "rejeitadas_sobrecarga": self.rejeitadas_sobrecarga,
+        }
+
+    async def _ocupar(self) -> None:
+        cfg = self.settings
+        if self._em_uso < cfg.admissao_max_concorrencia and not self._espera:
+            self._em_uso += 1
+            self._registrar_espera(0.0)
+            return
+        if len(self._espera) >= cfg.admissao_fila_maxima:
+            self.rejeitadas_sobrecarga += 1
+            raise ErroFilaCheia(
+                "Provedor LLM sobrecarregado; tente novamente em instantes",
+                self._previsao_espera(len(self._espera) + 1),
+            )
+
+        futuro: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._espera.append(futuro)
+        inicio = time.perf_counter()
+        try:
+            async with asyncio.timeout(cfg.admissao_espera_maxima or None):
+                await futuro
+        except BaseException as exc:
+            if futuro.done() and not futuro.cancelled():
+                self._desocupar()  # a vaga chegou junto com o cancelamento: devolve
+            else:
+                futuro.cancel()
+                # um `_desocupar` pode já ter tirado da fila o futuro cancelado (e pulado)
+                if futuro in self._espera:
+                    self._espera.remove(futuro)
+            if isinstance(exc, TimeoutError):
+                self.rejeitadas_sobrecarga += 1
+                raise ErroFilaCheia(
+                    "Tempo de espera por uma vaga no provedor LLM esgotado",
+                    self._previsao_espera(len(self._espera) + 1),
+                ) from exc
+            raise
+        self._registrar_espera(time.perf_counter() - inicio)
+
+    def _desocupar(self) -> None:
+        while self._espera:
+            futuro = self._espera.popleft()
+            if not futuro.done():
+                futuro.set_result(None)  # a vaga passa direto para o próximo da fila
+                return
+        self._em_uso -= 1
+
+    def _registrar_espera(self, segundos: float) -> None:
+        espera_admissao.observar(segundos)
+        ms = segundos * 1000
+        self.espera_maxima_ms = max(self.espera_maxima_ms, ms)
+        self.espera_media_ms = 0.9 * self.espera_media_ms + 0.1 * ms
+
+    def _previsao_espera(self, posicao: int) -> float:
+        """Estimativa de quando abre vaga, pela duração média recente das chamadas."""
+        vagas = max(1, self.settings.admissao_max_concorrencia)
+        return max(1.0, self._ocupacao_media * math.ceil(posicao / vagas))
+
+    def _podar_baldes(self) -> None:
+        if len(self._baldes) >= MAX_CLIENTES_RASTREADOS:
+            # balde cheio equivale a um cliente novo: pode ser descartado
+            for chave in [chave for chave, balde in self._baldes.items() if balde.cheio()]:
+                del self._baldes[chave]
+
+
+def identificar_cliente(request: Request) -> str:
+    """Chave do cliente: hash da chave de API (X-API-Key ou Authorization) ou o IP."""
+    credencial = request.headers.get("x-api-key") or request.headers.get("authorization")
+    if credencial:
+        return "chave:" + hashlib.sha256(credencial.encode("utf-8")).hexdigest()[:16]
+    return "ip:" + (request.client.host if request.client else "desconhecido")
+
+
+controle_admissao = ControleAdmissao()
+
+registro_metricas.medidor(
+    "agente_admissao_chamadas_llm",
+    "Chamadas ao provedor LLM em execução e aguardando vaga",
+    ("estado",),
+    funcao=lambda: {
+        (estado,): controle_admissao.resumo()[estado] for estado in ("em_execucao", "na_fila")
+    },
+)
+registro_metricas.contador(
+    "agente_admissao_rejeitadas_total",
+    "Requisições recusadas pela admissão (taxa, concorrência do cliente, sobrecarga)",
+    ("motivo",),
+    funcao=lambda: {
+        ("taxa",): controle_admissao.rejeitadas_taxa,
+        ("cliente",): controle_admissao.rejeitadas_cliente,
+        ("sobrecarga",): controle_admissao.rejeitadas_sobrecarga,
+    },
+)
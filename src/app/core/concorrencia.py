@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, ParamSpec, TypeVar
+
+from app.core.settings import Settings, settings
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def iniciar_executor_io(app_settings: Settings | None = None) -> ThreadPoolExecutor:
+    """Cria o pool limitado usado para I/O de disco fora do event loop (chamado no lifespan)."""
+    global _executor
+    if _executor is None:
+        cfg = app_settings or settings
+        _executor = ThreadPoolExecutor(max_workers=cfg.io_max_workers, thread_name_prefix="io")
+    return _executor
+
+
+def encerrar_executor_io() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def executar_io(funcao: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """
+    Executa uma função bloqueante (json/Path/git) no pool de I/O e aguarda o resultado.
+    O contexto (contextvars) da requisição é propagado para a thread.
+    """
+    loop = asyncio.get_running_loop()
+    contexto = contextvars.copy_context()
+    chamada = partial(contexto.run, funcao, *args, **kwargs)
+    return await loop.run_in_executor(iniciar_executor_io(), chamada)
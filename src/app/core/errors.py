@@ -1,9 +1,33 @@
+import math
+
 from fastapi import HTTPException, status
 
+
+def _retry_after(segundos: float | None) -> dict[str, str] | None:
+    return {"Retry-After": str(max(1, math.ceil(segundos)))} if segundos is not None else None
+
 class ErroLLM(HTTPException):
-    def __init__(self, detalhe: str):
+    def __init__(self, detalhe: str, tentativas_esgotadas: bool = False):
         super().__init__(status_code=status.HTTP_502_BAD_GATEWAY, detail=detalhe)
+        # o LLMClient já repetiu a chamada LLM_TENTATIVAS vezes (rede, 429 ou 5xx)
+        self.tentativas_esgotadas = tentativas_esgotadas
 
 class ErroEscritaArquivo(HTTPException):
     def __init__(self, detalhe: str):
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detalhe)
+
+class ErroFilaCheia(HTTPException):
+    def __init__(self, detalhe: str, retry_after: float | None = None):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detalhe,
+            headers=_retry_after(retry_after),
+        )
+
+class ErroLimiteTaxa(HTTPException):
+    def __init__(self, detalhe: str, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detalhe,
+            headers=_retry_after(retry_after),
+        )
@@ -1,20 +1,292 @@
 import logging
+import queue
+import random
 import sys
-from typing import Any
+import threading
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from typing import IO, Any, Callable
 
+import orjson
 from loguru import logger
 
+from app.core.rastreamento import span_atual
+from app.core.settings import Settings, settings
+
+FORMATO_TEXTO = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message} | {extra}"
+)
+LOTE_ESCRITA = 1024
+INTERVALO_ESCRITA = 0.005
+
+_contexto_requisicao: ContextVar[dict[str, Any] | None] = ContextVar(
+    "contexto_requisicao", default=None
+)
+
+
+class _Amostragem:
+    """
+    Fração de registros mantida por logger (`nome=fração`; vale o prefixo mais longo, ex.:
+    `httpx` cobre `httpx._client`). WARNING ou acima nunca é descartado.
+    """
+
+    def __init__(self, regras: dict[str, float]) -> None:
+        self.regras = regras
+        self._taxas: dict[str, float] = {}
+
+    def taxa(self, nome: str) -> float:
+        taxa = self._taxas.get(nome)
+        if taxa is None:
+            atual = nome
+            while atual not in self.regras and "." in atual:
+                atual = atual.rpartition(".")[0]
+            taxa = self._taxas[nome] = self.regras.get(atual, 1.0)
+        return taxa
+
+    def manter(self, nome: str, nivel: int) -> bool:
+        if nivel >= logging.WARNING or not self.regras:
+            return True
+        taxa = self.taxa(nome)
+        return taxa >= 1.0 or random.random() < taxa
+
+    def filtro(self, record: Any) -> bool:
+        return self.manter(record["name"] or "", record["level"].no)
+
+
+_amostragem = _Amostragem({})
+_log_acesso = True
+_amostragem_acesso = 1.0
+
 
 class InterceptHandler(logging.Handler):
+    """Repassa os logs do `logging` (uvicorn, httpx...) ao loguru, já com a amostragem."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._niveis: dict[str, str | int] = {}
+
     def emit(self, record: logging.LogRecord) -> None:
+        if not _amostragem.manter(record.name, record.levelno):
+            return
+        nivel = self._niveis.get(record.levelname)
+        if nivel is None:
+            try:
+                nivel = logger.level(record.levelname).name
+            except ValueError:
+                nivel = record.levelno
+            self._niveis[record.levelname] = nivel
+        if record.exc_info:
+            logger.opt(exception=record.exc_info).log(nivel, record.getMessage())
+        else:
+            logger.log(nivel, record.getMessage())
+
+
+class _Saida:
+    """
+    Destino dos logs: cada registro vira bytes na thread que loga (JSON via orjson ou a linha
+    de texto já formatada pelo loguru) e, com `assincrona`, uma thread própria grava em lotes.
+    Substitui o `enqueue=True` do loguru, que serializa o registro inteiro com pickle a cada log.
+    """
+
+    def __init__(
+        self, destino: IO[Any], serializar: Callable[[Any], bytes], assincrona: bool
+    ) -> None:
+        self._destino: IO[bytes] = getattr(destino, "buffer", destino)
+        self._serializar = serializar
+        self._fila: queue.SimpleQueue[bytes | None] | None = None
+        self._thread: threading.Thread | None = None
+        if assincrona:
+            self._fila = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._gravar, name="logs", daemon=True)
+            self._thread.start()
+
+    def write(self, mensagem: Any) -> None:
+        dados = self._serializar(mensagem)
+        if self._fila is not None:
+            self._fila.put(dados)
+            return
+        self._destino.write(dados)
+        self._destino.flush()
+
+    def stop(self) -> None:
+        if self._fila is not None and self._thread is not None:
+            self._fila.put(None)
+            self._thread.join(timeout=5)
+            self._fila = self._thread = None
+
+    def _gravar(self) -> None:
+        fila = self._fila
+        assert fila is not None
+        while True:
+            item = fila.get()
+            # acorda no máximo a cada INTERVALO_ESCRITA: menos disputa pelo GIL com quem loga
+            time.sleep(INTERVALO_ESCRITA)
+            lote: list[bytes] = []
+            while item is not None:
+                lote.append(item)
+                if len(lote) >= LOTE_ESCRITA:
+                    break
+                try:
+                    item = fila.get_nowait()
+                except queue.Empty:
+                    break
+            if lote:
+                try:
+                    self._destino.write(b"".join(lote))
+                    self._destino.flush()
+                except (OSError, ValueError):
+                    pass  # stdout fechado: não há onde registrar a falha
+            if item is None:
+                return
+
+
+def _json(mensagem: Any) -> bytes:
+    record = mensagem.record
+    dados: dict[str, Any] = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "extra": record["extra"],
+    }
+    excecao = record["exception"]
+    if excecao is not None:
+        dados["exception"] = "".join(
+            traceback.format_exception(excecao.type, excecao.value, excecao.traceback)
+        )
+    return orjson.dumps(dados, default=str, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _texto(mensagem: Any) -> bytes:
+    return str(mensagem).encode("utf-8", "replace")
+
+
+def _contexto_log(record: Any) -> None:
+    """
+    Inclui em `extra` o contexto da requisição (request_id, conversa_id...) e o
+    trace_id/span_id do span atual.
+    """
+    contexto = _contexto_requisicao.get()
+    if contexto:
+        record["extra"].update(contexto)
+    atual = span_atual()
+    if atual is not None:
+        record["extra"]["trace_id"] = atual.trace_id
+        record["extra"]["span_id"] = atual.span_id
+
+
+def _regras_amostragem(texto: str) -> dict[str, float]:
+    regras: dict[str, float] = {}
+    for item in texto.split(","):
+        nome, separador, fracao = item.partition("=")
+        if not separador or not nome.strip():
+            continue
         try:
-            level: Any = logger.level(record.levelname).name
+            regras[nome.strip()] = min(1.0, max(0.0, float(fracao)))
         except ValueError:
-            level = record.levelno
-        logger.log(level, record.getMessage())
+            continue
+    return regras
+
+
+def vincular_contexto(**campos: Any) -> None:
+    """
+    Acrescenta campos (ex.: conversa_id) ao contexto da requisição atual: passam a sair em
+    todos os logs seguintes dela, inclusive no log de acesso. Fora de uma requisição, nada faz.
+    """
+    contexto = _contexto_requisicao.get()
+    if contexto is not None:
+        contexto.update(campos)
 
 
-def configurar_logging() -> None:
+class MiddlewareContextoLog:
+    """
+    Middleware ASGI que abre o contexto de log de cada requisição HTTP (request_id do cabeçalho
+    `X-Request-ID` ou um novo, devolvido na resposta) e, com LOG_ACESSO, registra uma linha de
+    acesso ao final com status e latência, amostrada por LOG_AMOSTRAGEM_ACESSO (respostas
+    4xx/5xx sempre saem).
+    """
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = ""
+        for nome, valor in scope.get("headers") or ():
+            if nome == b"x-request-id":
+                request_id = valor.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        contexto: dict[str, Any] = {"request_id": request_id}
+        token = _contexto_requisicao.set(contexto)
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem: dict) -> None:
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                mensagem["headers"] = [
+                    *mensagem.get("headers", []),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            contexto["latencia_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+            if _log_acesso and (
+                status >= 400 or _amostragem_acesso >= 1.0 or random.random() < _amostragem_acesso
+            ):
+                metodo, rota = scope.get("method", ""), scope.get("path", "")
+                logger.bind(metodo=metodo, rota=rota, status=status).log(
+                    "WARNING" if status >= 500 else "INFO",
+                    f"{metodo} {rota} {status} {contexto['latencia_ms']:.1f}ms",
+                )
+            _contexto_requisicao.reset(token)
+
+
+def configurar_logging(
+    app_settings: Settings | None = None, destino: IO[Any] | None = None
+) -> None:
+    """
+    Liga o loguru ao stdout (ou a `destino`) conforme LOG_FORMATO (json ou texto),
+    LOG_ASSINCRONO e as regras de amostragem, e redireciona o `logging` para ele.
+    """
+    global _amostragem, _log_acesso, _amostragem_acesso
+    cfg = app_settings or settings
+    _log_acesso = cfg.log_acesso
+    _amostragem_acesso = min(1.0, max(0.0, cfg.log_amostragem_acesso))
+    regras = _regras_amostragem(cfg.log_amostragem)
+    if not _log_acesso:
+        # sem o log de acesso próprio, o do uvicorn segue a mesma amostragem
+        regras.setdefault("uvicorn.access", _amostragem_acesso)
+    _amostragem = _Amostragem(regras)
+
     logger.remove()
-    logger.add(sys.stdout, serialize=True, enqueue=True, backtrace=False, diagnose=False)
-    logging.basicConfig(handlers=[InterceptHandler()], level=logging.INFO)
+    logger.configure(patcher=_contexto_log)
+    em_json = cfg.log_formato.lower() != "texto"
+    logger.add(
+        _Saida(destino or sys.stdout, _json if em_json else _texto, cfg.log_assincrono),
+        format="{message}" if em_json else FORMATO_TEXTO,
+        filter=_amostragem.filtro if regras else None,
+        colorize=False,
+        backtrace=False,
+        diagnose=False,
+    )
+
+    handler = InterceptHandler()
+    logging.basicConfig(handlers=[handler], level=logging.INFO, force=True)
+    for nome in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        registro = logging.getLogger(nome)
+        registro.handlers = [handler]
+        registro.propagate = False
+    # o log de acesso do middleware já traz status, latência e o contexto da requisição
+    logging.getLogger("uvicorn.access").disabled = _log_acesso
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+import threading
+import time
+from typing import Callable, TypeVar, Union
+
+TIPO_CONTEUDO_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+LIMITES_PADRAO = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+    120.0,
+)
+
+Coleta = Callable[[], Union[float, dict[tuple[str, ...], float]]]
+M = TypeVar("M", bound="_Metrica")
+
+
+class MonitorEventLoop:
+    """
+    Mede o atraso do event loop: agenda um `sleep(intervalo)` e compara com o tempo real.
+    Qualquer trabalho bloqueante no loop aparece como atraso extra.
+    """
+
+    def __init__(self, intervalo: float = 0.5) -> None:
+        self.intervalo = intervalo
+        self.ultimo_ms = 0.0
+        self.maximo_ms = 0.0
+        self.media_ms = 0.0
+        self._tarefa: asyncio.Task[None] | None = None
+
+    def iniciar(self) -> None:
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    def resumo(self) -> dict[str, float]:
+        return {
+            "ultimo": round(self.ultimo_ms, 3),
+            "media": round(self.media_ms, 3),
+            "maximo": round(self.maximo_ms, 3),
+        }
+
+    async def _executar(self) -> None:
+        while True:
+            inicio = time.perf_counter()
+            await asyncio.sleep(self.intervalo)
+            atraso = max(0.0, (time.perf_counter() - inicio - self.intervalo) * 1000)
+            self.ultimo_ms = atraso
+            self.maximo_ms = max(self.maximo_ms, atraso)
+            self.media_ms = atraso if self.media_ms == 0 else 0.9 * self.media_ms + 0.1 * atraso
+
+
+class UsoLLM:
+    """
+    Acumula o campo `usage` das respostas do provedor: tokens de entrada, de saída e
+    quantos dos tokens de entrada vieram do cache de prompt do provedor.
+    """
+
+    def __init__(self) -> None:
+        self.requisicoes = 0
+        self.tokens_prompt = 0
+        self.tokens_prompt_cache = 0
+        self.tokens_resposta = 0
+
+    def registrar(self, tokens_prompt: int, tokens_prompt_cache: int, tokens_resposta: int) -> None:
+        self.requisicoes += 1
+        self.tokens_prompt += tokens_prompt
+        self.tokens_prompt_cache += tokens_prompt_cache
+        self.tokens_resposta += tokens_resposta
+
+    def resumo(self) -> dict[str, float]:
+        taxa = self.tokens_prompt_cache / self.tokens_prompt if self.tokens_prompt else 0.0
+        return {
+            "requisicoes": self.requisicoes,
+            "tokens_prompt": self.tokens_prompt,
+            "tokens_prompt_cache": self.tokens_prompt_cache,
+            "tokens_resposta": self.tokens_resposta,
+            "taxa_cache_prompt": round(taxa, 3),
+        }
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, descricao: str, rotulos: tuple[str, ...] = ()) -> None:
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self._lock = threading.Lock()
+
+    def _chave(self, rotulos: dict[str, object]) -> tuple:
+        # valores convertidos para texto só na exportação: o caminho quente fica barato
+        return tuple(map(rotulos.__getitem__, self.rotulos))
+
+    def exportar(self) -> list[str]:
+        return [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    """
+    Valor que só cresce, por combinação de rótulos. Com `funcao`, o valor é lido na hora da
+    exportação (útil para contadores que já existem em outro lugar, sem custo por evento).
+    """
+
+    tipo = "counter"
+
+    def __init__(
+        self,
+        nome: str,
+        descricao: str,
+        rotulos: tuple[str, ...] = (),
+        funcao: Coleta | None = None,
+    ) -> None:
+        super().__init__(nome, descricao, rotulos)
+        self.funcao = funcao
+        self._valores: dict[tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1.0, **rotulos: object) -> None:
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def valores(self) -> dict[tuple[str, ...], float]:
+        if self.funcao is not None:
+            coletado = self.funcao()
+            return coletado if isinstance(coletado, dict) else {(): coletado}
+        with self._lock:
+            return dict(self._valores)
+
+    def exportar(self) -> list[str]:
+        linhas = super().exportar()
+        for chave, valor in sorted(self.valores().items()):
+            linhas.append(f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}")
+        return linhas
+
+
+class Medidor(Contador):
+    """Valor que sobe e desce (tamanho de fila, total de conversas...)."""
+
+    tipo = "gauge"
+
+    def definir(self, valor: float, **rotulos: object) -> None:
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = valor
+
+
+class Histograma(_Metrica):
+    """
+    Distribuição de durações (em segundos) em faixas cumulativas, no formato do Prometheus.
+    `observar` custa uma busca binária e uma soma sob trava; `medir(...)` cronometra um bloco.
+    """
+
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nome: str,
+        descricao: str,
+        rotulos: tuple[str, ...] = (),
+        limites: tuple[float, ...] = LIMITES_PADRAO,
+    ) -> None:
+        super().__init__(nome, descricao, rotulos)
+        self.limites = tuple(sorted(limites))
+        # por chave: [contagem por faixa (+ a de +Inf), soma, total]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, **rotulos: object) -> None:
+        chave = self._chave(rotulos)
+        faixa = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][faixa] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def medir(self, **rotulos: object) -> _Cronometro:
+        return _Cronometro(self, rotulos)
+
+    def exportar(self) -> list[str]:
+        linhas = super().exportar()
+        with self._lock:
+            series = {chave: (list(s[0]), s[1], s[2]) for chave, s in self._series.items()}
+        for chave, (faixas, soma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, quantidade in zip((*self.limites, math.inf), faixas):
+                acumulado += quantidade
+                rotulos = _rotulos(self.rotulos, chave, f'le="{_numero(limite)}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+
+class _Cronometro:
+    __slots__ = ("histograma", "rotulos", "inicio")
+
+    def __init__(self, histograma: Histograma, rotulos: dict[str, object]) -> None:
+        self.histograma = histograma
+        self.rotulos = rotulos
+        self.inicio = 0.0
+
+    def __enter__(self) -> _Cronometro:
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.histograma.observar(time.perf_counter() - self.inicio, **self.rotulos)
+
+
+class RegistroMetricas:
+    """Métricas do processo, exportadas no formato texto do Prometheus em GET /metrics."""
+
+    def __init__(self) -> None:
+        self._metricas: dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def contador(
+        self,
+        nome: str,
+        descricao: str,
+        rotulos: tuple[str, ...] = (),
+        funcao: Coleta | None = None,
+    ) -> Contador:
+        return self._registrar(Contador(nome, descricao, rotulos, funcao))
+
+    def medidor(
+        self,
+        nome: str,
+        descricao: str,
+        rotulos: tuple[str, ...] = (),
+        funcao: Coleta | None = None,
+    ) -> Medidor:
+        return self._registrar(Medidor(nome, descricao, rotulos, funcao))
+
+    def histograma(
+        self,
+        nome: str,
+        descricao: str,
+        rotulos: tuple[str, ...] = (),
+        limites: tuple[float, ...] = LIMITES_PADRAO,
+    ) -> Histograma:
+        return self._registrar(Histograma(nome, descricao, rotulos, limites))
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas: list[str] = []
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+    def _registrar(self, metrica: M) -> M:
+        with self._lock:
+            # a mesma métrica registrada de novo (ex.: módulo recarregado) substitui a anterior
+            self._metricas[metrica.nome] = metrica
+        return metrica
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(nomes: tuple[str, ...], valores: tuple, extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(str(valor))}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == math.inf:
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+monitor_event_loop = MonitorEventLoop()
+uso_llm = UsoLLM()
+registro_metricas = RegistroMetricas()
+
+duracao_etapa = registro_metricas.histograma(
+    "agente_etapa_duracao_segundos",
+    "Duração de cada etapa das rotas (chat, chat_stream, gerar, conversas)",
+    ("rota", "etapa"),
+)
+erros_llm = registro_metricas.contador(
+    "agente_llm_erros_total",
+    "Respostas de erro, falhas de rede e respostas inválidas do provedor LLM",
+    ("provedor", "status"),
+)
+bytes_escritos = registro_metricas.contador(
+    "agente_disco_bytes_escritos_total",
+    "Bytes gravados em disco (projeto, chat, conversas)",
+    ("origem",),
+)
+registro_metricas.contador(
+    "agente_llm_tokens_total",
+    "Tokens informados pelo provedor no campo usage",
+    ("tipo",),
+    funcao=lambda: {
+        ("prompt",): uso_llm.tokens_prompt,
+        ("prompt_cache",): uso_llm.tokens_prompt_cache,
+        ("resposta",): uso_llm.tokens_resposta,
+    },
+)
+registro_metricas.medidor(
+    "agente_event_loop_atraso_segundos",
+    "Atraso do event loop (média móvel e máximo)",
+    ("estatistica",),
+    funcao=lambda: {
+        ("media",): monitor_event_loop.media_ms / 1000,
+        ("maximo",): monitor_event_loop.maximo_ms / 1000,
+    },
+)
@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+import httpx
+from loguru import logger
+
+from app.core.settings import Settings, settings
+
+T = TypeVar("T")
+F = TypeVar("F", bound=Callable[..., Any])
+
+TIPOS_SPAN = {"INTERNAL": 1, "SERVER": 2, "CLIENT": 3}
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+MAX_SPANS_PENDENTES = 10_000
+LOTE_EXPORTACAO = 512
+
+_span_atual: ContextVar[Span | None] = ContextVar("span_atual", default=None)
+
+
+class Span:
+    """
+    Trecho cronometrado de um trace, no modelo do OpenTelemetry (ids W3C, tipo, atributos e
+    status). Spans de traces fora da amostra recebem ids, para propagação e logs, mas não
+    são exportados.
+    """
+
+    __slots__ = (
+        "nome", "tipo", "trace_id", "span_id", "pai_id", "amostrado",
+        "inicio_ns", "fim_ns", "atributos", "erro",
+    )
+
+    def __init__(
+        self,
+        nome: str,
+        tipo: str,
+        trace_id: str,
+        pai_id: str | None,
+        amostrado: bool,
+        atributos: dict[str, Any],
+    ) -> None:
+        self.nome = nome
+        self.tipo = tipo
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.pai_id = pai_id
+        self.amostrado = amostrado
+        self.inicio_ns = time.time_ns()
+        self.fim_ns = 0
+        self.atributos = atributos
+        self.erro: str | None = None
+
+    def definir(self, chave: str, valor: Any) -> None:
+        self.atributos[chave] = valor
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.amostrado else '00'}"
+
+    def finalizar(self, erro: BaseException | None = None) -> None:
+        if self.fim_ns:
+            return
+        self.fim_ns = time.time_ns()
+        if erro is not None:
+            self.erro = f"{type(erro).__name__}: {erro}"
+        if self.amostrado:
+            rastreador.exportar(self)
+
+    def otlp(self) -> dict:
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.nome,
+            "kind": TIPOS_SPAN.get(self.tipo, 1),
+            "startTimeUnixNano": str(self.inicio_ns),
+            "endTimeUnixNano": str(self.fim_ns),
+            "attributes": [_atributo(chave, valor) for chave, valor in self.atributos.items()],
+            "status": {"code": 2, "message": self.erro} if self.erro else {"code": 1},
+        }
+        if self.pai_id:
+            span["parentSpanId"] = self.pai_id
+        return span
+
+
+class _SpanNulo(Span):
+    """Devolvido por `span()` com o rastreamento desligado: aceita atributos e os ignora."""
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        pass
+
+    def definir(self, chave: str, valor: Any) -> None:
+        pass
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class _SpanRemoto:
+    """Contexto recebido no cabeçalho `traceparent`: pai dos spans desta requisição."""
+
+    __slots__ = ("trace_id", "span_id", "amostrado")
+
+    def __init__(self, trace_id: str, span_id: str, amostrado: bool) -> None:
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.amostrado = amostrado
+
+
+class Rastreador:
+    """
+    Cria spans, decide a amostragem na raiz do trace (RASTREAMENTO_AMOSTRAGEM; spans filhos e
+    requisições com `traceparent` seguem a decisão do pai) e exporta os spans amostrados em
+    segundo plano, no formato OTLP/JSON: uma linha por lote no arquivo RASTREAMENTO_ARQUIVO
+    ou POST em RASTREAMENTO_OTLP_ENDPOINT (ex.: um OpenTelemetry Collector local).
+
+    Com RASTREAMENTO_ATIVO=false (padrão) nada é criado e os pontos instrumentados custam
+    só uma checagem de flag.
+    """
+
+    def __init__(self, app_settings: Settings | None = None) -> None:
+        cfg = app_settings or settings
+        self.settings = cfg
+        self.ativo = cfg.rastreamento_ativo
+        self.descartados = 0
+        self._fila: queue.Queue[Span | None] = queue.Queue(MAX_SPANS_PENDENTES)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def iniciar_span(
+        self,
+        nome: str,
+        tipo: str = "INTERNAL",
+        pai: Span | _SpanRemoto | None = None,
+        **atributos: Any,
+    ) -> Span:
+        """Span novo, filho de `pai` (padrão: o span atual); não vira o span atual."""
+        pai = pai or _span_atual.get()
+        if pai is None:
+            trace_id = os.urandom(16).hex()
+            amostrado = random.random() < self.settings.rastreamento_amostragem
+            return Span(nome, tipo, trace_id, None, amostrado, atributos)
+        return Span(nome, tipo, pai.trace_id, pai.span_id, pai.amostrado, atributos)
+
+    @contextmanager
+    def span(
+        self,
+        nome: str,
+        tipo: str = "INTERNAL",
+        pai: Span | _SpanRemoto | None = None,
+        **atributos: Any,
+    ) -> Iterator[Span]:
+        """Bloco cronometrado como span atual; exceções ficam registradas no status."""
+        if not self.ativo:
+            yield _SPAN_NULO
+            return
+        atual = self.iniciar_span(nome, tipo, pai, **atributos)
+        token = _span_atual.set(atual)
+        try:
+            yield atual
+        except BaseException as exc:
+            atual.finalizar(exc)
+            raise
+        finally:
+            _span_atual.reset(token)
+            atual.finalizar()
+
+    def rastrear_iterador(
+        self, nome: str, iteravel: AsyncIterator[T], **atributos: Any
+    ) -> AsyncIterator[T]:
+        """
+        Span que cobre um iterador assíncrono (ex.: streaming do LLM), aberto no primeiro item
+        pedido. O span é o atual só enquanto o iterador executa, nunca no código de quem
+        consome os itens.
+        """
+        if not self.ativo:
+            return iteravel
+        return self._rastrear_iterador(nome, atributos, iteravel)
+
+    async def _rastrear_iterador(
+        self, nome: str, atributos: dict[str, Any], iterador: AsyncIterator[T]
+    ) -> AsyncIterator[T]:
+        atual = self.iniciar_span(nome, **atributos)
+        erro: BaseException | None = None
+        try:
+            while True:
+                token = _span_atual.set(atual)
+                try:
+                    item = await anext(iterador)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _span_atual.reset(token)
+                yield item
+        except GeneratorExit:
+            raise  # consumidor parou antes do fim: não é erro
+        except BaseException as exc:
+            erro = exc
+            raise
+        finally:
+            fechar = getattr(iterador, "aclose", None)
+            if fechar is not None:
+                await fechar()
+            atual.finalizar(erro)
+
+    def rastreado(self, nome: str) -> Callable[[F], F]:
+        """Decorador: cada chamada da função (síncrona) vira um span `nome`."""
+
+        def decorador(funcao: F) -> F:
+            @functools.wraps(funcao)
+            def envoltorio(*args: Any, **kwargs: Any) -> Any:
+                if not self.ativo:
+                    return funcao(*args, **kwargs)
+                with self.span(nome):
+                    return funcao(*args, **kwargs)
+
+            return envoltorio  # type: ignore[return-value]
+
+        return decorador
+
+    def extrair(self, traceparent: str | None) -> _SpanRemoto | None:
+        """Contexto W3C de uma requisição recebida (cabeçalho `traceparent`), se válido."""
+        casamento = TRACEPARENT.match(traceparent.strip().lower()) if traceparent else None
+        if casamento is None or casamento.group(1) == "0" * 32:
+            return None
+        trace_id, span_id, flags = casamento.groups()
+        return _SpanRemoto(trace_id, span_id, bool(int(flags, 16) & 1))
+
+    def exportar(self, span: Span) -> None:
+        if self._thread is None:
+            self._iniciar_thread()
+        try:
+            self._fila.put_nowait(span)
+        except queue.Full:
+            self.descartados += 1
+
+    def parar(self) -> None:
+        """Exporta os spans pendentes e encerra a thread de exportação."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._fila.put(None)
+            thread.join(timeout=10)
+
+    def _iniciar_thread(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._exportar_em_lotes, name="rastreamento", daemon=True
+                )
+                self._thread.start()
+
+    def _exportar_em_lotes(self) -> None:
+        cfg = self.settings
+        cliente = httpx.Client(timeout=5) if cfg.rastreamento_otlp_endpoint else None
+        arquivo = Path(
+            cfg.rastreamento_arquivo
+            or Path(cfg.base_dir_conversas).expanduser().resolve().parent / "traces.jsonl"
+        ).expanduser()
+        recurso = {"attributes": [_atributo("service.name", cfg.rastreamento_servico)]}
+        encerrar = False
+        while not encerrar:
+            lote: list[Span] = []
+            try:
+                item = self._fila.get(timeout=1.0)
+                while item is not None:
+                    lote.append(item)
+                    if len(lote) >= LOTE_EXPORTACAO:
+                        break
+                    item = self._fila.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                encerrar = item is None
+            if not lote:
+                continue
+            corpo = {
+                "resourceSpans": [
+                    {
+                        "resource": recurso,
+                        "scopeSpans": [
+                            {"scope": {"name": "app"}, "spans": [span.otlp() for span in lote]}
+                        ],
+                    }
+                ]
+            }
+            try:
+                if cliente is not None:
+                    cliente.post(cfg.rastreamento_otlp_endpoint, json=corpo).raise_for_status()
+                else:
+                    arquivo.parent.mkdir(parents=True, exist_ok=True)
+                    with arquivo.open("a", encoding="utf-8") as saida:
+                        saida.write(json.dumps(corpo, ensure_ascii=False) + "\n")
+            except (OSError, httpx.HTTPError) as exc:
+                self.descartados += len(lote)
+                logger.warning(f"Falha ao exportar {len(lote)} spans: {exc}")
+        if cliente is not None:
+            cliente.close()
+
+
+class MiddlewareRastreamento:
+    """
+    Middleware ASGI que abre o span SERVER de cada requisição HTTP, continuando o trace do
+    cabeçalho `traceparent` quando ele vem, e devolve o `traceparent` na resposta.
+    """
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not rastreador.ativo:
+            await self.app(scope, receive, send)
+            return
+        cabecalhos = dict(scope.get("headers") or [])
+        remoto = rastreador.extrair(cabecalhos.get(b"traceparent", b"").decode("latin-1"))
+        metodo = scope.get("method", "")
+        with rastreador.span(
+            f"{metodo} {scope.get('path', '')}",
+            "SERVER",
+            pai=remoto,
+            **{"http.method": metodo, "http.target": scope.get("path", "")},
+        ) as atual:
+
+            async def enviar(mensagem: dict) -> None:
+                if mensagem["type"] == "http.response.start":
+                    atual.definir("http.status_code", mensagem["status"])
+                    if mensagem["status"] >= 500:
+                        atual.erro = f"HTTP {mensagem['status']}"
+                    mensagem.setdefault("headers", [])
+                    mensagem["headers"] = [
+                        *mensagem["headers"],
+                        (b"traceparent", atual.traceparent().encode("latin-1")),
+                    ]
+                await send(mensagem)
+
+            await self.app(scope, receive, enviar)
+
+
+def span_atual() -> Span | None:
+    return _span_atual.get()
+
+
+def cabecalhos_propagacao() -> dict[str, str]:
+    """Cabeçalho `traceparent` do span atual para chamadas HTTP de saída (vazio sem span)."""
+    atual = _span_atual.get()
+    return {"traceparent": atual.traceparent()} if atual is not None else {}
+
+
+def _atributo(chave: str, valor: Any) -> dict:
+    if isinstance(valor, bool):
+        return {"key": chave, "value": {"boolValue": valor}}
+    if isinstance(valor, int):
+        return {"key": chave, "value": {"intValue": str(valor)}}
+    if isinstance(valor, float):
+        return {"key": chave, "value": {"doubleValue": valor}}
+    return {"key": chave, "value": {"stringValue": str(valor)}}
+
+
+rastreador = Rastreador()
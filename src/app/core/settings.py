@@ -1,14 +1,99 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
-    llm_provider: str = "openai"  # openai | huggingface
+    llm_provider: str = "openai"  # openai | huggingface | fake (local, para testes de carga)
     openai_api_key: str | None = None
     huggingface_api_key: str | None = None
     model_llm: str = "gpt-4.1"
     model_embeddings: str = "text-embedding-3-large"
+    llm_temperatura: float = 0.2
+    llm_coalescer_chamadas: bool = True  # chamadas idênticas simultâneas dividem uma requisição
+    llm_prompt_cache_key: bool = True  # envia prompt_cache_key (hash do prefixo estável) ao OpenAI
     base_dir_saida: str = "./saida"
     base_dir_conversas: str = "./data/conversas"
     git_auto_commit: bool = False
+    git_agrupar_commits_segundos: float = 0.0  # >0: junta commits do mesmo repo nessa janela
+    gerar_max_concorrencia: int = 4  # chamadas simultâneas ao LLM no modo paralelo de /v1/gerar
+    gerar_arquivos_por_grupo: int = 1
+    gerar_tentativas: int = 3
+    gerar_jobs_workers: int = 2  # gerações simultâneas em segundo plano (/v1/gerar/jobs)
+    gerar_jobs_fila_maxima: int = 100
+    gerar_jobs_dir: str | None = None  # padrão: <pai de base_dir_conversas>/jobs
+    gerar_jobs_retencao_segundos: float = 7 * 24 * 3600  # jobs encerrados são apagados (0 mantém)
+    manifestos_dir: str | None = None  # padrão: <pai de base_dir_conversas>/manifestos
+    conversas_backend: str = "arquivos"  # arquivos | sqlite
+    conversas_sqlite_path: str | None = None  # padrão: <base_dir_conversas>/conversas.db
+    conversas_limite_padrao: int = 100  # itens por página em GET /v1/conversas?cursor= sem limite
+    conversas_limite_maximo: int = 500
+    conversas_append_only: bool = False  # grava só as mensagens novas em <id>.log.jsonl
+    conversas_log_max_bytes: int = 256 * 1024  # compacta o log no JSON acima deste tamanho
+
+    # orçamento de contexto do chat: tokens estimados do histórico enviado ao LLM (0 desativa)
+    contexto_max_tokens: int = 6000
+    contexto_resumo_max_tokens: int = 600
+
+    # pool HTTP compartilhado pelo LLMClient
+    http_max_conexoes: int = 100
+    http_max_conexoes_keepalive: int = 20
+    http_keepalive_expiracao: float = 30.0
+    http_http2: bool = True
+
+    # resiliência das chamadas ao LLM: novas tentativas, timeouts por fase e hedging
+    llm_tentativas: int = 3  # inclui a primeira; repete falhas de rede, 429 e 5xx
+    llm_backoff_base: float = 0.5
+    llm_backoff_maximo: float = 20.0  # também limita a espera pedida via Retry-After
+    llm_timeout_conexao: float = 10.0
+    llm_timeout_leitura: float = 120.0  # entre bytes recebidos (no streaming, entre trechos)
+    llm_timeout_total: float = 240.0  # por tentativa
+    llm_hedging: bool = False
+    llm_hedging_atraso_padrao: float = 5.0  # usado até haver amostras para o p95
+
+    # controle de admissão das rotas que chamam o LLM (0 desativa cada limite)
+    admissao_max_concorrencia: int = 16  # chamadas simultâneas ao provedor no processo
+    admissao_fila_maxima: int = 64  # chamadas aguardando vaga; além disso responde 503
+    admissao_espera_maxima: float = 60.0  # segundos na fila antes do 503
+    admissao_requisicoes_cliente: int = 4  # requisições simultâneas por cliente (429)
+    admissao_taxa_cliente: float = 1.0  # requisições por segundo por cliente (token bucket)
+    admissao_rajada_cliente: int = 10
+
+    # cache de respostas do LLM (opt-in): memória (LRU) + disco com TTL e limite de tamanho
+    llm_cache_ativo: bool = False
+    llm_cache_dir: str | None = None  # padrão: <pai de base_dir_conversas>/cache_llm
+    llm_cache_memoria_itens: int = 256
+    llm_cache_disco_max_bytes: int = 100 * 1024 * 1024
+    llm_cache_ttl_segundos: float = 7 * 24 * 3600
+
+    # LLM_PROVIDER=fake: provedor local determinístico (sem rede) para testes de carga
+    llm_fake_latencia_ms: float = 300.0  # média até o primeiro byte
+    llm_fake_latencia_desvio_ms: float = 100.0
+    # constante | uniforme | normal | exponencial | lognormal
+    llm_fake_latencia_distribuicao: str = "lognormal"
+    llm_fake_tamanho_resposta: int = 4000  # caracteres gerados por resposta
+    llm_fake_trecho_caracteres: int = 64  # tamanho de cada trecho no streaming
+    llm_fake_intervalo_trecho_ms: float = 5.0
+    llm_fake_taxa_429: float = 0.0  # fração das requisições que recebem 429
+    llm_fake_taxa_5xx: float = 0.0
+    llm_fake_taxa_json_invalido: float = 0.0
+    llm_fake_semente: int | None = None
+    llm_fake_resposta_arquivo: str | None = None  # devolve sempre o conteúdo deste arquivo
+
+    # rastreamento no modelo do OpenTelemetry (W3C traceparent, exportação OTLP/JSON)
+    rastreamento_ativo: bool = False
+    rastreamento_amostragem: float = 1.0  # fração dos traces novos que é exportada
+    rastreamento_arquivo: str | None = None  # padrão: <pai de base_dir_conversas>/traces.jsonl
+    rastreamento_otlp_endpoint: str | None = None  # ex.: http://localhost:4318/v1/traces
+    rastreamento_servico: str = "agente-dev"
+
+    # logs: JSON (orjson) ou texto, gravados por uma thread própria; amostragem por logger
+    log_formato: str = "json"  # json | texto
+    log_assincrono: bool = True
+    log_acesso: bool = True  # uma linha por requisição com status, latência e request_id
+    log_amostragem_acesso: float = 1.0  # fração das linhas de acesso 2xx/3xx mantidas
+    log_amostragem: str = ""  # ex.: "httpx=0.1,app.adapters.llm_client=0.2" (só abaixo de WARNING)
+
+    # pool de threads para I/O de disco (conversas, arquivos gerados, git) fora do event loop
+    io_max_workers: int = 8
+    fs_escrita_workers: int = 4  # threads por lote de arquivos gravado pelo Writer
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -1,17 +1,60 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any, AsyncIterator
 
+import orjson
 from fastapi import FastAPI
+from fastapi.datastructures import Default
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from app.adapters.llm_client import fechar_http_client, iniciar_http_client
 from app.api.chat import router as chat_router
 from app.api.conversas import router as conversas_router
 from app.api.gerar import router as gerar_router
 from app.api.saude import router as saude_router
-from app.core.logging_config import configurar_logging
+from app.core.concorrencia import encerrar_executor_io, iniciar_executor_io
+from app.core.logging_config import MiddlewareContextoLog, configurar_logging
+from app.core.metricas import monitor_event_loop
+from app.core.rastreamento import MiddlewareRastreamento, rastreador
+from app.services.jobs_gerar import fila_gerar
 
 configurar_logging()
-app = FastAPI(title="Agente Dev", version="0.1.0")
+
+
+class RespostaJSONRapida(JSONResponse):
+    """JSONResponse serializada com orjson (UTF-8 direto, sem o encoder da stdlib)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    iniciar_http_client()
+    iniciar_executor_io()
+    monitor_event_loop.iniciar()
+    await fila_gerar.iniciar()
+    try:
+        yield
+    finally:
+        await fila_gerar.parar()
+        await monitor_event_loop.parar()
+        await fechar_http_client()
+        encerrar_executor_io()
+        rastreador.parar()
+
+
+# como Default(...), rotas com response_model seguem no caminho do FastAPI que serializa
+# direto em bytes pelo Pydantic; as que devolvem dicts (/health, /saude) usam orjson
+app = FastAPI(
+    title="Agente Dev",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=Default(RespostaJSONRapida),
+)
+app.add_middleware(MiddlewareContextoLog)  # por dentro do span: o log de acesso leva o trace_id
+app.add_middleware(MiddlewareRastreamento)
 
 
 @app.get("/health")
@@ -37,6 +37,10 @@ class RequisicaoChat(BaseModel):
     conversa_id: str | None = Field(
         default=None, description="Identificador da conversa para histórico persistido"
     )
+    usar_cache: bool = Field(
+        default=True,
+        description="Reaproveita respostas do cache do LLM (quando LLM_CACHE_ATIVO=true)",
+    )
 
     @field_validator("mensagens")
     @classmethod
@@ -12,6 +12,21 @@ class MensagemArmazenada(BaseModel):
     timestamp: datetime | None = Field(
         default=None, description="Momento em que a mensagem foi registrada (UTC)"
     )
+    tokens: int | None = Field(
+        default=None, description="Estimativa de tokens do conteúdo (orçamento de contexto)"
+    )
+
+
+class ResumoConversa(BaseModel):
+    texto: str = Field(..., description="Resumo acumulado das mensagens mais antigas")
+    ate: int = Field(..., ge=0, description="Quantidade de mensagens iniciais cobertas pelo resumo")
+
+
+class ContextoConversa(BaseModel):
+    """O que o orçamento de contexto precisa do histórico salvo, sem o conteúdo das mensagens."""
+
+    resumo: ResumoConversa | None = None
+    tokens: list[int | None] = Field(default_factory=list)
 
 
 class ConversaResumo(BaseModel):
@@ -25,3 +40,11 @@ class ConversaResumo(BaseModel):
 
 class ConversaDetalhe(ConversaResumo):
     mensagens: list[MensagemArmazenada]
+    resumo: ResumoConversa | None = None
+
+
+class PaginaConversas(BaseModel):
+    itens: list[ConversaResumo]
+    proximo_cursor: str | None = Field(
+        default=None, description="Cursor para a próxima página (None quando não há mais itens)"
+    )
@@ -1,4 +1,8 @@
 from __future__ import annotations
+
+from datetime import datetime
+from typing import Literal
+
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -12,6 +16,14 @@ class RequisicaoGerar(BaseModel):
         default=False, description="Permite sobrescrever arquivos já existentes"
     )
     git: bool = Field(default=False, description="Inicializa repositório Git e cria commit")
+    paralelo: bool = Field(
+        default=False,
+        description="Gera cada arquivo (ou pequeno grupo) em uma chamada ao LLM, em paralelo",
+    )
+    usar_cache: bool = Field(
+        default=True,
+        description="Reaproveita respostas do cache do LLM (quando LLM_CACHE_ATIVO=true)",
+    )
 
     @field_validator("objetivo")
     @classmethod
@@ -34,3 +46,20 @@ class RespostaGerar(BaseModel):
     plano: dict
     arquivos: list[str]
     commit: str | None = None
+
+
+class ProgressoJob(BaseModel):
+    etapa: Literal["na_fila", "planejado", "gerando", "escrevendo", "commit", "fim"] = "na_fila"
+    feitos: int = Field(default=0, description="Arquivos já gerados/escritos na etapa atual")
+    total: int = Field(default=0, description="Total de arquivos do plano")
+
+
+class JobGerar(BaseModel):
+    id: str
+    estado: Literal["na_fila", "executando", "concluido", "falhou"] = "na_fila"
+    progresso: ProgressoJob = Field(default_factory=ProgressoJob)
+    requisicao: RequisicaoGerar
+    resultado: RespostaGerar | None = None
+    erro: str | None = None
+    criado_em: datetime
+    atualizado_em: datetime
@@ -2,19 +2,32 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
 from pathlib import Path
-from typing import Sequence
+from typing import AsyncIterator, Callable, Sequence
 
 import typer
+from loguru import logger
 
 from app.adapters.git_client import GitClient
-from app.adapters.llm_client import LLMClient
+from app.adapters.llm_client import LLMClient, fechar_http_client
+from app.core.concorrencia import executar_io
+from app.core.errors import ErroLLM
+from app.core.metricas import duracao_etapa
+from app.core.rastreamento import rastreador
 from app.core.settings import Settings
+from app.schemas.conversa import ContextoConversa, ResumoConversa
+from app.services.conversas import ConversasService
+from app.services.contexto import OrcamentoContexto
+from app.services.conversas_sqlite import ConversasSQLiteService
 from app.services.planner import Planner
 from app.services.prompt_base import PROMPT_BASE_SENIOR
 from app.services.writer import Writer
+from app.utils.blocos import eh_passos_execucao, extrair_blocos, extrair_blocos_async
 
 LLMMessage = dict[str, str]
+Progresso = Callable[[str, int, int], None]  # (etapa, feitos, total)
+ARQUIVO_PASSOS_EXECUCAO = "PASSOS_EXECUCAO.md"
 
 app_cli = typer.Typer()
 
@@ -24,15 +37,37 @@ class AgenteDev:
     Orquestra o fluxo de conversa, planejamento e escrita dos arquivos.
     """
 
-    def __init__(self, app_settings: Settings | None = None) -> None:
+    def __init__(self, app_settings: Settings | None = None, llm: LLMClient | None = None) -> None:
         self.settings = app_settings or Settings()
+        self.llm = llm or LLMClient()
 
-    async def conversar(self, mensagens: Sequence[LLMMessage], contexto: str | None) -> str:
-        prompt: list[LLMMessage] = [{"role": "system", "content": PROMPT_BASE_SENIOR}]
-        if contexto:
-            prompt.append({"role": "system", "content": f"Contexto: {contexto}"})
-        prompt.extend(mensagens)
-        return await LLMClient().chat(prompt)
+    async def limitar_historico(
+        self, mensagens: Sequence[LLMMessage], salvo: ContextoConversa | None = None
+    ) -> tuple[list[LLMMessage], ResumoConversa | None]:
+        """
+        Aplica o orçamento de contexto ao histórico antes de `conversar`; devolve as mensagens
+        a enviar e, quando o resumo acumulado foi refeito, o novo resumo a persistir.
+        """
+        return await OrcamentoContexto(self.llm, self.settings).aplicar(mensagens, salvo)
+
+    async def conversar(
+        self, mensagens: Sequence[LLMMessage], contexto: str | None, usar_cache: bool = True
+    ) -> str:
+        with rastreador.span("agente.conversar", **{"agente.mensagens": len(mensagens)}):
+            prompt, prefixo = self._montar_prompt_conversa(mensagens, contexto)
+            return await self.llm.chat(prompt, usar_cache=usar_cache, prefixo=prefixo)
+
+    async def conversar_stream(
+        self, mensagens: Sequence[LLMMessage], contexto: str | None, usar_cache: bool = True
+    ) -> AsyncIterator[str]:
+        """Igual a `conversar`, mas repassa os trechos da resposta conforme chegam."""
+        prompt, prefixo = self._montar_prompt_conversa(mensagens, contexto)
+        async for trecho in rastreador.rastrear_iterador(
+            "agente.conversar",
+            self.llm.chat_stream(prompt, usar_cache=usar_cache, prefixo=prefixo),
+            **{"agente.mensagens": len(mensagens), "agente.stream": True},
+        ):
+            yield trecho
 
     async def gerar_projeto(
         self,
@@ -40,29 +75,105 @@ class AgenteDev:
         path_saida: str | None,
         overwrite: bool,
         git: bool,
+        paralelo: bool = False,
+        usar_cache: bool = True,
+        progresso: Progresso | None = None,
     ):
-        planner = Planner()
-        plano = planner.planejar(objetivo)
+        """
+        Planeja, gera e escreve o projeto (com commit opcional). `progresso`, se informado,
+        recebe (etapa, feitos, total) nas etapas planejado, gerando, escrevendo e commit.
+        """
+
+        def avisar(etapa: str, feitos: int = 0, total: int = 0) -> None:
+            if progresso is not None:
+                progresso(etapa, feitos, total)
+
+        with duracao_etapa.medir(rota="gerar", etapa="planejar"):
+            plano = Planner().planejar(objetivo)
         base_rel: str = plano["base"]
         if base_rel and not base_rel.endswith("/"):
             base_rel = f"{base_rel}/"
 
         arquivos = plano["arquivos"]
-        prompt = self._montar_prompt_geracao(objetivo, arquivos, base_rel.rstrip("/"))
-        resposta = await LLMClient().chat(prompt)
-
-        pares, passos_execucao = self._extrair_arquivos(resposta)
-
         destino_root = Path(path_saida or self.settings.base_dir_saida).expanduser()
         writer = Writer(str(destino_root))
-        escritos = writer.escrever_pares(base_rel, pares, overwrite=overwrite)
+        passos_execucao: str | None = None
+        total_arquivos = len(arquivos) + 1  # + PASSOS_EXECUCAO.md
+        escritos_ate_agora: list[str] = []
+
+        def ao_escrever(caminho: str) -> None:
+            escritos_ate_agora.append(caminho)
+            avisar("escrevendo", len(escritos_ate_agora), total_arquivos)
+
+        avisar("planejado", 0, total_arquivos)
+        if paralelo:
+            avisar("gerando", 0, total_arquivos)
+            with duracao_etapa.medir(rota="gerar", etapa="gerar"):
+                pares_gerados, falhas = await self._gerar_em_paralelo(
+                    objetivo,
+                    [*arquivos, ARQUIVO_PASSOS_EXECUCAO],
+                    base_rel.rstrip("/"),
+                    usar_cache,
+                    lambda feitos: avisar("gerando", feitos, total_arquivos),
+                )
+            if not pares_gerados:
+                raise ErroLLM(f"Nenhum arquivo foi gerado. Falharam: {', '.join(falhas)}")
+            if falhas:
+                plano["arquivos_com_falha"] = falhas
+            passos_execucao = next(
+                (conteudo for caminho, conteudo in pares_gerados if eh_passos_execucao(caminho)),
+                None,
+            )
+            with duracao_etapa.medir(rota="gerar", etapa="escrever"):
+                lote = await executar_io(
+                    writer.escrever_pares,
+                    base_rel,
+                    pares_gerados,
+                    overwrite=overwrite,
+                    ao_escrever=ao_escrever,
+                )
+        else:
+            prompt = self._montar_prompt_geracao(objetivo, arquivos, base_rel.rstrip("/"))
+            avisar("gerando", 0, total_arquivos)
+            segundos_llm = 0.0
+
+            async def pares() -> AsyncIterator[tuple[str, str]]:
+                # só o tempo esperando o stream conta como "gerar"; o resto é do Writer
+                nonlocal passos_execucao, segundos_llm
+                recebidos = 0
+                marca = time.perf_counter()
+                async for caminho, conteudo in extrair_blocos_async(
+                    self.llm.chat_stream(prompt, usar_cache=usar_cache)
+                ):
+                    segundos_llm += time.perf_counter() - marca
+                    if eh_passos_execucao(caminho):
+                        passos_execucao = conteudo
+                    yield caminho, conteudo
+                    recebidos += 1
+                    avisar("gerando", recebidos, total_arquivos)
+                    marca = time.perf_counter()
+                segundos_llm += time.perf_counter() - marca
+
+            inicio = time.perf_counter()
+            lote = await writer.escrever_pares_async(
+                base_rel, pares(), overwrite=overwrite, ao_escrever=ao_escrever
+            )
+            duracao_etapa.observar(segundos_llm, rota="gerar", etapa="gerar")
+            duracao_etapa.observar(
+                time.perf_counter() - inicio - segundos_llm, rota="gerar", etapa="escrever"
+            )
+        escritos = lote.escritos
+        plano["alteracoes"] = lote.relatorio()
 
         commit_hash: str | None = None
         if git:
+            avisar("commit", len(escritos), total_arquivos)
             repo_dir = destino_root / Path(base_rel)
-            commit_hash = GitClient(str(repo_dir)).commit_tudo(
-                f"feat: projeto gerado - {objetivo}"
-            )
+            with duracao_etapa.medir(rota="gerar", etapa="commit"):
+                git_client = await executar_io(GitClient, str(repo_dir))
+                commit_hash = await git_client.commit_async(
+                    f"feat: projeto gerado - {objetivo}", lote.alterados()
+                )
 
         if passos_execucao:
             plano["passos_execucao"] = passos_execucao
@@ -70,6 +181,21 @@ class AgenteDev:
 
         return plano, escritos, commit_hash
 
+    def _montar_prompt_conversa(
+        self, mensagens: Sequence[LLMMessage], contexto: str | None
+    ) -> tuple[list[LLMMessage], int]:
+        """
+        Monta o prompt do mais estável para o mais variável, para que o cache de prompt do
+        provedor reaproveite o início: PROMPT_BASE_SENIOR (fixo), o contexto da conversa,
+        o resumo acumulado e o histórico. Retorna também o tamanho do prefixo estável.
+        """
+        prompt: list[LLMMessage] = [{"role": "system", "content": PROMPT_BASE_SENIOR}]
+        if contexto:
+            prompt.append({"role": "system", "content": f"Contexto: {contexto.strip()}"})
+        prefixo = len(prompt)
+        prompt.extend(mensagens)
+        return prompt, prefixo
+
     def _montar_prompt_geracao(
         self,
         objetivo: str,
@@ -94,31 +220,127 @@ class AgenteDev:
             {"role": "user", "content": user},
         ]
 
-    def _extrair_arquivos(self, resposta: str) -> tuple[list[tuple[str, str]], str | None]:
-        pares: list[tuple[str, str]] = []
-        passos_execucao: str | None = None
+    async def _gerar_em_paralelo(
+        self,
+        objetivo: str,
+        arquivos: Sequence[str],
+        base_rel: str,
+        usar_cache: bool = True,
+        ao_gerar: Callable[[int], None] | None = None,
+    ) -> tuple[list[tuple[str, str]], list[str]]:
+        """
+        Gera os arquivos em grupos independentes (GERAR_ARQUIVOS_POR_GRUPO), com no máximo
+        GERAR_MAX_CONCORRENCIA chamadas simultâneas e novas tentativas por grupo apenas para
+        os arquivos que faltaram (ou resposta inválida); falhas de rede/429/5xx já repetidas
+        pelo LLMClient não são repetidas de novo. Erros da admissão cancelam os demais grupos.
+        Retorna os pares na ordem do plano e os arquivos que falharam.
+        `ao_gerar` recebe o total de arquivos já gerados a cada grupo concluído.
+        """
+        tamanho = max(1, self.settings.gerar_arquivos_por_grupo)
+        grupos = [list(arquivos[i : i + tamanho]) for i in range(0, len(arquivos), tamanho)]
+        semaforo = asyncio.Semaphore(max(1, self.settings.gerar_max_concorrencia))
+        gerados_ate_agora = 0
 
-        blocos = resposta.split("```")
-        for indice in range(1, len(blocos), 2):
-            bloco = blocos[indice].strip()
-            if not bloco:
-                continue
+        async def gerar(grupo: list[str]) -> dict[str, str]:
+            nonlocal gerados_ate_agora
+            parcial = await self._gerar_grupo(
+                semaforo, objetivo, arquivos, grupo, base_rel, usar_cache
+            )
+            gerados_ate_agora += len(parcial)
+            if ao_gerar is not None:
+                ao_gerar(gerados_ate_agora)
+            return parcial
 
-            primeira_linha, sep, restante = bloco.partition("\n")
-            if not sep:
-                continue
+        tarefas = [asyncio.create_task(gerar(grupo)) for grupo in grupos]
+        try:
+            resultados = await asyncio.gather(*tarefas)
+        except BaseException:
+            # ex.: 429/503 da admissão; sem isso os outros grupos seguiriam chamando o LLM
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            raise
 
-            caminho = primeira_linha.strip().strip("/")
-            conteudo = restante.rstrip()
-            if not caminho or not conteudo:
-                continue
+        gerados: dict[str, str] = {}
+        for parcial in resultados:
+            gerados.update(parcial)
+        pares = [(arquivo, gerados[arquivo]) for arquivo in arquivos if arquivo in gerados]
+        falhas = [arquivo for arquivo in arquivos if arquivo not in gerados]
+        return pares, falhas
 
-            if caminho.lower() in {"passos_execucao.md", "passos_execucao.txt"}:
-                passos_execucao = conteudo
+    async def _gerar_grupo(
+        self,
+        semaforo: asyncio.Semaphore,
+        objetivo: str,
+        arquivos: Sequence[str],
+        grupo: Sequence[str],
+        base_rel: str,
+        usar_cache: bool = True,
+    ) -> dict[str, str]:
+        gerados: dict[str, str] = {}
+        pendentes = list(grupo)
+        for tentativa in range(1, max(1, self.settings.gerar_tentativas) + 1):
+            prompt = self._montar_prompt_grupo(objetivo, arquivos, pendentes, base_rel)
+            try:
+                async with semaforo:
+                    # sistema + preâmbulo do projeto são iguais em todos os grupos
+                    resposta = await self.llm.chat(prompt, usar_cache=usar_cache, prefixo=2)
+            except ErroLLM as exc:
+                logger.warning(f"Falha ao gerar {pendentes} (tentativa {tentativa}): {exc.detail}")
+                if exc.tentativas_esgotadas:
+                    break  # repetir aqui multiplicaria as tentativas já feitas pelo LLMClient
+                continue
+            for caminho, conteudo in extrair_blocos(resposta):
+                arquivo = self._casar_arquivo(caminho, pendentes, base_rel)
+                if arquivo is not None:
+                    gerados[arquivo] = conteudo
+            pendentes = [arquivo for arquivo in pendentes if arquivo not in gerados]
+            if not pendentes:
+                break
+        return gerados
 
-            pares.append((caminho, conteudo))
+    def _casar_arquivo(self, caminho: str, pendentes: Sequence[str], base_rel: str) -> str | None:
+        if base_rel and caminho.startswith(f"{base_rel}/"):
+            caminho = caminho[len(base_rel) + 1 :]
+        for arquivo in pendentes:
+            if caminho == arquivo or caminho.lower() == arquivo.lower():
+                return arquivo
+        return None
 
-        return pares, passos_execucao
+    def _montar_prompt_grupo(
+        self,
+        objetivo: str,
+        arquivos: Sequence[str],
+        grupo: Sequence[str],
+        base_rel: str,
+    ) -> list[LLMMessage]:
+        # o preâmbulo (objetivo + plano completo) é idêntico em todas as chamadas do projeto;
+        # só o trecho final muda, com os arquivos que esta chamada deve produzir
+        lista_arquivos = "\n".join(f"- {arquivo}" for arquivo in arquivos)
+        destino = base_rel or "."
+        preambulo = (
+            f"OBJETIVO: {objetivo}\n\n"
+            f"O projeto em '{destino}' é composto pelos arquivos abaixo, gerados em paralelo "
+            "por chamadas independentes. Mantenha nomes, imports e configurações coerentes "
+            "com esse plano completo:\n"
+            f"{lista_arquivos}\n\n"
+            "Formato de resposta OBRIGATÓRIO para cada arquivo:\n"
+            "```{caminho_do_arquivo}\n"
+            "{CONTEUDO INTEGRAL}\n"
+            "```\n"
+        )
+        pedido = "Nesta resposta, gere SOMENTE estes arquivos:\n" + "\n".join(
+            f"- {arquivo}" for arquivo in grupo
+        )
+        if any(eh_passos_execucao(arquivo) for arquivo in grupo):
+            pedido += (
+                "\n\nEm PASSOS_EXECUCAO.md descreva os passos de execução (make run/test, docker)."
+            )
+        return [
+            {"role": "system", "content": PROMPT_BASE_SENIOR},
+            {"role": "user", "content": preambulo},
+            {"role": "user", "content": pedido},
+        ]
 
 
 @app_cli.command("gerar")
@@ -130,6 +352,8 @@ def cli_gerar(
     ),
     overwrite: bool = typer.Option(False, help="Permitir sobrescrever arquivos existentes"),
     git: bool = typer.Option(False, help="Efetuar commit automático após a escrita"),
+    paralelo: bool = typer.Option(False, help="Gerar um arquivo (ou grupo) por chamada ao LLM"),
+    cache: bool = typer.Option(True, help="Reaproveitar respostas do cache do LLM, se ativo"),
 ) -> None:
     """
     Interface CLI que invoca o agente e imprime o resultado em JSON.
@@ -137,7 +361,12 @@ def cli_gerar(
 
     async def _run() -> None:
         agente = AgenteDev()
-        plano, escritos, commit_hash = await agente.gerar_projeto(objetivo, path_saida, overwrite, git)
+        try:
+            plano, escritos, commit_hash = await agente.gerar_projeto(
+                objetivo, path_saida, overwrite, git, paralelo, cache
+            )
+        finally:
+            await fechar_http_client()
         print(
             json.dumps(
                 {"plano": plano, "arquivos": escritos, "commit": commit_hash},
@@ -149,5 +378,34 @@ def cli_gerar(
     asyncio.run(_run())
 
 
+@app_cli.command("reindexar-conversas")
+def cli_reindexar_conversas(
+    base_dir: str | None = typer.Option(
+        None, help="Diretório das conversas (padrão definido nas configurações)"
+    ),
+) -> None:
+    """
+    Reconstrói o índice de conversas a partir dos arquivos JSON (recuperação).
+    """
+    servico = ConversasService(base_dir)
+    # sem índice, o próprio construtor já varreu o diretório: não repete a varredura
+    total = servico.total() if servico.indice_reconstruido else servico.reconstruir_indice()
+    print(json.dumps({"conversas_indexadas": total}, ensure_ascii=False, indent=2))
+
+
+@app_cli.command("migrar-conversas-sqlite")
+def cli_migrar_conversas_sqlite(
+    base_dir: str | None = typer.Option(
+        None, help="Diretório das conversas (padrão definido nas configurações)"
+    ),
+) -> None:
+    """
+    Importa as conversas em JSON para o banco SQLite (CONVERSAS_SQLITE_PATH).
+    """
+    origem = ConversasService(base_dir)
+    total = ConversasSQLiteService(base_dir).migrar_de_arquivos(origem)
+    print(json.dumps({"conversas_migradas": total}, ensure_ascii=False, indent=2))
+
+
 if __name__ == "__main__":
     app_cli()
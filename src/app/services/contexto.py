@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+from loguru import logger
+
+from app.adapters.llm_client import LLMClient
+from app.core.errors import ErroLLM
+from app.core.settings import Settings
+from app.schemas.conversa import ContextoConversa, ResumoConversa
+from app.utils.tokens import CARACTERES_POR_TOKEN, TOKENS_POR_MENSAGEM, estimar_tokens
+
+LLMMessage = dict[str, str]
+PAPEIS_RESUMO = {"user": "Usuário", "assistant": "Agente", "system": "Sistema"}
+PROMPT_RESUMO = (
+    "Você mantém o resumo de uma conversa entre um usuário e um agente de desenvolvimento. "
+    "Atualize o resumo anterior incorporando as novas mensagens. Preserve decisões, "
+    "requisitos, tecnologias, nomes de arquivos e pendências; descarte cortesias e "
+    "repetições. Responda apenas com o texto do resumo."
+)
+
+
+class OrcamentoContexto:
+    """
+    Mantém o histórico enviado ao LLM dentro de CONTEXTO_MAX_TOKENS.
+
+    As mensagens recentes entram inteiras (janela deslizante) e as anteriores ficam
+    condensadas em um resumo acumulado, persistido pelo ConversasService. O resumo só é
+    refeito quando a janela estoura o orçamento; nesse momento a janela volta para metade
+    do orçamento, então os turnos seguintes reaproveitam o mesmo resumo. A última mensagem
+    sempre vai inteira, mesmo que sozinha passe do orçamento.
+    """
+
+    def __init__(self, llm: LLMClient, app_settings: Settings | None = None) -> None:
+        self.llm = llm
+        self.settings = app_settings or Settings()
+
+    async def aplicar(
+        self, mensagens: Sequence[LLMMessage], salvo: ContextoConversa | None = None
+    ) -> tuple[list[LLMMessage], ResumoConversa | None]:
+        """
+        Retorna as mensagens a enviar (com o resumo como mensagem de sistema, se houver)
+        e o novo resumo a persistir, ou None quando o resumo salvo continua valendo.
+        """
+        orcamento = self.settings.contexto_max_tokens
+        if orcamento <= 0:
+            return list(mensagens), None
+
+        tokens = self._tokens(mensagens, salvo)
+        resumo = salvo.resumo if salvo else None
+        if resumo is not None and resumo.ate > len(mensagens):
+            resumo = None  # histórico editado no cliente antes do ponto resumido
+        inicio = resumo.ate if resumo else 0
+        tokens_resumo = estimar_tokens(resumo.texto) + TOKENS_POR_MENSAGEM if resumo else 0
+
+        if tokens_resumo + sum(tokens[inicio:]) <= orcamento:
+            return self._com_resumo(resumo, mensagens[inicio:]), None
+
+        # a janela estourou: mantém as mensagens mais recentes até metade do orçamento
+        novo_inicio = len(mensagens) - 1
+        acumulado = tokens[novo_inicio]
+        while novo_inicio > inicio and acumulado + tokens[novo_inicio - 1] <= orcamento // 2:
+            novo_inicio -= 1
+            acumulado += tokens[novo_inicio]
+        if novo_inicio <= inicio:
+            return self._com_resumo(resumo, mensagens[inicio:]), None
+
+        try:
+            novo_resumo = await self._resumir(resumo, mensagens[inicio:novo_inicio], novo_inicio)
+        except ErroLLM as exc:
+            # sem resumo novo, cai para a janela deslizante pura (as mensagens antigas saem)
+            logger.warning(f"Falha ao resumir o histórico, truncando a janela: {exc.detail}")
+            return self._com_resumo(resumo, mensagens[novo_inicio:]), None
+        return self._com_resumo(novo_resumo, mensagens[novo_inicio:]), novo_resumo
+
+    def _tokens(
+        self, mensagens: Sequence[LLMMessage], salvo: ContextoConversa | None
+    ) -> list[int]:
+        """Usa a estimativa guardada em cada mensagem salva e só calcula as que faltam."""
+        guardados = salvo.tokens if salvo else []
+        tokens: list[int] = []
+        for posicao, mensagem in enumerate(mensagens):
+            estimativa = guardados[posicao] if posicao < len(guardados) else None
+            if estimativa is None:
+                estimativa = estimar_tokens(mensagem.get("content", ""))
+            tokens.append(estimativa + TOKENS_POR_MENSAGEM)
+        return tokens
+
+    def _com_resumo(
+        self, resumo: ResumoConversa | None, mensagens: Sequence[LLMMessage]
+    ) -> list[LLMMessage]:
+        if resumo is None:
+            return list(mensagens)
+        return [
+            {"role": "system", "content": f"Resumo da conversa até aqui:\n{resumo.texto}"},
+            *mensagens,
+        ]
+
+    async def _resumir(
+        self, anterior: ResumoConversa | None, mensagens: Sequence[LLMMessage], ate: int
+    ) -> ResumoConversa:
+        limite = self.settings.contexto_resumo_max_tokens
+        transcricao = "\n\n".join(
+            f"{PAPEIS_RESUMO.get(m.get('role', 'user'), 'Usuário')}: {m.get('content', '')}"
+            for m in mensagens
+        )
+        pedido = (
+            f"Resumo anterior:\n{anterior.texto if anterior else '(vazio)'}\n\n"
+            f"Novas mensagens:\n{transcricao}\n\n"
+            f"Escreva o resumo atualizado em no máximo {limite * 3 // 4} palavras."
+        )
+        texto = await self.llm.chat(
+            [{"role": "system", "content": PROMPT_RESUMO}, {"role": "user", "content": pedido}]
+        )
+        return ResumoConversa(texto=texto.strip()[: limite * CARACTERES_POR_TOKEN], ate=ate)
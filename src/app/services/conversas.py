@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-import json
+import base64
+import binascii
+import hashlib
+import os
 import re
 import shutil
 import uuid
@@ -8,18 +11,85 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Sequence
 
+import orjson
+
+from app.core.metricas import bytes_escritos
+from app.core.rastreamento import rastreador
 from app.core.settings import settings
 from app.schemas.chat import MensagemChat
-from app.schemas.conversa import ConversaDetalhe, ConversaResumo, MensagemArmazenada
+from app.schemas.conversa import (
+    ContextoConversa,
+    ConversaDetalhe,
+    ConversaResumo,
+    MensagemArmazenada,
+    PaginaConversas,
+    ResumoConversa,
+)
+from app.services.indice_conversas import IndiceConversas
+from app.utils.tokens import estimar_tokens
+
+
+def criar_conversas_service(base_dir: str | None = None) -> ConversasService:
+    """Instancia o backend de conversas definido em CONVERSAS_BACKEND (arquivos | sqlite)."""
+    backend = settings.conversas_backend.lower()
+    if backend == "sqlite":
+        from app.services.conversas_sqlite import ConversasSQLiteService
+
+        return ConversasSQLiteService(base_dir)
+    if backend != "arquivos":
+        raise ValueError("CONVERSAS_BACKEND inválido. Use 'arquivos' ou 'sqlite'.")
+    return ConversasService(base_dir)
 
 
 class ConversasService:
     def __init__(self, base_dir: str | None = None) -> None:
         self.base_dir = Path(base_dir or settings.base_dir_conversas).expanduser().resolve()
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._inicializar_armazenamento()
+
+    def _inicializar_armazenamento(self) -> None:
+        self.indice = IndiceConversas.para(self.base_dir)
+        self.indice_reconstruido = not self.indice.existe()
+        if self.indice_reconstruido:
+            self.reconstruir_indice()
+
+    def diretorio(self, conversa_id: str) -> Path:
+        """Pasta da conversa, onde também ficam os projetos gerados pelo chat."""
+        return self.base_dir / conversa_id
+
+    @rastreador.rastreado("conversas.listar")
+    def listar(
+        self,
+        limite: int | None = None,
+        cursor: str | None = None,
+        prefixo: str | None = None,
+    ) -> PaginaConversas:
+        """
+        Página de conversas (mais recentes primeiro) servida pelo índice, sem abrir os arquivos.
+        `cursor` vem de `proximo_cursor` da página anterior; `prefixo` filtra título/contexto.
+        """
+        antes_de = self._decodificar_cursor(cursor) if cursor else None
+        prefixo_limpo = self._limpar_contexto(prefixo)
+        # pede um item a mais para saber se existe próxima página
+        resumos = self.indice.listar(
+            limite + 1 if limite is not None else None, antes_de, prefixo_limpo
+        )
+        proximo_cursor: str | None = None
+        if limite is not None and len(resumos) > limite:
+            resumos = resumos[:limite]
+            proximo_cursor = self._codificar_cursor(resumos[-1])
+        return PaginaConversas(
+            itens=[ConversaResumo.model_validate(resumo) for resumo in resumos],
+            proximo_cursor=proximo_cursor,
+        )
 
-    def listar(self) -> list[ConversaResumo]:
-        conversas: list[ConversaResumo] = []
+    def total(self) -> int:
+        """Quantidade de conversas armazenadas (lida do índice)."""
+        return self.indice.total()
+
+    def reconstruir_indice(self) -> int:
+        """Varre o diretório de conversas e regrava o índice (recuperação/migração)."""
+        resumos: list[dict] = []
         for pasta in sorted(self.base_dir.iterdir()):
             if not pasta.is_dir():
                 continue
@@ -27,35 +97,75 @@ class ConversasService:
             if not json_path.exists():
                 continue
             try:
-                with json_path.open("r", encoding="utf-8") as arquivo:
-                    dados = json.load(arquivo)
-                conversas.append(self._converter_resumo(dados, json_path))
+                dados = self._ler_dados(json_path)
+                mensagens = dados.get("mensagens") or []
+                resumos.append(
+                    self._resumo_indice(
+                        self._converter_resumo(dados, json_path),
+                        len(mensagens),
+                        self._digests([(m["papel"], m["conteudo"]) for m in mensagens]),
+                    )
+                )
             except Exception:
                 continue
-        conversas.sort(key=lambda c: c.atualizado_em, reverse=True)
-        return conversas
+        return self.indice.substituir(resumos)
 
+    @rastreador.rastreado("conversas.obter")
     def obter(self, conversa_id: str) -> ConversaDetalhe:
         json_path = self._resolver_json_path(conversa_id)
         if not json_path.exists():
             raise FileNotFoundError(f"Conversa '{conversa_id}' não encontrada")
-        with json_path.open("r", encoding="utf-8") as arquivo:
-            dados = json.load(arquivo)
-        return self._converter_detalhe(dados, json_path)
+        return self._converter_detalhe(self._ler_dados(json_path), json_path)
+
+    @rastreador.rastreado("conversas.obter_contexto")
+    def obter_contexto(self, conversa_id: str) -> ContextoConversa | None:
+        """Resumo acumulado e tokens estimados por mensagem, para o orçamento de contexto."""
+        json_path = self._resolver_json_path(conversa_id)
+        if not json_path.exists():
+            return None
+        dados = self._ler_dados(json_path)
+        resumo = dados.get("resumo")
+        return ContextoConversa(
+            resumo=ResumoConversa.model_validate(resumo) if resumo else None,
+            tokens=[mensagem.get("tokens") for mensagem in dados.get("mensagens") or []],
+        )
+
+    @rastreador.rastreado("conversas.salvar_resumo")
+    def salvar_resumo(self, conversa_id: str, resumo: ResumoConversa) -> None:
+        """Persiste o resumo acumulado das mensagens mais antigas da conversa."""
+        json_path = self._resolver_json_path(conversa_id)
+        if not json_path.exists():
+            return
+        registro = {"op": "resumo", "resumo": resumo.model_dump()}
+        entrada = self.indice.obter(conversa_id) if settings.conversas_append_only else None
+        if entrada is not None and isinstance(entrada.get("total_mensagens"), int):
+            self._anexar_log(json_path, [registro])
+            return
+        dados = self._ler_dados(json_path)
+        self._aplicar_registro(dados, registro)
+        self._gravar_dados(json_path, dados)
 
+    @rastreador.rastreado("conversas.registrar")
     def registrar(
         self,
         mensagens: Sequence[MensagemChat],
         resposta_agente: str,
         conversa_id: str | None = None,
         contexto: str | None = None,
-    ) -> ConversaDetalhe:
+    ) -> ConversaResumo:
+        """
+        Persiste o histórico enviado + a resposta do agente e devolve o resumo da conversa.
+
+        Com CONVERSAS_APPEND_ONLY, uma conversa já indexada recebe apenas as mensagens novas
+        no log `<id>.log.jsonl`; o JSON completo só é regravado na compactação ou quando o
+        histórico enviado é menor que o armazenado ou difere dele (conversa editada no cliente,
+        conferida pelo digest do histórico guardado no índice).
+        """
         agora = datetime.now(timezone.utc)
 
         titulo = self._definir_titulo(contexto, mensagens)
         contexto_limpo = self._limpar_contexto(contexto)
-        dados_existentes: dict | None = None
-        mensagens_existentes: list[dict] = []
+        existente: dict | None = None
 
         if conversa_id:
             json_path = self._resolver_json_path(conversa_id)
@@ -64,14 +174,12 @@ class ConversasService:
                 conversa_id, json_path = self._criar_novos_paths(contexto_limpo or titulo, agora)
                 criado_em = agora
             else:
-                with json_path.open("r", encoding="utf-8") as arquivo:
-                    dados_existentes = json.load(arquivo)
-                criado_em = self._parse_datetime(dados_existentes.get("criado_em")) or agora
-                mensagens_existentes = dados_existentes.get("mensagens", []) or []
+                existente = self._cabecalho_existente(conversa_id, json_path)
+                criado_em = self._parse_datetime(existente.get("criado_em")) or agora
                 if contexto_limpo is None:
-                    contexto_limpo = self._limpar_contexto(dados_existentes.get("contexto"))
-                if dados_existentes.get("titulo") and not self._limpar_contexto(contexto):
-                    titulo = dados_existentes["titulo"]
+                    contexto_limpo = self._limpar_contexto(existente.get("contexto"))
+                if existente.get("titulo") and not self._limpar_contexto(contexto):
+                    titulo = existente["titulo"]
         else:
             conversa_id, json_path = self._criar_novos_paths(
                 contexto_limpo or titulo,
@@ -79,6 +187,73 @@ class ConversasService:
             )
             criado_em = agora
 
+        contexto_final = contexto_limpo or titulo
+        resposta = MensagemArmazenada(
+            papel="agente",
+            conteudo=resposta_agente,
+            timestamp=agora,
+            tokens=estimar_tokens(resposta_agente),
+        )
+        resumo = ConversaResumo(
+            id=conversa_id,
+            titulo=titulo,
+            contexto=contexto_final,
+            arquivo=str(json_path.resolve()),
+            criado_em=criado_em,
+            atualizado_em=agora,
+        )
+
+        total_existente = existente.get("total_mensagens") if existente else None
+        if (
+            isinstance(total_existente, int)
+            and len(mensagens) >= total_existente
+            and self._historico_confere(existente, mensagens[:total_existente])
+        ):
+            novas = [
+                MensagemArmazenada(
+                    papel=mensagem.papel,
+                    conteudo=mensagem.conteudo,
+                    tokens=estimar_tokens(mensagem.conteudo),
+                )
+                for mensagem in mensagens[total_existente:]
+            ]
+            novas.append(resposta)
+            registros: list[dict] = [
+                {
+                    "op": "mensagem",
+                    "posicao": posicao,
+                    "mensagem": mensagem.model_dump(mode="json"),
+                }
+                for posicao, mensagem in enumerate(novas, start=total_existente)
+            ]
+            registros.append(
+                {
+                    "op": "cabecalho",
+                    "titulo": titulo,
+                    "contexto": contexto_final,
+                    "atualizado_em": agora.isoformat(),
+                }
+            )
+            self._anexar_log(json_path, registros)
+            digests = self._digests(
+                [(mensagem.papel, mensagem.conteudo) for mensagem in novas],
+                existente["digest_historico"],
+            )
+            self.indice.atualizar(
+                self._resumo_indice(resumo, total_existente + len(novas), digests)
+            )
+            return resumo
+
+        mensagens_existentes: list[dict] = []
+        resumo_existente: dict | None = None
+        if existente is not None:
+            if "mensagens" not in existente:
+                existente = self._ler_dados(json_path)
+            mensagens_existentes = existente.get("mensagens", []) or []
+            resumo_existente = existente.get("resumo")
+            if resumo_existente and resumo_existente.get("ate", 0) > len(mensagens):
+                resumo_existente = None  # histórico editado antes do ponto resumido
+
         mensagens_salvas: list[MensagemArmazenada] = []
         for indice, mensagem in enumerate(mensagens):
             timestamp_existente: datetime | None = None
@@ -94,18 +269,10 @@ class ConversasService:
                     papel=mensagem.papel,
                     conteudo=mensagem.conteudo,
                     timestamp=timestamp_existente,
+                    tokens=estimar_tokens(mensagem.conteudo),
                 )
             )
-
-        mensagens_salvas.append(
-            MensagemArmazenada(
-                papel="agente",
-                conteudo=resposta_agente,
-                timestamp=agora,
-            )
-        )
-
-        contexto_final = contexto_limpo or titulo
+        mensagens_salvas.append(resposta)
 
         dados = {
             "id": conversa_id,
@@ -116,38 +283,185 @@ class ConversasService:
             "atualizado_em": agora.isoformat(),
             "mensagens": [mensagem.model_dump(mode="json") for mensagem in mensagens_salvas],
         }
+        if resumo_existente:
+            dados["resumo"] = resumo_existente
 
-        json_path.parent.mkdir(parents=True, exist_ok=True)
-        with json_path.open("w", encoding="utf-8") as arquivo:
-            json.dump(dados, arquivo, ensure_ascii=False, indent=2)
-
-        return self._converter_detalhe(dados, json_path)
+        self._gravar_dados(json_path, dados)
+        digests = self._digests([(m.papel, m.conteudo) for m in mensagens_salvas])
+        self.indice.atualizar(self._resumo_indice(resumo, len(mensagens_salvas), digests))
+        return resumo
 
+    @rastreador.rastreado("conversas.atualizar_ultima_resposta")
     def atualizar_ultima_resposta(self, conversa_id: str, conteudo: str) -> None:
         json_path = self._resolver_json_path(conversa_id)
         if not json_path.exists():
             return
-        with json_path.open("r", encoding="utf-8") as arquivo:
-            dados = json.load(arquivo)
-        mensagens: list[dict] = dados.get("mensagens", [])
-        for mensagem in reversed(mensagens):
-            if mensagem.get("papel") == "agente":
-                mensagem["conteudo"] = conteudo
-                mensagem["timestamp"] = datetime.now(timezone.utc).isoformat()
-                break
-        dados["mensagens"] = mensagens
-        dados["atualizado_em"] = datetime.now(timezone.utc).isoformat()
-        with json_path.open("w", encoding="utf-8") as arquivo:
-            json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+        agora = datetime.now(timezone.utc)
 
+        registro = {
+            "op": "ultima_resposta",
+            "conteudo": conteudo,
+            "timestamp": agora.isoformat(),
+            "tokens": estimar_tokens(conteudo),
+        }
+        entrada = self.indice.obter(conversa_id) if settings.conversas_append_only else None
+        if entrada is not None and isinstance(entrada.get("total_mensagens"), int):
+            # a resposta do agente é sempre a última mensagem gravada por `registrar`
+            self._anexar_log(json_path, [{**registro, "posicao": entrada["total_mensagens"] - 1}])
+            resumo = ConversaResumo.model_validate(entrada).model_copy(
+                update={"atualizado_em": agora}
+            )
+            anterior = entrada.get("digest_anterior")
+            digests = (
+                {
+                    "digest_anterior": anterior,
+                    "digest_historico": self._encadear(anterior, "agente", conteudo),
+                }
+                if isinstance(anterior, str)
+                else None
+            )
+            self.indice.atualizar(self._resumo_indice(resumo, entrada["total_mensagens"], digests))
+            return
+
+        dados = self._ler_dados(json_path)
+        self._aplicar_registro(dados, registro)
+        self._gravar_dados(json_path, dados)
+        mensagens = dados.get("mensagens") or []
+        self.indice.atualizar(
+            self._resumo_indice(
+                self._converter_resumo(dados, json_path),
+                len(mensagens),
+                self._digests([(m["papel"], m["conteudo"]) for m in mensagens]),
+            )
+        )
+
+    @rastreador.rastreado("conversas.remover")
     def remover(self, conversa_id: str) -> None:
         pasta = self.base_dir / conversa_id
         if not pasta.exists():
             raise FileNotFoundError(f"Conversa '{conversa_id}' não encontrada")
         if not pasta.is_dir():
             pasta.unlink()
-            return
-        shutil.rmtree(pasta)
+        else:
+            shutil.rmtree(pasta)
+        self.indice.remover(conversa_id)
+
+    def compactar(self, conversa_id: str) -> None:
+        """Incorpora o log de mensagens ao JSON da conversa e remove o log."""
+        json_path = self._resolver_json_path(conversa_id)
+        if self._log_path(json_path).exists():
+            self._gravar_dados(json_path, self._ler_dados(json_path))
+
+    def _cabecalho_existente(self, conversa_id: str, json_path: Path) -> dict:
+        """
+        Cabeçalho de uma conversa existente. No modo append-only vem do índice (com
+        `total_mensagens`, sem abrir o arquivo); caso contrário, é o JSON completo.
+        """
+        if settings.conversas_append_only:
+            entrada = self.indice.obter(conversa_id)
+            if entrada is not None and isinstance(entrada.get("total_mensagens"), int):
+                return entrada
+        return self._ler_dados(json_path)
+
+    def _ler_dados(self, json_path: Path) -> dict:
+        dados = orjson.loads(json_path.read_bytes())
+        log_path = self._log_path(json_path)
+        if log_path.exists():
+            with log_path.open("rb") as arquivo:
+                for linha in arquivo:
+                    try:
+                        self._aplicar_registro(dados, orjson.loads(linha))
+                    except (ValueError, KeyError, TypeError):
+                        continue  # linha truncada por uma escrita interrompida
+        return dados
+
+    def _gravar_dados(self, json_path: Path, dados: dict) -> None:
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        conteudo = orjson.dumps(dados, option=orjson.OPT_INDENT_2)
+        temporario = json_path.with_name(f".{json_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            temporario.write_bytes(conteudo)
+            os.replace(temporario, json_path)
+        except BaseException:
+            temporario.unlink(missing_ok=True)
+            raise
+        bytes_escritos.inc(len(conteudo), origem="conversas")
+        # se o processo cair antes daqui, o log sobra mas seus registros trazem a posição e
+        # `_aplicar_registro` ignora os que o JSON já incorporou
+        self._log_path(json_path).unlink(missing_ok=True)
+
+    def _anexar_log(self, json_path: Path, registros: list[dict]) -> None:
+        log_path = self._log_path(json_path)
+        conteudo = b"".join(orjson.dumps(r, option=orjson.OPT_APPEND_NEWLINE) for r in registros)
+        with log_path.open("ab") as arquivo:
+            arquivo.write(conteudo)
+        bytes_escritos.inc(len(conteudo), origem="conversas")
+        if log_path.stat().st_size > settings.conversas_log_max_bytes:
+            self._gravar_dados(json_path, self._ler_dados(json_path))
+
+    def _aplicar_registro(self, dados: dict, registro: dict) -> None:
+        operacao = registro["op"]
+        if operacao == "mensagem":
+            mensagens = dados.setdefault("mensagens", [])
+            posicao = registro.get("posicao")
+            if posicao is None or posicao >= len(mensagens):
+                mensagens.append(registro["mensagem"])
+        elif operacao == "ultima_resposta":
+            mensagens = dados.get("mensagens", [])
+            posicao = registro.get("posicao")
+            alvo = mensagens if posicao is None else mensagens[: posicao + 1]
+            for mensagem in reversed(alvo):
+                if mensagem.get("papel") == "agente":
+                    mensagem["conteudo"] = registro["conteudo"]
+                    mensagem["timestamp"] = registro["timestamp"]
+                    mensagem["tokens"] = registro.get("tokens")
+                    break
+            dados["atualizado_em"] = registro["timestamp"]
+        elif operacao == "cabecalho":
+            for campo in ("titulo", "contexto", "atualizado_em"):
+                dados[campo] = registro[campo]
+        elif operacao == "resumo":
+            dados["resumo"] = registro["resumo"]
+
+    def _log_path(self, json_path: Path) -> Path:
+        return json_path.with_name(f"{json_path.stem}.log.jsonl")
+
+    def _resumo_indice(
+        self,
+        resumo: ConversaResumo,
+        total_mensagens: int,
+        digests: dict[str, str] | None = None,
+    ) -> dict:
+        return {
+            **resumo.model_dump(mode="json"),
+            "total_mensagens": total_mensagens,
+            **(digests or {}),
+        }
+
+    def _historico_confere(self, existente: dict, enviadas: Sequence[MensagemChat]) -> bool:
+        """
+        True se `enviadas` é o histórico armazenado sem edições, pelo digest do índice. Entradas
+        sem digest (índice de uma versão anterior) não conferem: a conversa é relida e regravada.
+        """
+        esperado = existente.get("digest_historico")
+        if not isinstance(esperado, str):
+            return False
+        pares = [(mensagem.papel, mensagem.conteudo) for mensagem in enviadas]
+        return self._digests(pares)["digest_historico"] == esperado
+
+    def _digests(self, pares: Sequence[tuple[str, str]], digest: str = "") -> dict[str, str]:
+        """
+        Digest encadeado das mensagens (papel, conteúdo) a partir de `digest`, e o mesmo digest
+        sem a última mensagem (base para trocar a resposta em `atualizar_ultima_resposta`).
+        """
+        anterior = digest
+        for papel, conteudo in pares:
+            anterior, digest = digest, self._encadear(digest, papel, conteudo)
+        return {"digest_anterior": anterior, "digest_historico": digest}
+
+    @staticmethod
+    def _encadear(digest: str, papel: str, conteudo: str) -> str:
+        return hashlib.sha256(f"{digest}\0{papel}\0{conteudo}".encode("utf-8")).hexdigest()
 
     def _converter_resumo(self, dados: dict, json_path: Path) -> ConversaResumo:
         return ConversaResumo(
@@ -163,6 +477,7 @@ class ConversasService:
         mensagens = [
             MensagemArmazenada.model_validate(mensagem) for mensagem in dados.get("mensagens", [])
         ]
+        resumo = dados.get("resumo")
         return ConversaDetalhe(
             id=dados["id"],
             titulo=dados.get("titulo") or dados["id"],
@@ -171,8 +486,23 @@ class ConversasService:
             criado_em=self._parse_datetime(dados.get("criado_em")) or datetime.now(timezone.utc),
             atualizado_em=self._parse_datetime(dados.get("atualizado_em")) or datetime.now(timezone.utc),
             mensagens=mensagens,
+            resumo=ResumoConversa.model_validate(resumo) if resumo else None,
         )
 
+    def _codificar_cursor(self, resumo: dict) -> str:
+        bruto = orjson.dumps([resumo["atualizado_em"], resumo["id"]])
+        return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+    def _decodificar_cursor(self, cursor: str) -> tuple[str, str]:
+        try:
+            preenchido = cursor + "=" * (-len(cursor) % 4)
+            atualizado_em, conversa_id = orjson.loads(base64.urlsafe_b64decode(preenchido))
+        except (binascii.Error, ValueError, TypeError) as exc:
+            raise ValueError("cursor inválido") from exc
+        if not isinstance(atualizado_em, str) or not isinstance(conversa_id, str):
+            raise ValueError("cursor inválido")
+        return atualizado_em, conversa_id
+
     def _resolver_json_path(self, conversa_id: str) -> Path:
         pasta = self.base_dir / conversa_id
         return pasta / f"{pasta.name}.json"
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import shutil
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Sequence
+
+from app.core.rastreamento import rastreador
+from app.core.settings import settings
+from app.schemas.chat import MensagemChat
+from app.schemas.conversa import (
+    ContextoConversa,
+    ConversaDetalhe,
+    ConversaResumo,
+    MensagemArmazenada,
+    PaginaConversas,
+    ResumoConversa,
+)
+from app.services.conversas import ConversasService
+from app.utils.tokens import estimar_tokens
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS conversas (
+    id TEXT PRIMARY KEY,
+    titulo TEXT NOT NULL,
+    contexto TEXT,
+    criado_em TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL,
+    total_mensagens INTEGER NOT NULL DEFAULT 0,
+    resumo TEXT,
+    resumo_ate INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_conversas_atualizado_em ON conversas (atualizado_em, id);
+CREATE TABLE IF NOT EXISTS mensagens (
+    conversa_id TEXT NOT NULL REFERENCES conversas (id) ON DELETE CASCADE,
+    posicao INTEGER NOT NULL,
+    papel TEXT NOT NULL,
+    conteudo TEXT NOT NULL,
+    timestamp TEXT,
+    tokens INTEGER,
+    PRIMARY KEY (conversa_id, posicao)
+) WITHOUT ROWID;
+"""
+
+COLUNAS_RESUMO = "id, titulo, contexto, criado_em, atualizado_em"
+
+# colunas adicionadas depois da primeira versão do esquema: (tabela, coluna, tipo)
+COLUNAS_MIGRADAS = (
+    ("conversas", "resumo", "TEXT"),
+    ("conversas", "resumo_ate", "INTEGER"),
+    ("mensagens", "tokens", "INTEGER"),
+)
+
+
+class ConversasSQLiteService(ConversasService):
+    """
+    Mesma interface do ConversasService, persistindo em SQLite (WAL) em vez de um JSON por pasta.
+
+    A listagem usa o índice (atualizado_em, id) e cada turno só insere as mensagens novas.
+    As pastas `<base_dir>/<id>/` continuam sendo usadas para os projetos gerados no chat.
+    As consultas são parametrizadas, então o sqlite3 reaproveita os statements preparados.
+    """
+
+    def _inicializar_armazenamento(self) -> None:
+        self.db_path = Path(
+            settings.conversas_sqlite_path or self.base_dir / "conversas.db"
+        ).expanduser().resolve()
+        self._local = threading.local()
+        conexao = self._conexao()
+        conexao.executescript(ESQUEMA)
+        self._migrar_esquema(conexao)
+
+    @rastreador.rastreado("conversas_sqlite.listar")
+    def listar(
+        self,
+        limite: int | None = None,
+        cursor: str | None = None,
+        prefixo: str | None = None,
+    ) -> PaginaConversas:
+        condicoes: list[str] = []
+        parametros: list[object] = []
+        if cursor:
+            condicoes.append("(atualizado_em, id) < (?, ?)")
+            parametros.extend(self._decodificar_cursor(cursor))
+        prefixo_limpo = self._limpar_contexto(prefixo)
+        if prefixo_limpo:
+            padrao = self._escapar_like(prefixo_limpo) + "%"
+            condicoes.append("(titulo LIKE ? ESCAPE '\\' OR contexto LIKE ? ESCAPE '\\')")
+            parametros.extend([padrao, padrao])
+        onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        parametros.append(limite + 1 if limite is not None else -1)
+        linhas = self._conexao().execute(
+            f"SELECT {COLUNAS_RESUMO} FROM conversas {onde} "
+            "ORDER BY atualizado_em DESC, id DESC LIMIT ?",
+            parametros,
+        ).fetchall()
+
+        proximo_cursor: str | None = None
+        if limite is not None and len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo_cursor = self._codificar_cursor(dict(linhas[-1]))
+        return PaginaConversas(
+            itens=[self._linha_resumo(linha) for linha in linhas],
+            proximo_cursor=proximo_cursor,
+        )
+
+    def total(self) -> int:
+        return int(self._conexao().execute("SELECT COUNT(*) FROM conversas").fetchone()[0])
+
+    def reconstruir_indice(self) -> int:
+        """No SQLite o índice é mantido pelo próprio banco; apenas retorna o total."""
+        return self.total()
+
+    @rastreador.rastreado("conversas_sqlite.obter")
+    def obter(self, conversa_id: str) -> ConversaDetalhe:
+        conexao = self._conexao()
+        linha = conexao.execute(
+            f"SELECT {COLUNAS_RESUMO} FROM conversas WHERE id = ?", (conversa_id,)
+        ).fetchone()
+        if linha is None:
+            raise FileNotFoundError(f"Conversa '{conversa_id}' não encontrada")
+        mensagens = [
+            MensagemArmazenada(
+                papel=registro["papel"],
+                conteudo=registro["conteudo"],
+                timestamp=self._parse_datetime(registro["timestamp"]),
+                tokens=registro["tokens"],
+            )
+            for registro in conexao.execute(
+                "SELECT papel, conteudo, timestamp, tokens FROM mensagens "
+                "WHERE conversa_id = ? ORDER BY posicao",
+                (conversa_id,),
+            )
+        ]
+        resumo = self._linha_resumo(linha)
+        return ConversaDetalhe(
+            **resumo.model_dump(),
+            mensagens=mensagens,
+            resumo=self._resumo_conversa(conexao, conversa_id),
+        )
+
+    @rastreador.rastreado("conversas_sqlite.obter_contexto")
+    def obter_contexto(self, conversa_id: str) -> ContextoConversa | None:
+        conexao = self._conexao()
+        existe = conexao.execute("SELECT 1 FROM conversas WHERE id = ?", (conversa_id,)).fetchone()
+        if existe is None:
+            return None
+        tokens = [
+            linha[0]
+            for linha in conexao.execute(
+                "SELECT tokens FROM mensagens WHERE conversa_id = ? ORDER BY posicao",
+                (conversa_id,),
+            )
+        ]
+        return ContextoConversa(resumo=self._resumo_conversa(conexao, conversa_id), tokens=tokens)
+
+    @rastreador.rastreado("conversas_sqlite.salvar_resumo")
+    def salvar_resumo(self, conversa_id: str, resumo: ResumoConversa) -> None:
+        with self._transacao() as conexao:
+            conexao.execute(
+                "UPDATE conversas SET resumo = ?, resumo_ate = ? WHERE id = ?",
+                (resumo.texto, resumo.ate, conversa_id),
+            )
+
+    @rastreador.rastreado("conversas_sqlite.registrar")
+    def registrar(
+        self,
+        mensagens: Sequence[MensagemChat],
+        resposta_agente: str,
+        conversa_id: str | None = None,
+        contexto: str | None = None,
+    ) -> ConversaResumo:
+        agora = datetime.now(timezone.utc)
+        titulo = self._definir_titulo(contexto, mensagens)
+        contexto_limpo = self._limpar_contexto(contexto)
+
+        with self._transacao() as conexao:
+            existente = None
+            if conversa_id:
+                existente = conexao.execute(
+                    "SELECT titulo, contexto, criado_em, total_mensagens FROM conversas "
+                    "WHERE id = ?",
+                    (conversa_id,),
+                ).fetchone()
+            if existente is None:
+                conversa_id = self._novo_id(conexao, contexto_limpo or titulo, agora)
+                criado_em = agora.isoformat()
+                total_existente = 0
+            else:
+                criado_em = existente["criado_em"]
+                total_existente = existente["total_mensagens"]
+                if contexto_limpo is None:
+                    contexto_limpo = self._limpar_contexto(existente["contexto"])
+                if existente["titulo"] and not self._limpar_contexto(contexto):
+                    titulo = existente["titulo"]
+            contexto_final = contexto_limpo or titulo
+
+            divergencia = (
+                self._primeira_divergencia(conexao, conversa_id, mensagens, total_existente)
+                if existente is not None
+                else 0
+            )
+            if divergencia < total_existente:
+                # histórico editado ou regenerado no cliente: regrava a partir da divergência
+                conexao.execute(
+                    "DELETE FROM mensagens WHERE conversa_id = ? AND posicao >= ?",
+                    (conversa_id, divergencia),
+                )
+                # o resumo deixa de valer se o histórico mudou antes do ponto resumido
+                conexao.execute(
+                    "UPDATE conversas SET resumo = NULL, resumo_ate = NULL "
+                    "WHERE id = ? AND resumo_ate > ?",
+                    (conversa_id, divergencia),
+                )
+
+            registros = [
+                (
+                    conversa_id,
+                    posicao,
+                    mensagem.papel,
+                    mensagem.conteudo,
+                    None,
+                    estimar_tokens(mensagem.conteudo),
+                )
+                for posicao, mensagem in enumerate(mensagens)
+                if posicao >= divergencia
+            ]
+            registros.append(
+                (
+                    conversa_id,
+                    len(mensagens),
+                    "agente",
+                    resposta_agente,
+                    agora.isoformat(),
+                    estimar_tokens(resposta_agente),
+                )
+            )
+            conexao.execute(
+                "INSERT INTO conversas (id, titulo, contexto, criado_em, atualizado_em, "
+                "total_mensagens) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET titulo = excluded.titulo, "
+                "contexto = excluded.contexto, atualizado_em = excluded.atualizado_em, "
+                "total_mensagens = excluded.total_mensagens",
+                (
+                    conversa_id,
+                    titulo,
+                    contexto_final,
+                    criado_em,
+                    agora.isoformat(),
+                    len(mensagens) + 1,
+                ),
+            )
+            conexao.executemany(
+                "INSERT OR REPLACE INTO mensagens "
+                "(conversa_id, posicao, papel, conteudo, timestamp, tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                registros,
+            )
+
+        return ConversaResumo(
+            id=conversa_id,
+            titulo=titulo,
+            contexto=contexto_final,
+            arquivo=str(self.db_path),
+            criado_em=self._parse_datetime(criado_em) or agora,
+            atualizado_em=agora,
+        )
+
+    @staticmethod
+    def _primeira_divergencia(
+        conexao: sqlite3.Connection,
+        conversa_id: str,
+        mensagens: Sequence[MensagemChat],
+        total_existente: int,
+    ) -> int:
+        """
+        Posição da primeira mensagem enviada que difere da armazenada (papel ou conteúdo, ou
+        que falta no banco); sem diferença, onde termina o trecho comum.
+        """
+        comum = min(len(mensagens), total_existente)
+        linhas = conexao.execute(
+            "SELECT posicao, papel, conteudo FROM mensagens "
+            "WHERE conversa_id = ? AND posicao < ? ORDER BY posicao",
+            (conversa_id, comum),
+        ).fetchall()
+        iguais = 0
+        for linha in linhas:
+            mensagem = mensagens[iguais]
+            if (
+                linha["posicao"] != iguais
+                or linha["papel"] != mensagem.papel
+                or linha["conteudo"] != mensagem.conteudo
+            ):
+                break
+            iguais += 1
+        return iguais
+
+    @rastreador.rastreado("conversas_sqlite.atualizar_ultima_resposta")
+    def atualizar_ultima_resposta(self, conversa_id: str, conteudo: str) -> None:
+        agora = datetime.now(timezone.utc).isoformat()
+        with self._transacao() as conexao:
+            conexao.execute(
+                "UPDATE mensagens SET conteudo = ?, timestamp = ?, tokens = ? "
+                "WHERE conversa_id = ? AND posicao = ("
+                "SELECT MAX(posicao) FROM mensagens WHERE conversa_id = ? AND papel = 'agente')",
+                (conteudo, agora, estimar_tokens(conteudo), conversa_id, conversa_id),
+            )
+            conexao.execute(
+                "UPDATE conversas SET atualizado_em = ? WHERE id = ?", (agora, conversa_id)
+            )
+
+    @rastreador.rastreado("conversas_sqlite.remover")
+    def remover(self, conversa_id: str) -> None:
+        with self._transacao() as conexao:
+            cursor = conexao.execute("DELETE FROM conversas WHERE id = ?", (conversa_id,))
+        if cursor.rowcount == 0:
+            raise FileNotFoundError(f"Conversa '{conversa_id}' não encontrada")
+        pasta = self.base_dir / conversa_id
+        if pasta.is_dir():
+            shutil.rmtree(pasta)
+
+    def migrar_de_arquivos(self, origem: ConversasService) -> int:
+        """Importa as conversas do layout JSON por pasta; ids já presentes no banco são mantidos."""
+        total = 0
+        with self._transacao() as conexao:
+            for pasta in sorted(origem.base_dir.iterdir()):
+                json_path = pasta / f"{pasta.name}.json"
+                if not pasta.is_dir() or not json_path.exists():
+                    continue
+                try:
+                    detalhe = origem._converter_detalhe(origem._ler_dados(json_path), json_path)
+                except Exception:
+                    continue
+                inserida = conexao.execute(
+                    "INSERT OR IGNORE INTO conversas (id, titulo, contexto, criado_em, "
+                    "atualizado_em, total_mensagens, resumo, resumo_ate) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        detalhe.id,
+                        detalhe.titulo,
+                        detalhe.contexto,
+                        detalhe.criado_em.isoformat(),
+                        detalhe.atualizado_em.isoformat(),
+                        len(detalhe.mensagens),
+                        detalhe.resumo.texto if detalhe.resumo else None,
+                        detalhe.resumo.ate if detalhe.resumo else None,
+                    ),
+                )
+                if inserida.rowcount == 0:
+                    continue
+                conexao.executemany(
+                    "INSERT INTO mensagens (conversa_id, posicao, papel, conteudo, timestamp, "
+                    "tokens) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            detalhe.id,
+                            posicao,
+                            mensagem.papel,
+                            mensagem.conteudo,
+                            mensagem.timestamp.isoformat() if mensagem.timestamp else None,
+                            mensagem.tokens,
+                        )
+                        for posicao, mensagem in enumerate(detalhe.mensagens)
+                    ],
+                )
+                total += 1
+        return total
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao: sqlite3.Connection | None = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=256)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute("PRAGMA foreign_keys=ON")
+            conexao.execute("PRAGMA busy_timeout=5000")
+            self._local.conexao = conexao
+        return conexao
+
+    def _migrar_esquema(self, conexao: sqlite3.Connection) -> None:
+        """Acrescenta as colunas novas em bancos criados por versões anteriores do esquema."""
+        for tabela, coluna, tipo in COLUNAS_MIGRADAS:
+            existentes = conexao.execute(f"PRAGMA table_info({tabela})").fetchall()
+            colunas = {linha["name"] for linha in existentes}
+            if coluna not in colunas:
+                conexao.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+
+    def _resumo_conversa(
+        self, conexao: sqlite3.Connection, conversa_id: str
+    ) -> ResumoConversa | None:
+        linha = conexao.execute(
+            "SELECT resumo, resumo_ate FROM conversas WHERE id = ?", (conversa_id,)
+        ).fetchone()
+        if linha is None or linha["resumo"] is None:
+            return None
+        return ResumoConversa(texto=linha["resumo"], ate=linha["resumo_ate"] or 0)
+
+    def _transacao(self) -> _Transacao:
+        return _Transacao(self._conexao())
+
+    def _novo_id(self, conexao: sqlite3.Connection, contexto: str, agora: datetime) -> str:
+        conversa_id, _ = self._criar_novos_paths(contexto, agora)
+        existe = conexao.execute("SELECT 1 FROM conversas WHERE id = ?", (conversa_id,)).fetchone()
+        if existe is not None:
+            conversa_id = f"{conversa_id}-{uuid.uuid4().hex[:8]}"
+        return conversa_id
+
+    def _linha_resumo(self, linha: sqlite3.Row) -> ConversaResumo:
+        agora = datetime.now(timezone.utc)
+        return ConversaResumo(
+            id=linha["id"],
+            titulo=linha["titulo"] or linha["id"],
+            contexto=linha["contexto"],
+            arquivo=str(self.db_path),
+            criado_em=self._parse_datetime(linha["criado_em"]) or agora,
+            atualizado_em=self._parse_datetime(linha["atualizado_em"]) or agora,
+        )
+
+    def _escapar_like(self, texto: str) -> str:
+        return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class _Transacao:
+    """Contexto `BEGIN IMMEDIATE ... COMMIT/ROLLBACK` sobre uma conexão em modo autocommit."""
+
+    def __init__(self, conexao: sqlite3.Connection) -> None:
+        self.conexao = conexao
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conexao.execute("BEGIN IMMEDIATE")
+        return self.conexao
+
+    def __exit__(self, tipo: type[BaseException] | None, *_: object) -> None:
+        self.conexao.execute("ROLLBACK" if tipo is not None else "COMMIT")
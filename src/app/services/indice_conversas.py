@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+NOME_ARQUIVO_INDICE = "_indice.jsonl"
+NOME_TRAVA_INDICE = "_indice.lock"
+
+
+class IndiceConversas:
+    """
+    Índice de resumos das conversas (sem as mensagens), mantido em um log JSONL append-only.
+
+    Cada alteração acrescenta uma linha (`upsert` ou `remover`) ao arquivo; na leitura o log é
+    reaplicado em memória e só o trecho novo é lido nas sincronizações seguintes. Quando o log
+    cresce muito em relação ao número de conversas, ele é compactado em um snapshot.
+    As chaves (`atualizado_em`, `id`) ficam numa lista ordenada, então uma página a partir de
+    um cursor custa O(log n + página).
+
+    Vários processos podem compartilhar o mesmo diretório: anexar e compactar acontecem sob
+    uma trava de arquivo (`_indice.lock`), então a compactação de um processo não descarta
+    linhas que outro acabou de anexar.
+    """
+
+    _instancias: dict[Path, IndiceConversas] = {}
+    _instancias_lock = threading.Lock()
+
+    def __init__(self, base_dir: Path) -> None:
+        self.arquivo = base_dir / NOME_ARQUIVO_INDICE
+        self.trava = base_dir / NOME_TRAVA_INDICE
+        self._entradas: dict[str, dict] = {}
+        self._ordem: list[tuple[str, str]] = []
+        self._linhas = 0
+        self._offset = 0
+        self._inode: int | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def para(cls, base_dir: Path) -> IndiceConversas:
+        """Retorna o índice compartilhado do diretório (uma instância por processo)."""
+        with cls._instancias_lock:
+            indice = cls._instancias.get(base_dir)
+            if indice is None:
+                indice = cls(base_dir)
+                cls._instancias[base_dir] = indice
+            return indice
+
+    def existe(self) -> bool:
+        return self.arquivo.exists()
+
+    def listar(
+        self,
+        limite: int | None = None,
+        antes_de: tuple[str, str] | None = None,
+        prefixo: str | None = None,
+    ) -> list[dict]:
+        """
+        Entradas da mais recente para a mais antiga, começando logo após a chave `antes_de`
+        (`atualizado_em`, `id`) e filtrando por prefixo de título/contexto (sem diferenciar caixa).
+        """
+        prefixo_normalizado = prefixo.casefold() if prefixo else None
+        with self._lock:
+            self._sincronizar()
+            fim = bisect.bisect_left(self._ordem, antes_de) if antes_de else len(self._ordem)
+            encontradas: list[dict] = []
+            for posicao in range(fim - 1, -1, -1):
+                if limite is not None and len(encontradas) >= limite:
+                    break
+                entrada = self._entradas[self._ordem[posicao][1]]
+                if prefixo_normalizado and not self._casa_prefixo(entrada, prefixo_normalizado):
+                    continue
+                encontradas.append(dict(entrada))
+            return encontradas
+
+    def total(self) -> int:
+        with self._lock:
+            self._sincronizar()
+            return len(self._entradas)
+
+    def obter(self, conversa_id: str) -> dict | None:
+        with self._lock:
+            self._sincronizar()
+            entrada = self._entradas.get(conversa_id)
+            return dict(entrada) if entrada is not None else None
+
+    def atualizar(self, resumo: dict) -> None:
+        with self._lock:
+            self._anexar({"op": "upsert", "resumo": resumo})
+
+    def remover(self, conversa_id: str) -> None:
+        with self._lock:
+            self._sincronizar()
+            if conversa_id in self._entradas:
+                self._anexar({"op": "remover", "id": conversa_id})
+
+    def substituir(self, resumos: Iterable[dict]) -> int:
+        """Regrava o índice inteiro (usado na reconstrução a partir dos arquivos)."""
+        with self._lock, self._trava_processos():
+            self._entradas = {resumo["id"]: resumo for resumo in resumos}
+            self._ordem = sorted(self._chave(entrada) for entrada in self._entradas.values())
+            self._compactar()
+            return len(self._entradas)
+
+    def _sincronizar(self) -> None:
+        try:
+            stat = self.arquivo.stat()
+        except FileNotFoundError:
+            self._entradas, self._ordem = {}, []
+            self._linhas, self._offset, self._inode = 0, 0, None
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # arquivo compactado/recriado por outro processo: relê do início
+            self._entradas, self._ordem = {}, []
+            self._linhas, self._offset = 0, 0
+            self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+        with self.arquivo.open("rb") as arquivo:
+            arquivo.seek(self._offset)
+            for linha in arquivo:
+                if not linha.endswith(b"\n"):
+                    break  # escrita ainda em andamento; lê na próxima sincronização
+                self._offset += len(linha)
+                try:
+                    self._aplicar(orjson.loads(linha))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._linhas += 1
+
+    def _aplicar(self, registro: dict) -> None:
+        if registro["op"] == "remover":
+            self._descartar(registro["id"])
+            return
+        resumo = registro["resumo"]
+        self._descartar(resumo["id"])
+        self._entradas[resumo["id"]] = resumo
+        bisect.insort(self._ordem, self._chave(resumo))
+
+    def _descartar(self, conversa_id: str) -> None:
+        anterior = self._entradas.pop(conversa_id, None)
+        if anterior is None:
+            return
+        chave = self._chave(anterior)
+        posicao = bisect.bisect_left(self._ordem, chave)
+        if posicao < len(self._ordem) and self._ordem[posicao] == chave:
+            del self._ordem[posicao]
+
+    @staticmethod
+    def _chave(entrada: dict) -> tuple[str, str]:
+        return entrada["atualizado_em"], entrada["id"]
+
+    @staticmethod
+    def _casa_prefixo(entrada: dict, prefixo: str) -> bool:
+        return any(
+            (entrada.get(campo) or "").casefold().startswith(prefixo)
+            for campo in ("titulo", "contexto")
+        )
+
+    def _anexar(self, registro: dict) -> None:
+        # a linha é aplicada pela própria sincronização, junto com as de outros processos
+        linha = orjson.dumps(registro, option=orjson.OPT_APPEND_NEWLINE)
+        with self._trava_processos():
+            with self.arquivo.open("ab") as arquivo:
+                arquivo.write(linha)
+            # sob a trava, o estado sincronizado inclui tudo o que os outros processos anexaram
+            self._sincronizar()
+            if self._linhas > 2 * len(self._entradas) + 100:
+                self._compactar()
+
+    @contextmanager
+    def _trava_processos(self) -> Iterator[None]:
+        """Trava exclusiva entre processos (flock; msvcrt.locking no Windows)."""
+        self.trava.parent.mkdir(parents=True, exist_ok=True)
+        with self.trava.open("a+b") as arquivo:
+            if fcntl is not None:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+                else:
+                    arquivo.seek(0)
+                    msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _compactar(self) -> None:
+        temporario = self.arquivo.with_suffix(".tmp")
+        conteudo = b"".join(
+            orjson.dumps(
+                {"op": "upsert", "resumo": self._entradas[conversa_id]},
+                option=orjson.OPT_APPEND_NEWLINE,
+            )
+            for _, conversa_id in self._ordem
+        )
+        self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+        with temporario.open("wb") as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, self.arquivo)
+        stat = self.arquivo.stat()
+        self._inode = stat.st_ino
+        self._offset = stat.st_size
+        self._linhas = len(self._entradas)
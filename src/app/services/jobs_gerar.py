@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi import HTTPException
+from loguru import logger
+
+from app.core.concorrencia import executar_io
+from app.core.errors import ErroFilaCheia
+from app.core.rastreamento import rastreador
+from app.core.settings import Settings, settings
+from app.schemas.gerar import JobGerar, RequisicaoGerar, RespostaGerar
+from app.services.agente import AgenteDev
+
+
+class FilaGerar:
+    """
+    Fila de gerações em segundo plano de /v1/gerar/jobs.
+
+    Até GERAR_JOBS_WORKERS execuções simultâneas de `AgenteDev.gerar_projeto`; o estado de
+    cada job fica em `<GERAR_JOBS_DIR>/<id>.json`. Ao reiniciar, jobs que estavam na fila
+    voltam para a fila; os que estavam executando são marcados como falhos, já que podem
+    ter deixado arquivos parciais no destino. Jobs encerrados há mais de
+    GERAR_JOBS_RETENCAO_SEGUNDOS têm o arquivo apagado (na partida e periodicamente).
+    """
+
+    def __init__(self, app_settings: Settings | None = None) -> None:
+        cfg = app_settings or settings
+        self.settings = cfg
+        self.diretorio = Path(
+            cfg.gerar_jobs_dir or Path(cfg.base_dir_conversas).parent / "jobs"
+        ).expanduser()
+        self._ativos: dict[str, JobGerar] = {}
+        self._fila: asyncio.Queue[str] | None = None
+        self._workers: list[asyncio.Task[None]] = []
+
+    async def iniciar(self) -> None:
+        if self._workers:
+            return
+        self._fila = asyncio.Queue()
+        pendentes = await executar_io(self._recuperar)
+        for job in pendentes:
+            self._ativos[job.id] = job
+            self._fila.put_nowait(job.id)
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(max(1, self.settings.gerar_jobs_workers))
+        ]
+        if self.settings.gerar_jobs_retencao_segundos > 0:
+            self._workers.append(asyncio.create_task(self._limpeza_periodica()))
+
+    async def parar(self) -> None:
+        for tarefa in self._workers:
+            tarefa.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._fila = None
+
+    async def submeter(self, req: RequisicaoGerar) -> JobGerar:
+        if self._fila is None:
+            raise ErroFilaCheia("Fila de gerações não iniciada")
+        if self._fila.qsize() >= self.settings.gerar_jobs_fila_maxima:
+            raise ErroFilaCheia("Fila de gerações cheia; tente novamente em instantes")
+        agora = datetime.now(timezone.utc)
+        job = JobGerar(id=uuid.uuid4().hex, requisicao=req, criado_em=agora, atualizado_em=agora)
+        await executar_io(self._salvar, job)
+        self._ativos[job.id] = job
+        self._fila.put_nowait(job.id)
+        return job
+
+    async def obter(self, job_id: str) -> JobGerar | None:
+        """Estado atual do job: em memória enquanto ativo, depois lido do disco."""
+        job = self._ativos.get(job_id)
+        if job is not None:
+            return job
+        return await executar_io(self._carregar, job_id)
+
+    async def _worker(self) -> None:
+        assert self._fila is not None
+        while True:
+            job_id = await self._fila.get()
+            try:
+                await self._executar(self._ativos[job_id])
+            except Exception:  # noqa: BLE001 - um job com problema não pode derrubar o worker
+                logger.exception(f"Falha ao processar o job de geração {job_id}")
+            finally:
+                self._ativos.pop(job_id, None)
+                self._fila.task_done()
+
+    async def _executar(self, job: JobGerar) -> None:
+        req = job.requisicao
+        job.estado = "executando"
+        await self._persistir(job)
+
+        def progresso(etapa: str, feitos: int, total: int) -> None:
+            # só em memória: a consulta de status lê o job ativo, sem gravar a cada arquivo
+            job.progresso.etapa = etapa  # type: ignore[assignment]
+            job.progresso.feitos = feitos
+            job.progresso.total = total
+            job.atualizado_em = datetime.now(timezone.utc)
+
+        try:
+            # roda fora de qualquer requisição: cada job é a raiz do próprio trace
+            with rastreador.span("job.gerar", **{"job.id": job.id}):
+                plano, arquivos, commit = await AgenteDev().gerar_projeto(
+                    objetivo=req.objetivo,
+                    path_saida=req.path_saida,
+                    overwrite=req.overwrite,
+                    git=req.git,
+                    paralelo=req.paralelo,
+                    usar_cache=req.usar_cache,
+                    progresso=progresso,
+                )
+        except HTTPException as exc:
+            job.estado, job.erro = "falhou", str(exc.detail)
+        except Exception as exc:  # noqa: BLE001 - o erro vai para o status do job
+            logger.exception(f"Falha no job de geração {job.id}")
+            job.estado, job.erro = "falhou", f"{type(exc).__name__}: {exc}"
+        else:
+            job.estado = "concluido"
+            job.resultado = RespostaGerar(plano=plano, arquivos=arquivos, commit=commit)
+            job.progresso.etapa = "fim"
+        await self._persistir(job)
+
+    async def _limpeza_periodica(self) -> None:
+        intervalo = min(self.settings.gerar_jobs_retencao_segundos, 3600.0)
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await executar_io(self._limpar)
+            except OSError as exc:
+                logger.warning(f"Falha ao apagar jobs de geração antigos: {exc}")
+
+    def _limpar(self) -> int:
+        """Apaga os arquivos de jobs encerrados há mais de GERAR_JOBS_RETENCAO_SEGUNDOS."""
+        if not self.diretorio.exists():
+            return 0
+        removidos = 0
+        for caminho in self.diretorio.glob("*.json"):
+            # depois da partida, todo job na fila ou executando está em `_ativos`
+            if caminho.stem in self._ativos:
+                continue
+            try:
+                if not self._expirado(caminho):
+                    continue
+                caminho.unlink()
+            except FileNotFoundError:
+                continue
+            removidos += 1
+        return removidos
+
+    def _expirado(self, caminho: Path) -> bool:
+        # o arquivo de um job encerrado não é mais regravado: o mtime é o fim do job
+        retencao = self.settings.gerar_jobs_retencao_segundos
+        return retencao > 0 and caminho.stat().st_mtime < time.time() - retencao
+
+    async def _persistir(self, job: JobGerar) -> None:
+        job.atualizado_em = datetime.now(timezone.utc)
+        await executar_io(self._salvar, job)
+
+    def _salvar(self, job: JobGerar) -> None:
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        destino = self._caminho(job.id)
+        temporario = destino.with_suffix(".json.tmp")
+        temporario.write_text(job.model_dump_json(indent=2), encoding="utf-8")
+        os.replace(temporario, destino)
+
+    def _carregar(self, job_id: str) -> JobGerar | None:
+        caminho = self._caminho(job_id)
+        if not caminho.exists():
+            return None
+        return JobGerar.model_validate_json(caminho.read_text(encoding="utf-8"))
+
+    def _recuperar(self) -> list[JobGerar]:
+        """Lê os jobs salvos: devolve os que estavam na fila e encerra os interrompidos."""
+        if not self.diretorio.exists():
+            return []
+        pendentes: list[JobGerar] = []
+        for caminho in self.diretorio.glob("*.json"):
+            try:
+                job = JobGerar.model_validate_json(caminho.read_text(encoding="utf-8"))
+            except ValueError:
+                logger.warning(f"Job de geração ilegível ignorado: {caminho.name}")
+                continue
+            if job.estado == "na_fila":
+                pendentes.append(job)
+            elif job.estado == "executando":
+                job.estado = "falhou"
+                job.erro = "Interrompido pelo reinício do servidor; envie a geração novamente."
+                job.atualizado_em = datetime.now(timezone.utc)
+                self._salvar(job)
+            elif self._expirado(caminho):
+                caminho.unlink(missing_ok=True)
+        return sorted(pendentes, key=lambda job: job.criado_em)
+
+    def _caminho(self, job_id: str) -> Path:
+        return self.diretorio / f"{Path(job_id).name}.json"
+
+
+fila_gerar = FilaGerar()
@@ -1,14 +1,58 @@
 from __future__ import annotations
-from typing import Iterable
-from app.adapters.fs_client import FSClient
+from typing import AsyncIterable, Callable, Iterable
+from app.adapters.fs_client import FSClient, LoteEscrita
+from app.adapters.manifesto import ManifestoProjeto
+from app.core.concorrencia import executar_io
+from app.core.settings import settings
 
 class Writer:
+    """
+    Escreve os arquivos gerados sob `base_dir` em lote: tudo é preparado em temporários e
+    confirmado no fim, então uma geração que falha no meio não deixa projeto parcial.
+    O manifesto de hashes do projeto (em `base_dir/base_rel`) evita regravar arquivos cujo
+    conteúdo não mudou; o lote retornado diz o que foi adicionado, modificado ou mantido.
+    """
+
     def __init__(self, base_dir: str):
         self.fs = FSClient(base_dir)
 
-    def escrever_pares(self, base_rel: str, pares: Iterable[tuple[str, str]], overwrite: bool) -> list[str]:
-        escritos: list[str] = []
-        for caminho_rel, conteudo in pares:
-            full_rel = f"{base_rel}{caminho_rel}"
-            escritos.append(self.fs.escrever(full_rel, conteudo, overwrite))
-        return escritos
+    def escrever_pares(
+        self,
+        base_rel: str,
+        pares: Iterable[tuple[str, str]],
+        overwrite: bool,
+        ao_escrever: Callable[[str], None] | None = None,
+    ) -> LoteEscrita:
+        itens = [(f"{base_rel}{caminho_rel}", conteudo) for caminho_rel, conteudo in pares]
+        return self.fs.escrever_lote(
+            itens,
+            overwrite,
+            ao_escrever,
+            workers=settings.fs_escrita_workers,
+            manifesto=self._manifesto(base_rel),
+        )
+
+    async def escrever_pares_async(
+        self,
+        base_rel: str,
+        pares: AsyncIterable[tuple[str, str]],
+        overwrite: bool,
+        ao_escrever: Callable[[str], None] | None = None,
+    ) -> LoteEscrita:
+        """
+        Prepara cada par assim que ele chega (ex.: blocos extraídos do streaming do LLM) e
+        confirma o lote quando o stream termina; se o stream falhar, o lote é descartado.
+        """
+        manifesto = await executar_io(self._manifesto, base_rel)
+        lote = self.fs.lote(overwrite, manifesto)
+        try:
+            async for caminho_rel, conteudo in pares:
+                await executar_io(lote.preparar, f"{base_rel}{caminho_rel}", conteudo)
+            await executar_io(lote.confirmar, ao_escrever)
+        except BaseException:
+            await executar_io(lote.descartar)
+            raise
+        return lote
+
+    def _manifesto(self, base_rel: str) -> ManifestoProjeto:
+        return ManifestoProjeto(self.fs.caminho(base_rel or "."))
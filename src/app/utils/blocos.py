@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import AsyncIterable, AsyncIterator, Iterator
+
+CERCA = "```"
+ARQUIVOS_PASSOS_EXECUCAO = {"passos_execucao.md", "passos_execucao.txt"}
+
+
+class ExtratorBlocos:
+    """
+    Extrai blocos cercados (```caminho\\nconteudo```) em passagem única.
+
+    Aceita a resposta inteira ou em trechos (streaming) e produz `(caminho, conteudo)`
+    assim que cada bloco fecha. Só o bloco aberto fica em memória; o texto fora dos blocos
+    é descartado. Os geradores de `alimentar` devem ser consumidos por completo.
+    """
+
+    def __init__(self) -> None:
+        self._dentro = False
+        self._pendente = ""
+        self._bloco: list[str] = []
+
+    def alimentar(self, trecho: str) -> Iterator[tuple[str, str]]:
+        texto = f"{self._pendente}{trecho}" if self._pendente else trecho
+        self._pendente = ""
+        pos = 0
+        while True:
+            indice = texto.find(CERCA, pos)
+            if indice == -1:
+                break
+            if self._dentro:
+                self._bloco.append(texto[pos:indice])
+                par = self._fechar_bloco()
+                if par is not None:
+                    yield par
+            self._dentro = not self._dentro
+            pos = indice + len(CERCA)
+
+        # até dois acentos no fim podem ser o começo de uma cerca dividida entre trechos
+        corte = len(texto)
+        while corte > pos and len(texto) - corte < len(CERCA) - 1 and texto[corte - 1] == "`":
+            corte -= 1
+        if self._dentro:
+            self._bloco.append(texto[pos:corte])
+        self._pendente = texto[corte:]
+
+    def finalizar(self) -> Iterator[tuple[str, str]]:
+        """Fecha um bloco deixado aberto no fim da resposta (mesmo critério do split original)."""
+        if self._dentro:
+            self._bloco.append(self._pendente)
+            self._dentro = False
+            par = self._fechar_bloco()
+            if par is not None:
+                yield par
+        self._pendente = ""
+
+    def _fechar_bloco(self) -> tuple[str, str] | None:
+        bloco = "".join(self._bloco).strip()
+        self._bloco = []
+        if not bloco:
+            return None
+
+        primeira_linha, sep, restante = bloco.partition("\n")
+        if not sep:
+            return None
+
+        caminho = primeira_linha.strip().strip("/")
+        conteudo = restante.rstrip()
+        if not caminho or not conteudo:
+            return None
+        return caminho, conteudo
+
+
+def extrair_blocos(resposta: str) -> Iterator[tuple[str, str]]:
+    extrator = ExtratorBlocos()
+    yield from extrator.alimentar(resposta)
+    yield from extrator.finalizar()
+
+
+async def extrair_blocos_async(trechos: AsyncIterable[str]) -> AsyncIterator[tuple[str, str]]:
+    extrator = ExtratorBlocos()
+    async for trecho in trechos:
+        for par in extrator.alimentar(trecho):
+            yield par
+    for par in extrator.finalizar():
+        yield par
+
+
+def eh_passos_execucao(caminho: str) -> bool:
+    return caminho.lower() in ARQUIVOS_PASSOS_EXECUCAO
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import re
+
+import orjson
+
+_RE_ESTRUTURA = re.compile(r'["{}\[\]]')
+_RE_STRING = re.compile(r'["\\]')
+_RE_CHAVE_ARQUIVOS = re.compile(r'"arquivos"\s*:\s*$')
+
+
+class ExtratorArquivosJSON:
+    """
+    Parser incremental para o JSON de resposta do LLM ({"mensagem", "slug_projeto", "arquivos"}).
+
+    Recebe a resposta em trechos e devolve cada item de `arquivos` assim que o objeto
+    correspondente fecha, sem esperar o fim da geração. Os itens emitidos não ficam em memória:
+    apenas o restante do documento (mensagem, slug etc.) é acumulado para `finalizar`.
+    """
+
+    def __init__(self) -> None:
+        self._profundidade = 0
+        self._em_string = False
+        self._escape = False
+        self._prof_arquivos: int | None = None
+        self._captura: list[str] | None = None
+        self._resto: list[str] = []
+
+    def alimentar(self, trecho: str) -> list[dict]:
+        emitidos: list[dict] = []
+        inicio_resto: int | None = 0 if self._prof_arquivos is None else None
+        inicio_captura: int | None = 0 if self._captura is not None else None
+        pos = 0
+        tamanho = len(trecho)
+
+        while pos < tamanho:
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                achado = _RE_STRING.search(trecho, pos)
+                if achado is None:
+                    break
+                pos = achado.start() + 1
+                if achado.group() == "\\":
+                    self._escape = True
+                else:
+                    self._em_string = False
+                continue
+
+            achado = _RE_ESTRUTURA.search(trecho, pos)
+            if achado is None:
+                break
+            pos = achado.start()
+            caractere = achado.group()
+
+            if caractere == '"':
+                self._em_string = True
+            elif caractere == "{":
+                if (
+                    self._captura is None
+                    and self._prof_arquivos is not None
+                    and self._profundidade == self._prof_arquivos
+                ):
+                    self._captura = []
+                    inicio_captura = pos
+                self._profundidade += 1
+            elif caractere == "}":
+                self._profundidade -= 1
+                if (
+                    self._captura is not None
+                    and inicio_captura is not None
+                    and self._profundidade == self._prof_arquivos
+                ):
+                    self._captura.append(trecho[inicio_captura : pos + 1])
+                    item = self._decodificar("".join(self._captura))
+                    if item is not None:
+                        emitidos.append(item)
+                    self._captura = None
+                    inicio_captura = None
+            elif caractere == "[":
+                if (
+                    self._prof_arquivos is None
+                    and self._profundidade == 1
+                    and inicio_resto is not None
+                    and _RE_CHAVE_ARQUIVOS.search(self._cauda_resto(trecho[inicio_resto:pos]))
+                ):
+                    self._resto.append(trecho[inicio_resto : pos + 1])
+                    inicio_resto = None
+                    self._prof_arquivos = 2
+                self._profundidade += 1
+            elif caractere == "]":
+                self._profundidade -= 1
+                if (
+                    self._prof_arquivos is not None
+                    and self._captura is None
+                    and self._profundidade == self._prof_arquivos - 1
+                ):
+                    self._prof_arquivos = None
+                    inicio_resto = pos
+            pos += 1
+
+        if inicio_resto is not None:
+            self._resto.append(trecho[inicio_resto:])
+        if self._captura is not None and inicio_captura is not None:
+            self._captura.append(trecho[inicio_captura:])
+        return emitidos
+
+    def finalizar(self) -> dict | None:
+        """
+        Decodifica o documento sem os itens já emitidos (`arquivos` fica vazio).
+        Retorna None quando a resposta não é um objeto JSON válido.
+        """
+        try:
+            dados = orjson.loads(self.texto_restante)
+        except orjson.JSONDecodeError:
+            return None
+        return dados if isinstance(dados, dict) else None
+
+    @property
+    def texto_restante(self) -> str:
+        return "".join(self._resto)
+
+    def _cauda_resto(self, atual: str, minimo: int = 32) -> str:
+        partes = [atual]
+        total = len(atual)
+        for parte in reversed(self._resto):
+            if total >= minimo:
+                break
+            partes.append(parte)
+            total += len(parte)
+        return "".join(reversed(partes))
+
+    def _decodificar(self, texto: str) -> dict | None:
+        try:
+            item = orjson.loads(texto)
+        except orjson.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import re
+
+_PEDACOS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+CARACTERES_POR_TOKEN = 4
+TOKENS_POR_MENSAGEM = 4  # papel + separadores que o provedor adiciona a cada mensagem
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Estimativa local de tokens, sem tokenizer: cada palavra vale um token a cada
+    CARACTERES_POR_TOKEN caracteres e cada símbolo/pontuação vale um. Fica próxima do BPE
+    dos modelos GPT para português e código, o suficiente para orçar o contexto.
+    """
+    total = 0
+    for pedaco in _PEDACOS.finditer(texto):
+        total += 1 + (pedaco.end() - pedaco.start() - 1) // CARACTERES_POR_TOKEN
+    return total
@@ -0,0 +1,37 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# antes de importar o app: settings é lido uma vez, no import de app.core.settings
+_BASE_TESTES = Path(tempfile.mkdtemp(prefix="agente_testes_"))
+os.environ.update(
+    LLM_PROVIDER="fake",
+    LLM_FAKE_LATENCIA_MS="1",
+    LLM_FAKE_LATENCIA_DESVIO_MS="0",
+    LLM_FAKE_LATENCIA_DISTRIBUICAO="constante",
+    LLM_FAKE_INTERVALO_TRECHO_MS="0",
+    LLM_BACKOFF_BASE="0.01",
+    BASE_DIR_SAIDA=str(_BASE_TESTES / "saida"),
+    BASE_DIR_CONVERSAS=str(_BASE_TESTES / "conversas"),
+    LOG_ASSINCRONO="false",
+)
+
+from loguru import logger  # noqa: E402
+
+from app.services.conversas import ConversasService  # noqa: E402
+from app.services.conversas_sqlite import ConversasSQLiteService  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _sem_logs() -> None:
+    logger.remove()
+
+
+@pytest.fixture(params=["arquivos", "sqlite"])
+def servico_conversas(request: pytest.FixtureRequest, tmp_path: Path):
+    """ConversasService em cada backend (CONVERSAS_BACKEND), num diretório próprio."""
+    if request.param == "sqlite":
+        return ConversasSQLiteService(str(tmp_path))
+    return ConversasService(str(tmp_path))
@@ -0,0 +1,207 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.core import admissao
+from app.core.admissao import BaldeTokens, ControleAdmissao, identificar_cliente
+from app.core.errors import ErroFilaCheia, ErroLimiteTaxa
+from app.core.settings import Settings
+
+
+def _request(chave: str | None = None, ip: str = "10.0.0.1") -> Request:
+    cabecalhos = [(b"x-api-key", chave.encode())] if chave else []
+    return Request({"type": "http", "headers": cabecalhos, "client": (ip, 1234)})
+
+
+def _controle(**campos: object) -> ControleAdmissao:
+    return ControleAdmissao(Settings(**campos))
+
+
+def test_balde_permite_rajada_e_depois_espera() -> None:
+    balde = BaldeTokens(capacidade=2, taxa=0.5)
+    assert balde.consumir() == 0
+    assert balde.consumir() == 0
+    assert balde.consumir() == pytest.approx(2.0, abs=0.01)
+
+
+def test_balde_repoe_com_o_tempo() -> None:
+    balde = BaldeTokens(capacidade=1, taxa=1.0)
+    balde.consumir()
+    balde.atualizado -= 1.0  # um segundo depois
+    assert balde.consumir() == 0
+    assert not balde.cheio()
+
+
+def test_cliente_identificado_pela_chave_ou_ip() -> None:
+    assert identificar_cliente(_request("k1")) == identificar_cliente(_request("k1", ip="10.0.0.2"))
+    assert identificar_cliente(_request("k1")) != identificar_cliente(_request("k2"))
+    assert identificar_cliente(_request()) == "ip:10.0.0.1"
+
+
+def test_taxa_por_cliente_responde_429_com_retry_after() -> None:
+    controle = _controle(
+        admissao_taxa_cliente=0.5, admissao_rajada_cliente=2, admissao_requisicoes_cliente=0
+    )
+    for _ in range(2):
+        with controle.cliente(_request("k1")):
+            pass
+    with pytest.raises(ErroLimiteTaxa) as erro:
+        controle.admitir(_request("k1"))
+    assert erro.value.status_code == 429
+    assert erro.value.headers == {"Retry-After": "2"}
+    with controle.cliente(_request("k2")):  # outro cliente tem o próprio balde
+        pass
+    assert controle.resumo()["rejeitadas_taxa"] == 1
+
+
+def test_concorrencia_por_cliente() -> None:
+    controle = _controle(admissao_taxa_cliente=0, admissao_requisicoes_cliente=1)
+    chave = controle.admitir(_request("k1"))
+    with pytest.raises(ErroLimiteTaxa) as erro:
+        controle.admitir(_request("k1"))
+    assert "Retry-After" in erro.value.headers
+    controle.liberar(chave)
+    controle.liberar(controle.admitir(_request("k1")))
+    assert controle.resumo()["clientes_ativos"] == 0
+
+
+def test_vagas_atendidas_em_ordem_de_chegada() -> None:
+    controle = _controle(admissao_max_concorrencia=1, admissao_fila_maxima=10)
+    ordem: list[int] = []
+
+    async def chamada(indice: int) -> None:
+        async with controle.vaga():
+            ordem.append(indice)
+            await asyncio.sleep(0.001)
+
+    async def cenario() -> None:
+        tarefas = []
+        for indice in range(5):
+            tarefas.append(asyncio.create_task(chamada(indice)))
+            await asyncio.sleep(0)  # garante a ordem de chegada
+        await asyncio.gather(*tarefas)
+
+    asyncio.run(cenario())
+    assert ordem == [0, 1, 2, 3, 4]
+    assert controle.resumo()["em_execucao"] == 0
+    assert controle.resumo()["na_fila"] == 0
+
+
+def test_fila_cheia_responde_503_com_retry_after() -> None:
+    controle = _controle(admissao_max_concorrencia=1, admissao_fila_maxima=1)
+
+    async def cenario() -> None:
+        liberar = asyncio.Event()
+
+        async def ocupar() -> None:
+            async with controle.vaga():
+                await liberar.wait()
+
+        tarefas = [asyncio.create_task(ocupar()) for _ in range(2)]  # uma em uso, uma na fila
+        await asyncio.sleep(0)
+        with pytest.raises(ErroFilaCheia) as erro:
+            async with controle.vaga():
+                pass
+        assert erro.value.status_code == 503
+        assert int(erro.value.headers["Retry-After"]) >= 1
+        liberar.set()
+        await asyncio.gather(*tarefas)
+
+    asyncio.run(cenario())
+    assert controle.resumo()["rejeitadas_sobrecarga"] == 1
+
+
+def test_espera_maxima_esgotada_responde_503() -> None:
+    controle = _controle(
+        admissao_max_concorrencia=1, admissao_fila_maxima=5, admissao_espera_maxima=0.01
+    )
+
+    async def cenario() -> None:
+        liberar = asyncio.Event()
+
+        async def ocupar() -> None:
+            async with controle.vaga():
+                await liberar.wait()
+
+        tarefa = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        with pytest.raises(ErroFilaCheia):
+            async with controle.vaga():
+                pass
+        assert controle.resumo()["na_fila"] == 0
+        liberar.set()
+        await tarefa
+
+    asyncio.run(cenario())
+
+
+def test_espera_esgotada_enquanto_a_vaga_e_liberada() -> None:
+    controle = _controle(
+        admissao_max_concorrencia=1, admissao_fila_maxima=5, admissao_espera_maxima=0.01
+    )
+
+    async def ocupar() -> None:
+        async with controle.vaga():
+            await asyncio.sleep(0.005)
+
+    async def cenario() -> None:
+        ocupante = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        na_fila = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        # bloqueia o loop: o fim da chamada e o prazo da fila vencem na mesma volta, e a vaga
+        # é liberada (tirando da fila o futuro já cancelado) antes de a espera tratar o timeout
+        time.sleep(0.02)
+        await ocupante
+        with pytest.raises(ErroFilaCheia):
+            await na_fila
+
+    asyncio.run(cenario())
+    assert controle.resumo()["em_execucao"] == 0
+    assert controle.resumo()["na_fila"] == 0
+
+
+def test_cancelado_na_fila_nao_perde_a_vaga() -> None:
+    controle = _controle(admissao_max_concorrencia=1, admissao_fila_maxima=5)
+
+    async def cenario() -> None:
+        liberar = asyncio.Event()
+
+        async def ocupar() -> None:
+            async with controle.vaga():
+                await liberar.wait()
+
+        ocupante = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        na_fila = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        na_fila.cancel()
+        liberar.set()
+        await ocupante
+        with pytest.raises(asyncio.CancelledError):
+            await na_fila
+        async with controle.vaga():
+            assert controle.resumo()["em_execucao"] == 1
+
+    asyncio.run(cenario())
+    assert controle.resumo()["em_execucao"] == 0
+
+
+def test_chat_responde_429_pela_api(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.main import app
+
+    monkeypatch.setattr(
+        admissao.controle_admissao,
+        "settings",
+        Settings(admissao_taxa_cliente=0.001, admissao_rajada_cliente=1),
+    )
+    corpo = {"mensagens": [{"papel": "usuario", "conteudo": "crie uma página"}]}
+    cabecalhos = {"X-API-Key": "teste-429"}
+    with TestClient(app) as cliente:
+        assert cliente.post("/v1/chat", json=corpo, headers=cabecalhos).status_code == 200
+        resposta = cliente.post("/v1/chat", json=corpo, headers=cabecalhos)
+    assert resposta.status_code == 429
+    assert int(resposta.headers["retry-after"]) > 1
@@ -0,0 +1,45 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+
+from app.utils.blocos import eh_passos_execucao, extrair_blocos, extrair_blocos_async
+
+RESPOSTA = (
+    "Segue o projeto.\n"
+    "```index.html\n<h1>Olá</h1>\n```\n"
+    "texto entre blocos\n"
+    "```/assets/script.js\nconsole.log(`crase`);\n\n```\n"
+    "```\n```\n"
+    "```sem_conteudo\n```\n"
+    "fim"
+)
+ESPERADO = [
+    ("index.html", "<h1>Olá</h1>"),
+    ("assets/script.js", "console.log(`crase`);"),
+]
+
+
+def test_extrai_blocos_e_ignora_vazios() -> None:
+    assert list(extrair_blocos(RESPOSTA)) == ESPERADO
+
+
+def test_bloco_aberto_no_fim_e_fechado() -> None:
+    assert list(extrair_blocos("```a.txt\nlinha 1\nlinha 2")) == [("a.txt", "linha 1\nlinha 2")]
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 5, 64])
+def test_streaming_com_cercas_divididas(tamanho: int) -> None:
+    async def trechos() -> AsyncIterator[str]:
+        for inicio in range(0, len(RESPOSTA), tamanho):
+            yield RESPOSTA[inicio : inicio + tamanho]
+
+    async def coletar() -> list[tuple[str, str]]:
+        return [par async for par in extrair_blocos_async(trechos())]
+
+    assert asyncio.run(coletar()) == ESPERADO
+
+
+def test_passos_execucao() -> None:
+    assert eh_passos_execucao("PASSOS_EXECUCAO.md")
+    assert not eh_passos_execucao("docs/passos_execucao.md")
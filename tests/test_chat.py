@@ -0,0 +1,55 @@
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.settings import settings
+from app.main import app
+
+ARQUIVO = {"caminho": "index.html", "conteudo": "<h1>Olá</h1>"}
+VALIDA = orjson.dumps({"mensagem": "Página criada", "arquivos": [ARQUIVO]}).decode()
+CORPO = {"mensagens": [{"papel": "usuario", "conteudo": "crie uma página"}]}
+
+
+@pytest.fixture
+def resposta_llm(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Fixa o texto devolvido pelo provedor fake (LLM_FAKE_RESPOSTA_ARQUIVO)."""
+
+    def definir(texto: str) -> None:
+        caminho = tmp_path / "resposta.txt"
+        caminho.write_text(texto, encoding="utf-8")
+        monkeypatch.setattr(settings, "llm_fake_resposta_arquivo", str(caminho))
+
+    return definir
+
+
+def _stream(cliente: TestClient) -> tuple[str, dict]:
+    with cliente.stream("POST", "/v1/chat/stream", json=CORPO) as resposta:
+        linhas = [linha for linha in resposta.iter_lines() if linha]
+    evento = linhas[-2].removeprefix("event: ")
+    return evento, orjson.loads(linhas[-1].removeprefix("data: "))
+
+
+@pytest.mark.parametrize("rota", ["/v1/chat", "/v1/chat/stream"])
+def test_resposta_valida_salva_os_arquivos(resposta_llm, rota: str) -> None:
+    resposta_llm(VALIDA)
+    with TestClient(app) as cliente:
+        if rota == "/v1/chat":
+            dados = cliente.post(rota, json=CORPO).json()
+        else:
+            evento, dados = _stream(cliente)
+            assert evento == "fim"
+    assert [caminho.rsplit("/", 1)[-1] for caminho in dados["arquivos_salvos"]] == ["index.html"]
+
+
+@pytest.mark.parametrize("texto", [VALIDA[:-2], f"```json\n{VALIDA}\n```"])
+@pytest.mark.parametrize("rota", ["/v1/chat", "/v1/chat/stream"])
+def test_resposta_invalida_nao_salva_arquivos(resposta_llm, rota: str, texto: str) -> None:
+    resposta_llm(texto)
+    with TestClient(app) as cliente:
+        if rota == "/v1/chat":
+            dados = cliente.post(rota, json=CORPO).json()
+        else:
+            evento, dados = _stream(cliente)
+            assert evento == "fim"
+    assert dados["arquivos_salvos"] == []
+    assert dados["projeto_dir"] is None
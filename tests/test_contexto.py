@@ -0,0 +1,127 @@
+import asyncio
+
+from app.core.errors import ErroLLM
+from app.core.settings import Settings
+from app.schemas.chat import MensagemChat
+from app.schemas.conversa import ContextoConversa, ResumoConversa
+from app.services.contexto import OrcamentoContexto
+from app.utils.tokens import TOKENS_POR_MENSAGEM, estimar_tokens
+
+ORCAMENTO = 200
+
+
+class LLMResumo:
+    """Substitui o LLMClient: devolve sempre o mesmo resumo e guarda os pedidos."""
+
+    def __init__(self, texto: str = "resumo curto", falhar: bool = False) -> None:
+        self.texto = texto
+        self.falhar = falhar
+        self.pedidos: list[list[dict[str, str]]] = []
+
+    async def chat(self, mensagens: list[dict[str, str]], *_: object) -> str:
+        self.pedidos.append(mensagens)
+        if self.falhar:
+            raise ErroLLM("provedor fora do ar")
+        return self.texto
+
+
+def _historico(total: int, palavras: int = 20) -> list[dict[str, str]]:
+    papeis = ("user", "assistant")
+    return [
+        {"role": papeis[indice % 2], "content": f"m{indice} " + "abc " * palavras}
+        for indice in range(total)
+    ]
+
+
+def _tokens(mensagens: list[dict[str, str]]) -> int:
+    return sum(estimar_tokens(m["content"]) + TOKENS_POR_MENSAGEM for m in mensagens)
+
+
+def _aplicar(llm: LLMResumo, mensagens, salvo: ContextoConversa | None = None):
+    orcamento = OrcamentoContexto(llm, Settings(contexto_max_tokens=ORCAMENTO))
+    return asyncio.run(orcamento.aplicar(mensagens, salvo))
+
+
+def test_estimar_tokens() -> None:
+    assert estimar_tokens("") == 0
+    assert estimar_tokens("oi") == 1
+    assert estimar_tokens("abcdefgh") == 2  # uma palavra a cada 4 caracteres
+    assert estimar_tokens("a, b.") == 4  # pontuação conta à parte
+
+
+def test_historico_curto_passa_inteiro() -> None:
+    llm = LLMResumo()
+    mensagens = _historico(3)
+    assert _aplicar(llm, mensagens) == (mensagens, None)
+    assert llm.pedidos == []
+
+
+def test_orcamento_respeitado_com_resumo() -> None:
+    llm = LLMResumo()
+    mensagens = _historico(20)
+    assert _tokens(mensagens) > ORCAMENTO
+
+    enviadas, resumo = _aplicar(llm, mensagens)
+    assert _tokens(enviadas) <= ORCAMENTO
+    assert resumo is not None and resumo.texto == "resumo curto"
+    assert enviadas[0]["role"] == "system"
+    assert enviadas[0]["content"].endswith("\nresumo curto")
+    assert enviadas[1:] == mensagens[resumo.ate :]
+    # a janela volta para metade do orçamento e o resumo cobre as mensagens que saíram
+    assert _tokens(enviadas[1:]) <= ORCAMENTO // 2
+    assert "m0 " in llm.pedidos[0][1]["content"]
+    assert len(llm.pedidos) == 1
+
+
+def test_resumo_salvo_e_reaproveitado(servico_conversas) -> None:
+    llm = LLMResumo()
+    historico = [
+        MensagemChat(papel="usuario" if m["role"] == "user" else "agente", conteudo=m["content"])
+        for m in _historico(20)
+    ]
+    conversa_id = servico_conversas.registrar(historico[:-1], historico[-1].conteudo).id
+    _, resumo = _aplicar(llm, [m.to_llm_payload() for m in historico])
+    servico_conversas.salvar_resumo(conversa_id, resumo)
+
+    salvo = servico_conversas.obter_contexto(conversa_id)
+    assert salvo.resumo == resumo
+    assert len(salvo.tokens) == len(historico)
+
+    # o turno seguinte cabe na janela com o resumo salvo: nenhum resumo novo
+    proximo = [m.to_llm_payload() for m in historico] + _historico(1)
+    enviadas, novo = _aplicar(llm, proximo, salvo)
+    assert novo is None
+    assert enviadas[1:] == proximo[resumo.ate :]
+    assert _tokens(enviadas) <= ORCAMENTO
+    assert len(llm.pedidos) == 1
+
+
+def test_resumo_descartado_se_o_historico_encolheu() -> None:
+    llm = LLMResumo()
+    salvo = ContextoConversa(resumo=ResumoConversa(texto="antigo", ate=10))
+    mensagens = _historico(3)
+    assert _aplicar(llm, mensagens, salvo) == (mensagens, None)
+
+
+def test_mensagem_maior_que_o_orcamento_inteiro() -> None:
+    llm = LLMResumo()
+    enorme = _historico(1, palavras=ORCAMENTO * 2)
+    assert _tokens(enorme) > ORCAMENTO
+
+    # sozinha: vai inteira, sem resumo (não há o que resumir)
+    assert _aplicar(llm, enorme) == (enorme, None)
+    assert llm.pedidos == []
+
+    # depois de outras: as anteriores viram resumo e a enorme continua inteira
+    mensagens = _historico(4) + enorme
+    enviadas, resumo = _aplicar(llm, mensagens)
+    assert resumo is not None and resumo.ate == 4
+    assert enviadas[1:] == enorme
+
+
+def test_falha_no_resumo_cai_para_a_janela() -> None:
+    mensagens = _historico(20)
+    enviadas, resumo = _aplicar(LLMResumo(falhar=True), mensagens)
+    assert resumo is None
+    assert enviadas == mensagens[-len(enviadas) :]
+    assert _tokens(enviadas) <= ORCAMENTO // 2
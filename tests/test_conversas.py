@@ -0,0 +1,130 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import conversas as api_conversas
+from app.schemas.chat import MensagemChat
+from app.schemas.conversa import ResumoConversa
+from app.services.conversas_sqlite import ConversasSQLiteService
+
+
+def mensagem(conteudo: str, papel: str = "usuario") -> MensagemChat:
+    return MensagemChat(papel=papel, conteudo=conteudo)
+
+
+def _criar(servico, total: int) -> list[str]:
+    """Cria `total` conversas e devolve os ids da mais recente para a mais antiga."""
+    ids = [
+        servico.registrar([mensagem(f"pedido {indice}")], "ok", contexto=f"Projeto {indice}").id
+        for indice in range(total)
+    ]
+    return ids[::-1]
+
+
+def _historico(servico, conversa_id: str) -> list[tuple[str, str]]:
+    return [(m.papel, m.conteudo) for m in servico.obter(conversa_id).mensagens]
+
+
+def test_paginas_seguem_a_ordem_sem_repetir(servico_conversas) -> None:
+    esperado = _criar(servico_conversas, 7)
+    vistos: list[str] = []
+    cursor = None
+    while True:
+        pagina = servico_conversas.listar(limite=3, cursor=cursor)
+        vistos += [item.id for item in pagina.itens]
+        cursor = pagina.proximo_cursor
+        if cursor is None:
+            break
+    assert vistos == esperado
+    assert servico_conversas.total() == 7
+
+
+def test_sem_limite_lista_tudo(servico_conversas) -> None:
+    esperado = _criar(servico_conversas, 4)
+    pagina = servico_conversas.listar()
+    assert [item.id for item in pagina.itens] == esperado
+    assert pagina.proximo_cursor is None
+
+
+def test_atualizar_leva_a_conversa_para_o_topo(servico_conversas) -> None:
+    ids = _criar(servico_conversas, 3)
+    mais_antiga = ids[-1]
+    servico_conversas.registrar(
+        [mensagem("pedido 0"), mensagem("ok", "agente"), mensagem("mais")], "ok", mais_antiga
+    )
+    assert [item.id for item in servico_conversas.listar().itens] == [mais_antiga, *ids[:-1]]
+
+
+def test_prefixo_filtra_titulo_e_contexto(servico_conversas) -> None:
+    _criar(servico_conversas, 3)
+    servico_conversas.registrar([mensagem("x")], "ok", contexto="Loja virtual")
+    itens = servico_conversas.listar(prefixo="loja").itens
+    assert [item.contexto for item in itens] == ["Loja virtual"]
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm9wZQ", "WzEsIDJd"])
+def test_cursor_invalido(servico_conversas, cursor: str) -> None:
+    with pytest.raises(ValueError):
+        servico_conversas.listar(limite=2, cursor=cursor)
+
+
+def test_historico_editado_e_regravado(servico_conversas) -> None:
+    conversa_id = servico_conversas.registrar([mensagem("a")], "r1", contexto="Edição").id
+    servico_conversas.registrar(
+        [mensagem("a"), mensagem("r1", "agente"), mensagem("b")], "r2", conversa_id
+    )
+    # mesmo tamanho, primeira mensagem editada
+    servico_conversas.registrar(
+        [mensagem("a editada"), mensagem("r1", "agente"), mensagem("b")], "r2b", conversa_id
+    )
+    assert _historico(servico_conversas, conversa_id) == [
+        ("usuario", "a editada"),
+        ("agente", "r1"),
+        ("usuario", "b"),
+        ("agente", "r2b"),
+    ]
+    # histórico menor que o armazenado
+    servico_conversas.registrar([mensagem("z")], "r3", conversa_id)
+    assert _historico(servico_conversas, conversa_id) == [("usuario", "z"), ("agente", "r3")]
+
+
+def test_sqlite_descarta_resumo_de_trecho_editado(tmp_path) -> None:
+    servico = ConversasSQLiteService(str(tmp_path))
+    historico = [mensagem("a"), mensagem("r1", "agente"), mensagem("b")]
+    conversa_id = servico.registrar(historico, "r2", contexto="Resumo").id
+    servico.salvar_resumo(conversa_id, ResumoConversa(texto="resumo", ate=2))
+
+    servico.registrar([*historico, mensagem("r2", "agente"), mensagem("c")], "r3", conversa_id)
+    assert servico.obter(conversa_id).resumo == ResumoConversa(texto="resumo", ate=2)
+
+    servico.registrar([mensagem("a"), mensagem("outra", "agente")], "r4", conversa_id)
+    assert servico.obter(conversa_id).resumo is None
+
+
+@pytest.fixture
+def cliente_api(servico_conversas, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    monkeypatch.setattr(api_conversas, "conversas_service", servico_conversas)
+    app = FastAPI()
+    app.include_router(api_conversas.router, prefix="/v1")
+    return TestClient(app)
+
+
+def test_api_sem_limite_nem_cursor_nao_pagina(servico_conversas, cliente_api) -> None:
+    esperado = _criar(servico_conversas, 5)
+    resposta = cliente_api.get("/v1/conversas")
+    assert resposta.status_code == 200
+    assert [item["id"] for item in resposta.json()] == esperado
+    assert "x-proximo-cursor" not in resposta.headers
+
+
+def test_api_pagina_pelo_cabecalho(servico_conversas, cliente_api) -> None:
+    esperado = _criar(servico_conversas, 5)
+    primeira = cliente_api.get("/v1/conversas", params={"limite": 3})
+    cursor = primeira.headers["x-proximo-cursor"]
+    segunda = cliente_api.get("/v1/conversas", params={"cursor": cursor})
+    assert [item["id"] for item in primeira.json() + segunda.json()] == esperado
+    assert "x-proximo-cursor" not in segunda.headers
+
+
+def test_api_cursor_invalido(cliente_api) -> None:
+    assert cliente_api.get("/v1/conversas", params={"cursor": "!!!"}).status_code == 400
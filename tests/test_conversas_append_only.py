@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import pytest
+
+from app.core.settings import settings
+from app.schemas.chat import MensagemChat
+from app.services.conversas import ConversasService
+
+
+def mensagem(conteudo: str, papel: str = "usuario") -> MensagemChat:
+    return MensagemChat(papel=papel, conteudo=conteudo)
+
+
+_HISTORICO = [mensagem("a"), mensagem("r1", "agente"), mensagem("b"), mensagem("r2", "agente")]
+
+
+@pytest.fixture
+def servico(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ConversasService:
+    monkeypatch.setattr(settings, "conversas_append_only", True)
+    return ConversasService(str(tmp_path))
+
+
+def _caminhos(servico: ConversasService, conversa_id: str) -> tuple[Path, Path]:
+    json_path = servico._resolver_json_path(conversa_id)
+    return json_path, servico._log_path(json_path)
+
+
+def _historico(servico: ConversasService, conversa_id: str) -> list[tuple[str, str]]:
+    return [(m.papel, m.conteudo) for m in servico.obter(conversa_id).mensagens]
+
+
+def _dois_turnos(servico: ConversasService) -> str:
+    """Conversa com o histórico de `_HISTORICO`: o segundo turno já vai para o log."""
+    conversa_id = servico.registrar(_HISTORICO[:1], "r1", contexto="Append").id
+    servico.registrar(_HISTORICO[:3], "r2", conversa_id)
+    return conversa_id
+
+
+def test_turno_novo_vai_para_o_log(servico: ConversasService) -> None:
+    conversa_id = servico.registrar([mensagem("a")], "r1", contexto="Append").id
+    json_path, log_path = _caminhos(servico, conversa_id)
+    json_original = json_path.read_bytes()
+
+    servico.registrar([mensagem("a"), mensagem("r1", "agente"), mensagem("b")], "r2", conversa_id)
+    assert json_path.read_bytes() == json_original
+    assert len(log_path.read_bytes().splitlines()) == 3  # b, r2 e o cabeçalho
+    assert _historico(servico, conversa_id) == [
+        ("usuario", "a"),
+        ("agente", "r1"),
+        ("usuario", "b"),
+        ("agente", "r2"),
+    ]
+    assert servico.indice.obter(conversa_id)["total_mensagens"] == 4
+
+
+def test_log_relido_por_outra_instancia(servico: ConversasService) -> None:
+    conversa_id = _dois_turnos(servico)
+    outra = ConversasService(str(servico.base_dir))
+    assert _historico(outra, conversa_id) == _historico(servico, conversa_id)
+
+
+def test_compacta_acima_do_limite(servico: ConversasService, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "conversas_log_max_bytes", 1)
+    conversa_id = _dois_turnos(servico)
+    json_path, log_path = _caminhos(servico, conversa_id)
+    assert not log_path.exists()
+    assert len(servico._ler_dados(json_path)["mensagens"]) == 4
+    assert not list(json_path.parent.glob("*.tmp"))
+
+
+def test_compactacao_interrompida_nao_duplica(servico: ConversasService) -> None:
+    conversa_id = _dois_turnos(servico)
+    servico.atualizar_ultima_resposta(conversa_id, "r2 editada")
+    json_path, log_path = _caminhos(servico, conversa_id)
+    log = log_path.read_bytes()
+    servico.compactar(conversa_id)
+    log_path.write_bytes(log)  # o processo caiu entre gravar o JSON e apagar o log
+
+    esperado = [("usuario", "a"), ("agente", "r1"), ("usuario", "b"), ("agente", "r2 editada")]
+    assert _historico(servico, conversa_id) == esperado
+    servico.registrar(
+        [*(mensagem(conteudo, papel) for papel, conteudo in esperado), mensagem("c")],
+        "r3",
+        conversa_id,
+    )
+    assert _historico(servico, conversa_id) == [*esperado, ("usuario", "c"), ("agente", "r3")]
+
+
+def test_atualizar_ultima_resposta(servico: ConversasService) -> None:
+    conversa_id = _dois_turnos(servico)
+    json_path, _ = _caminhos(servico, conversa_id)
+    json_original = json_path.read_bytes()
+    servico.atualizar_ultima_resposta(conversa_id, "r2 final")
+    assert json_path.read_bytes() == json_original
+    assert _historico(servico, conversa_id)[-1] == ("agente", "r2 final")
+
+    # o cliente reenvia a resposta atualizada: continua só acrescentando ao log
+    historico = [*_HISTORICO[:3], mensagem("r2 final", "agente"), mensagem("c")]
+    servico.registrar(historico, "r3", conversa_id)
+    assert json_path.read_bytes() == json_original
+    assert len(_historico(servico, conversa_id)) == 6
+
+
+def test_historico_editado_regrava_o_json(servico: ConversasService) -> None:
+    conversa_id = _dois_turnos(servico)
+    json_path, log_path = _caminhos(servico, conversa_id)
+    editado = [mensagem("a editada"), *_HISTORICO[1:]]
+    servico.registrar([*editado, mensagem("c")], "r3", conversa_id)
+    assert not log_path.exists()
+    assert _historico(servico, conversa_id)[0] == ("usuario", "a editada")
+    assert len(servico._ler_dados(json_path)["mensagens"]) == 6
+
+
+def test_indice_sem_digest_rele_a_conversa(servico: ConversasService) -> None:
+    conversa_id = _dois_turnos(servico)
+    entrada = servico.indice.obter(conversa_id)
+    for campo in ("digest_historico", "digest_anterior"):
+        entrada.pop(campo)
+    servico.indice.atualizar(entrada)  # como gravado por uma versão anterior
+    _, log_path = _caminhos(servico, conversa_id)
+
+    servico.registrar([*_HISTORICO, mensagem("c")], "r3", conversa_id)
+    assert not log_path.exists()
+    assert len(_historico(servico, conversa_id)) == 6
+    assert "digest_historico" in servico.indice.obter(conversa_id)
@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.adapters.fs_client import FSClient
+from app.adapters.manifesto import ManifestoProjeto, hash_conteudo
+from app.core.errors import ErroEscritaArquivo
+
+
+def _arquivos(raiz) -> set[str]:
+    return {caminho.relative_to(raiz).as_posix() for caminho in raiz.rglob("*")}
+
+
+def test_confirmar_coloca_os_arquivos_no_lugar(tmp_path) -> None:
+    fs = FSClient(str(tmp_path))
+    lote = fs.lote()
+    lote.preparar("index.html", "<h1>oi</h1>")
+    lote.preparar("assets/js/app.js", "console.log(1)")
+    # antes de confirmar só existem os temporários
+    assert not (tmp_path / "index.html").exists()
+
+    escritos = lote.confirmar()
+    assert escritos == [str(tmp_path / "index.html"), str(tmp_path / "assets/js/app.js")]
+    assert (tmp_path / "assets/js/app.js").read_text(encoding="utf-8") == "console.log(1)"
+    assert _arquivos(tmp_path) == {"index.html", "assets", "assets/js", "assets/js/app.js"}
+    assert lote.adicionados == escritos
+
+
+def test_caminho_repetido_vale_o_ultimo(tmp_path) -> None:
+    lote = FSClient(str(tmp_path)).lote()
+    lote.preparar("a.txt", "primeiro")
+    lote.preparar("a.txt", "segundo")
+    lote.confirmar()
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "segundo"
+    assert _arquivos(tmp_path) == {"a.txt"}
+
+
+def test_descartar_desfaz_o_lote(tmp_path) -> None:
+    (tmp_path / "existente.txt").write_text("antigo", encoding="utf-8")
+    lote = FSClient(str(tmp_path)).lote()
+    lote.preparar("novo/dir/a.txt", "a")
+    lote.preparar("b.txt", "b")
+    lote.descartar()
+    assert _arquivos(tmp_path) == {"existente.txt"}
+
+
+def test_falha_no_lote_nao_deixa_arquivos_novos(tmp_path) -> None:
+    (tmp_path / "existente.txt").write_text("antigo", encoding="utf-8")
+    fs = FSClient(str(tmp_path))
+    with pytest.raises(ErroEscritaArquivo):
+        fs.escrever_lote([("pasta/a.txt", "a"), ("existente.txt", "novo")])
+    assert _arquivos(tmp_path) == {"existente.txt"}
+    assert (tmp_path / "existente.txt").read_text(encoding="utf-8") == "antigo"
+
+
+def test_confirmar_interrompido_restaura_os_sobrescritos(tmp_path) -> None:
+    (tmp_path / "a.txt").write_text("antigo a", encoding="utf-8")
+    (tmp_path / "c.txt").write_text("antigo c", encoding="utf-8")
+    lote = FSClient(str(tmp_path)).lote(overwrite=True)
+    lote.preparar("a.txt", "novo a")
+    lote.preparar("b.txt", "novo b")
+    destino_c = lote.preparar("c.txt", "novo c")
+    # o temporário de c some: o rename dele falha depois de a e b já estarem no lugar
+    lote._preparados[destino_c][1].unlink()
+
+    with pytest.raises(FileNotFoundError):
+        lote.confirmar()
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "novo a"
+
+    lote.descartar()
+    assert _arquivos(tmp_path) == {"a.txt", "c.txt"}
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "antigo a"
+    assert (tmp_path / "c.txt").read_text(encoding="utf-8") == "antigo c"
+
+
+def test_confirmar_com_overwrite_nao_deixa_backups(tmp_path) -> None:
+    (tmp_path / "a.txt").write_text("antigo", encoding="utf-8")
+    lote = FSClient(str(tmp_path)).escrever_lote([("a.txt", "novo")], overwrite=True)
+    assert lote.modificados == [str(tmp_path / "a.txt")]
+    assert _arquivos(tmp_path) == {"a.txt"}
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "novo"
+
+
+def test_path_traversal(tmp_path) -> None:
+    lote = FSClient(str(tmp_path / "projeto")).lote()
+    with pytest.raises(ErroEscritaArquivo):
+        lote.preparar("../fora.txt", "x")
+
+
+def test_manifesto_pula_arquivos_inalterados(tmp_path) -> None:
+    fs = FSClient(str(tmp_path))
+    itens = [("index.html", "<h1>oi</h1>"), ("app.js", "1")]
+    fs.escrever_lote(itens, overwrite=True, manifesto=ManifestoProjeto(tmp_path))
+
+    manifesto = ManifestoProjeto(tmp_path)
+    lote = fs.escrever_lote(
+        [("index.html", "<h1>oi</h1>"), ("app.js", "2"), ("novo.css", "a {}")],
+        overwrite=True,
+        manifesto=manifesto,
+    )
+    assert lote.relatorio() == {
+        "adicionados": [str(tmp_path / "novo.css")],
+        "modificados": [str(tmp_path / "app.js")],
+        "inalterados": [str(tmp_path / "index.html")],
+    }
+    assert lote.escritos == [str(tmp_path / nome) for nome in ("index.html", "app.js", "novo.css")]
+    assert (tmp_path / "app.js").read_text(encoding="utf-8") == "2"
+    # o manifesto fica fora do projeto e não entra no que vai para o commit
+    assert manifesto.caminho.exists()
+    assert not manifesto.caminho.is_relative_to(tmp_path)
+    assert _arquivos(tmp_path) == {"index.html", "app.js", "novo.css"}
+    assert lote.alterados() == [str(tmp_path / "novo.css"), str(tmp_path / "app.js")]
+
+
+def test_manifestos_salvos_em_paralelo(tmp_path) -> None:
+    projeto = tmp_path / "projeto"
+    projeto.mkdir()
+    manifestos = tmp_path / "manifestos"
+    manifestos.mkdir()
+    for i in range(32):
+        (projeto / f"{i}.txt").write_text(str(i), encoding="utf-8")
+
+    def salvar(i: int) -> None:
+        manifesto = ManifestoProjeto(projeto, manifestos)
+        manifesto.registrar(projeto / f"{i}.txt", hash_conteudo(str(i)))
+        manifesto.salvar()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(salvar, range(32)))
+    # cada gravação usa seu próprio temporário: nenhum sobra nem quebra o replace de outra
+    assert [caminho.suffix for caminho in manifestos.iterdir()] == [".json"]
+    assert ManifestoProjeto(projeto, manifestos)._entradas
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from app.adapters import git_client
+from app.adapters.git_client import GitClient, obter_repo
+from app.core.settings import settings
+
+
+@pytest.fixture
+def repo_dir(tmp_path):
+    (tmp_path / "index.html").write_text("<h1>oi</h1>", encoding="utf-8")
+    return tmp_path
+
+
+def _arquivos_no_commit(cliente: GitClient, commit: str) -> set[str]:
+    return set(cliente.repo.git.ls_tree("-r", "--name-only", commit).splitlines())
+
+
+def test_primeiro_commit_adiciona_tudo(repo_dir) -> None:
+    (repo_dir / "app.js").write_text("1", encoding="utf-8")
+    cliente = GitClient(str(repo_dir))
+    # no primeiro commit `caminhos` é ignorado: não há HEAD para o commit-tree
+    commit = cliente.commit_tudo("inicial", [str(repo_dir / "index.html")])
+    assert cliente.repo.head.commit.hexsha == commit
+    assert _arquivos_no_commit(cliente, commit) == {"index.html", "app.js"}
+
+
+def test_commit_sem_mudancas_devolve_o_head(repo_dir) -> None:
+    cliente = GitClient(str(repo_dir))
+    inicial = cliente.commit_tudo("inicial")
+    assert cliente.commit_tudo("nada mudou") == inicial
+    assert cliente.commit_tudo("nada mudou", [str(repo_dir / "index.html")]) == inicial
+    assert cliente.commit_tudo("lista vazia", []) == inicial
+    assert len(list(cliente.repo.iter_commits())) == 1
+
+
+def test_commit_so_dos_caminhos_informados(repo_dir) -> None:
+    cliente = GitClient(str(repo_dir))
+    inicial = cliente.commit_tudo("inicial")
+    (repo_dir / "index.html").write_text("<h1>tchau</h1>", encoding="utf-8")
+    (repo_dir / "fora.txt").write_text("fica de fora", encoding="utf-8")
+
+    commit = cliente.commit_tudo("feat: altera index", [str(repo_dir / "index.html")])
+    assert commit != inicial
+    assert cliente.repo.head.commit.hexsha == commit
+    assert cliente.repo.head.commit.parents[0].hexsha == inicial
+    assert cliente.repo.head.commit.message.strip() == "feat: altera index"
+    assert _arquivos_no_commit(cliente, commit) == {"index.html"}
+    assert "fora.txt" in cliente.repo.untracked_files
+
+
+def test_commits_na_janela_viram_um_so(repo_dir, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "git_agrupar_commits_segundos", 0.05)
+    cliente = GitClient(str(repo_dir))
+    cliente.commit_tudo("inicial")
+    for nome in ("a.js", "b.js", "c.js"):
+        (repo_dir / nome).write_text(nome, encoding="utf-8")
+
+    async def tres_geracoes() -> list[str]:
+        return await asyncio.gather(
+            *[
+                GitClient(str(repo_dir)).commit_async(f"feat: {nome}", [str(repo_dir / nome)])
+                for nome in ("a.js", "b.js", "c.js")
+            ]
+        )
+
+    hashes = asyncio.run(tres_geracoes())
+    assert len(set(hashes)) == 1
+    commit = cliente.repo.commit(hashes[0])
+    assert commit.message.startswith("feat: 3 gerações agrupadas")
+    assert "- feat: b.js" in commit.message
+    assert {"a.js", "b.js", "c.js"} <= _arquivos_no_commit(cliente, hashes[0])
+    assert len(list(cliente.repo.iter_commits())) == 2
+    assert repo_dir.resolve() not in git_client._agrupadores
+
+
+def test_agrupador_de_um_loop_encerrado_nao_trava(
+    repo_dir, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "git_agrupar_commits_segundos", 0.05)
+    cliente = GitClient(str(repo_dir))
+
+    async def desistir() -> None:
+        # o loop termina antes da janela: o agrupador fica pendente em `_agrupadores`
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(cliente.commit_async("abandonado"), 0.01)
+
+    asyncio.run(desistir())
+
+    async def commitar() -> str:
+        return await asyncio.wait_for(cliente.commit_async("inicial"), 5)
+
+    assert asyncio.run(commitar()) == cliente.repo.head.commit.hexsha
+
+
+def test_cache_de_repos_descarta_o_menos_usado(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(git_client, "MAX_REPOS_EM_CACHE", 2)
+    monkeypatch.setattr(git_client, "_repos", git_client.OrderedDict())
+    diretorios = [tmp_path / nome for nome in ("a", "b", "c")]
+    for diretorio in diretorios:
+        diretorio.mkdir()
+
+    primeiro, _ = obter_repo(diretorios[0])
+    obter_repo(diretorios[1])
+    assert obter_repo(diretorios[0])[0] is primeiro  # reaproveitado e marcado como recente
+    obter_repo(diretorios[2])  # passa do limite: sai "b", o menos usado
+    assert list(git_client._repos) == [diretorios[0].resolve(), diretorios[2].resolve()]
+
+    reaberto, _ = obter_repo(diretorios[1])
+    assert (diretorios[1] / ".git").exists()
+    assert diretorios[0].resolve() not in git_client._repos
+    assert obter_repo(diretorios[1])[0] is reaberto
@@ -0,0 +1,117 @@
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+from app.schemas.chat import MensagemChat
+from app.services.conversas import ConversasService
+from app.services.indice_conversas import IndiceConversas
+
+
+def _criar(servico: ConversasService, total: int) -> list[str]:
+    """Cria `total` conversas e devolve os ids da mais recente para a mais antiga."""
+    ids = [
+        servico.registrar([MensagemChat(papel="usuario", conteudo=f"pedido {i}")], "ok").id
+        for i in range(total)
+    ]
+    return ids[::-1]
+
+
+def _resumo(conversa_id: str, atualizado_em: str) -> dict:
+    return {"id": conversa_id, "atualizado_em": atualizado_em, "titulo": conversa_id}
+
+
+def _linhas(indice: IndiceConversas) -> int:
+    return len(indice.arquivo.read_bytes().splitlines())
+
+
+def test_reconstruir_indice_a_partir_dos_arquivos(tmp_path: Path) -> None:
+    servico = ConversasService(str(tmp_path))
+    ids = _criar(servico, 4)
+    antes = servico.listar().itens
+    (tmp_path / ids[0] / f"{ids[0]}.json").write_text("{corrompido", encoding="utf-8")
+    servico.indice.arquivo.unlink()
+
+    # um serviço novo no mesmo diretório percebe que o índice sumiu e o reconstrói
+    reaberto = ConversasService(str(tmp_path))
+    assert reaberto.indice_reconstruido
+    assert reaberto.indice.existe()
+    assert reaberto.listar().itens == antes[1:]  # a conversa ilegível fica de fora
+    assert reaberto.total() == 3
+    assert reaberto.indice.obter(ids[1])["total_mensagens"] == 2
+
+
+def test_log_do_indice_compacta(tmp_path: Path) -> None:
+    indice = IndiceConversas(tmp_path)
+    for versao in range(150):
+        for conversa_id in ("a", "b", "c"):
+            indice.atualizar(_resumo(conversa_id, f"2024-01-01T00:00:{versao:03d}"))
+    indice.remover("b")
+
+    assert _linhas(indice) < 2 * 3 + 100
+    assert [entrada["id"] for entrada in indice.listar()] == ["c", "a"]
+    assert indice.obter("a")["atualizado_em"] == "2024-01-01T00:00:149"
+    # outra instância (outro processo) relê o arquivo compactado do início
+    assert IndiceConversas(tmp_path).listar() == indice.listar()
+
+
+def test_indice_compartilhado_entre_instancias(tmp_path: Path) -> None:
+    primeira, segunda = IndiceConversas(tmp_path), IndiceConversas(tmp_path)
+    primeira.atualizar(_resumo("a", "2024-01-01"))
+    segunda.atualizar(_resumo("b", "2024-01-02"))
+    segunda.remover("a")
+    assert [entrada["id"] for entrada in primeira.listar()] == ["b"]
+    assert primeira.total() == segunda.total() == 1
+
+
+def _anexar_varias(base_dir: str, prefixo: str, total: int, largada) -> None:
+    indice = IndiceConversas(Path(base_dir))
+    largada.wait()
+    for numero in range(total):
+        # cada entrada é gravada três vezes: o log cresce mais rápido que o índice e compacta
+        for dia in (1, 2, 3):
+            indice.atualizar(_resumo(f"{prefixo}{numero}", f"2024-01-0{dia}T{numero:05d}"))
+
+
+def test_compactacao_entre_processos_nao_perde_linhas(tmp_path: Path) -> None:
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("sem fork neste sistema")
+    contexto = multiprocessing.get_context("fork")
+    largada = contexto.Event()
+    processos = [
+        contexto.Process(target=_anexar_varias, args=(str(tmp_path), prefixo, 300, largada))
+        for prefixo in ("p", "q")
+    ]
+    for processo in processos:
+        processo.start()
+    largada.set()
+    for processo in processos:
+        processo.join(timeout=60)
+        assert processo.exitcode == 0
+    assert IndiceConversas(tmp_path).total() == 600
+
+
+def test_cursor_desatualizado(tmp_path: Path) -> None:
+    servico = ConversasService(str(tmp_path))
+    ids = _criar(servico, 6)
+    pagina = servico.listar(limite=2)
+    assert [item.id for item in pagina.itens] == ids[:2]
+
+    # a conversa do cursor é atualizada (vai para o topo) e a seguinte é removida
+    servico.registrar(
+        [
+            MensagemChat(papel="usuario", conteudo="pedido 4"),
+            MensagemChat(papel="agente", conteudo="ok"),
+            MensagemChat(papel="usuario", conteudo="mais"),
+        ],
+        "ok",
+        ids[1],
+    )
+    servico.remover(ids[2])
+
+    # o cursor guarda a chave antiga: a paginação segue dali, sem repetir nem falhar
+    seguinte = servico.listar(limite=2, cursor=pagina.proximo_cursor)
+    assert [item.id for item in seguinte.itens] == ids[3:5]
+    ultima = servico.listar(limite=2, cursor=seguinte.proximo_cursor)
+    assert [item.id for item in ultima.itens] == ids[5:]
+    assert ultima.proximo_cursor is None
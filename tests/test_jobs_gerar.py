@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from app.core.errors import ErroLLM
+from app.core.settings import Settings
+from app.schemas.gerar import JobGerar, RequisicaoGerar
+from app.services import jobs_gerar
+from app.services.jobs_gerar import FilaGerar
+
+
+class AgenteFalso:
+    """Substitui o AgenteDev: `objetivo` decide o desfecho da geração."""
+
+    async def gerar_projeto(self, objetivo: str, progresso, **_: object):
+        if objetivo.startswith("falha"):
+            raise ErroLLM("provedor indisponível")
+        if objetivo.startswith("quebra"):
+            raise RuntimeError("inesperado")
+        progresso("gerando", 1, 1)
+        return {"arquivos": ["index.html"]}, ["/tmp/index.html"], None
+
+
+@pytest.fixture(autouse=True)
+def _agente_falso(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(jobs_gerar, "AgenteDev", AgenteFalso)
+
+
+def _fila(tmp_path: Path, **campos: object) -> FilaGerar:
+    return FilaGerar(Settings(gerar_jobs_dir=str(tmp_path), gerar_jobs_workers=1, **campos))
+
+
+async def _aguardar(fila: FilaGerar, job_id: str) -> JobGerar:
+    for _ in range(500):
+        job = await fila.obter(job_id)
+        if job is not None and job.estado in ("concluido", "falhou"):
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"job {job_id} não terminou")
+
+
+def _rodar(tmp_path: Path, cenario, **campos: object):
+    async def principal():
+        fila = _fila(tmp_path, **campos)
+        await fila.iniciar()
+        try:
+            return await cenario(fila)
+        finally:
+            await fila.parar()
+
+    return asyncio.run(principal())
+
+
+def test_job_concluido(tmp_path: Path) -> None:
+    async def cenario(fila: FilaGerar) -> JobGerar:
+        job = await fila.submeter(RequisicaoGerar(objetivo="site de receitas"))
+        assert job.estado == "na_fila"
+        return await _aguardar(fila, job.id)
+
+    job = _rodar(tmp_path, cenario)
+    assert job.estado == "concluido"
+    assert job.resultado is not None and job.resultado.arquivos == ["/tmp/index.html"]
+    assert job.progresso.etapa == "fim"
+    salvo = JobGerar.model_validate_json((tmp_path / f"{job.id}.json").read_text("utf-8"))
+    assert salvo.estado == "concluido"
+
+
+@pytest.mark.parametrize(
+    ("objetivo", "erro"),
+    [("falha no provedor", "provedor indisponível"), ("quebra geral", "RuntimeError: inesperado")],
+)
+def test_job_falhou(tmp_path: Path, objetivo: str, erro: str) -> None:
+    async def cenario(fila: FilaGerar) -> JobGerar:
+        job = await fila.submeter(RequisicaoGerar(objetivo=objetivo))
+        return await _aguardar(fila, job.id)
+
+    job = _rodar(tmp_path, cenario)
+    assert job.estado == "falhou"
+    assert job.erro == erro
+
+
+def test_erro_ao_persistir_nao_derruba_o_worker(tmp_path: Path, monkeypatch) -> None:
+    salvar = FilaGerar._salvar
+    falhas = []
+
+    def salvar_com_falha(self: FilaGerar, job: JobGerar) -> None:
+        if job.requisicao.objetivo.startswith("disco") and job.estado == "concluido":
+            falhas.append(job.id)
+            raise OSError(28, "No space left on device")
+        salvar(self, job)
+
+    monkeypatch.setattr(FilaGerar, "_salvar", salvar_com_falha)
+
+    async def cenario(fila: FilaGerar) -> JobGerar:
+        await fila.submeter(RequisicaoGerar(objetivo="disco cheio"))
+        job = await fila.submeter(RequisicaoGerar(objetivo="site de receitas"))
+        return await _aguardar(fila, job.id)
+
+    # com um único worker, o segundo job só termina se o worker sobreviveu ao primeiro
+    assert _rodar(tmp_path, cenario).estado == "concluido"
+    assert len(falhas) == 1
+
+
+def _gravar(diretorio: Path, estado: str, job_id: str | None = None) -> JobGerar:
+    agora = datetime.now(timezone.utc)
+    job = JobGerar(
+        id=job_id or f"job-{estado}",
+        estado=estado,
+        requisicao=RequisicaoGerar(objetivo="site de receitas"),
+        criado_em=agora,
+        atualizado_em=agora,
+    )
+    (diretorio / f"{job.id}.json").write_text(job.model_dump_json(), encoding="utf-8")
+    return job
+
+
+def test_reinicio_recupera_os_jobs(tmp_path: Path) -> None:
+    na_fila = _gravar(tmp_path, "na_fila")
+    executando = _gravar(tmp_path, "executando")
+
+    async def cenario(fila: FilaGerar) -> tuple[JobGerar, JobGerar | None]:
+        return await _aguardar(fila, na_fila.id), await fila.obter(executando.id)
+
+    retomado, interrompido = _rodar(tmp_path, cenario)
+    assert retomado.estado == "concluido"
+    assert interrompido is not None and interrompido.estado == "falhou"
+    assert "reinício" in (interrompido.erro or "")
+
+
+def test_jobs_encerrados_antigos_sao_apagados(tmp_path: Path) -> None:
+    antigo = time.time() - 3600
+    for estado in ("concluido", "falhou", "na_fila"):
+        caminho = tmp_path / f"{_gravar(tmp_path, estado).id}.json"
+        os.utime(caminho, (antigo, antigo))
+    _gravar(tmp_path, "concluido", "job-recente")
+
+    async def cenario(fila: FilaGerar) -> int:
+        await _aguardar(fila, "job-na_fila")
+        return await asyncio.to_thread(fila._limpar)
+
+    # o job antigo que estava na fila é retomado, não apagado
+    assert _rodar(tmp_path, cenario, gerar_jobs_retencao_segundos=60) == 0
+    restantes = sorted(caminho.name for caminho in tmp_path.glob("*.json"))
+    assert restantes == ["job-na_fila.json", "job-recente.json"]
@@ -0,0 +1,75 @@
+import json
+import random
+
+import pytest
+
+from app.utils.json_stream import ExtratorArquivosJSON
+
+DOCUMENTO = {
+    "mensagem": 'Olá "mundo" [x] {y}',
+    "slug_projeto": "meu-projeto",
+    "arquivos": [
+        {"caminho": "index.html", "conteudo": '<a href="x">{[]}</a>\\'},
+        {"caminho": "assets/script.js", "conteudo": "const a = {b: [1, 2]};\n"},
+    ],
+    "extra": [1, {"arquivos": [2]}],
+}
+
+
+def _alimentar_em_trechos(texto: str, tamanhos: list[int]) -> tuple[list[dict], dict | None]:
+    extrator = ExtratorArquivosJSON()
+    emitidos: list[dict] = []
+    pos = 0
+    for tamanho in tamanhos:
+        emitidos += extrator.alimentar(texto[pos : pos + tamanho])
+        pos += tamanho
+    emitidos += extrator.alimentar(texto[pos:])
+    return emitidos, extrator.finalizar()
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_documento_inteiro(indent: int | None) -> None:
+    texto = json.dumps(DOCUMENTO, ensure_ascii=False, indent=indent)
+    emitidos, restante = _alimentar_em_trechos(texto, [])
+    assert emitidos == DOCUMENTO["arquivos"]
+    assert restante == {**DOCUMENTO, "arquivos": []}
+
+
+def test_trechos_de_qualquer_tamanho() -> None:
+    texto = json.dumps(DOCUMENTO, ensure_ascii=False, indent=2)
+    aleatorio = random.Random(0)
+    for _ in range(200):
+        tamanhos = [aleatorio.randint(1, 9) for _ in range(len(texto))]
+        emitidos, restante = _alimentar_em_trechos(texto, tamanhos)
+        assert emitidos == DOCUMENTO["arquivos"]
+        assert restante == {**DOCUMENTO, "arquivos": []}
+
+
+def test_emite_cada_arquivo_assim_que_o_objeto_fecha() -> None:
+    texto = json.dumps(DOCUMENTO, ensure_ascii=False)
+    fim_primeiro = texto.index('{"caminho": "assets/script.js"')
+    extrator = ExtratorArquivosJSON()
+    assert extrator.alimentar(texto[:fim_primeiro]) == [DOCUMENTO["arquivos"][0]]
+    assert extrator.alimentar(texto[fim_primeiro:]) == [DOCUMENTO["arquivos"][1]]
+    # os itens emitidos não ficam no texto acumulado
+    assert "index.html" not in extrator.texto_restante
+
+
+def test_chave_dividida_entre_trechos() -> None:
+    texto = json.dumps(DOCUMENTO, ensure_ascii=False)
+    meio = texto.index('"arquivos"') + 4
+    emitidos, _ = _alimentar_em_trechos(texto, [meio])
+    assert emitidos == DOCUMENTO["arquivos"]
+
+
+def test_item_invalido_e_ignorado() -> None:
+    texto = '{"mensagem": "oi", "arquivos": [{"caminho": "a", "conteudo": x}, {"caminho": "b"}]}'
+    extrator = ExtratorArquivosJSON()
+    assert extrator.alimentar(texto) == [{"caminho": "b"}]
+
+
+@pytest.mark.parametrize("texto", ["texto livre { sem json", "", "[1, 2]"])
+def test_resposta_que_nao_e_objeto(texto: str) -> None:
+    extrator = ExtratorArquivosJSON()
+    assert extrator.alimentar(texto) == []
+    assert extrator.finalizar() is None
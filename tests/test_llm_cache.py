@@ -0,0 +1,124 @@
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.adapters import llm_cache
+from app.adapters.llm_cache import CacheLLM
+from app.main import app
+
+MENSAGENS = [{"role": "user", "content": "oi"}]
+
+
+def _chave(conteudo: str = "oi") -> str:
+    return CacheLLM.chave("fake", "modelo", 0.2, [{"role": "user", "content": conteudo}])
+
+
+def _envelhecer(caminho, segundos: float) -> None:
+    instante = time.time() - segundos
+    os.utime(caminho, (instante, instante))
+
+
+def test_chave_depende_do_conteudo_e_nao_da_ordem_das_chaves() -> None:
+    assert _chave() == CacheLLM.chave("FAKE", "modelo", 0.2, [{"content": "oi", "role": "user"}])
+    assert _chave() != _chave("olá")
+    assert _chave() != CacheLLM.chave("fake", "modelo", 0.7, MENSAGENS)
+
+
+def test_acerto_em_memoria(tmp_path) -> None:
+    cache = CacheLLM(tmp_path)
+    chave = _chave()
+    assert cache.obter_memoria(chave) is None
+    cache.guardar(chave, "resposta")
+    assert cache.obter_memoria(chave) == "resposta"
+    assert cache.estatisticas()["acertos_memoria"] == 1
+
+
+def test_memoria_descarta_o_menos_usado(tmp_path) -> None:
+    cache = CacheLLM(tmp_path, max_itens_memoria=2)
+    for conteudo in ("a", "b"):
+        cache.guardar(_chave(conteudo), conteudo)
+    cache.obter_memoria(_chave("a"))  # "b" passa a ser o menos usado
+    cache.guardar(_chave("c"), "c")
+    assert cache.obter_memoria(_chave("b")) is None
+    assert cache.obter_memoria(_chave("a")) == "a"
+    assert cache.estatisticas()["itens_memoria"] == 2
+
+
+def test_disco_promove_para_a_memoria(tmp_path) -> None:
+    CacheLLM(tmp_path).guardar(_chave(), "resposta")
+
+    # outro processo: memória vazia, mesmo diretório
+    cache = CacheLLM(tmp_path)
+    assert cache.obter_memoria(_chave()) is None
+    assert cache.obter_disco(_chave()) == "resposta"
+    assert cache.obter_memoria(_chave()) == "resposta"
+    assert cache.obter_disco(_chave("outra")) is None
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["acertos_disco"], estatisticas["acertos_memoria"]) == (1, 1)
+    assert (estatisticas["falhas"], estatisticas["itens_memoria"]) == (1, 1)
+
+
+def test_ttl_expira_memoria_e_disco(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = CacheLLM(tmp_path, ttl_segundos=60)
+    cache.guardar(_chave(), "resposta")
+    caminho = cache._caminho(_chave())
+    assert caminho.exists()
+
+    agora = time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: agora + 61)
+    assert cache.obter_memoria(_chave()) is None
+    assert cache.obter_disco(_chave()) is None
+    assert not caminho.exists()
+    assert cache.estatisticas()["bytes_disco"] == 0
+
+
+def test_entrada_corrompida_conta_como_falha(tmp_path) -> None:
+    cache = CacheLLM(tmp_path)
+    caminho = cache._caminho(_chave())
+    caminho.parent.mkdir(parents=True)
+    caminho.write_text("{não é json", encoding="utf-8")
+    assert cache.obter_disco(_chave()) is None
+    assert not caminho.exists()
+    assert cache.estatisticas()["falhas"] == 1
+
+
+def test_poda_remove_os_menos_usados(tmp_path) -> None:
+    texto = "x" * 1000
+    cache = CacheLLM(tmp_path, max_bytes_disco=3500)
+    for indice, conteudo in enumerate(("a", "b", "c")):
+        cache.guardar(_chave(conteudo), texto)
+        _envelhecer(cache._caminho(_chave(conteudo)), 100 - indice * 10)
+    cache.obter_disco(_chave("a"))  # o uso atualiza o mtime: "b" vira o mais antigo
+
+    cache.guardar(_chave("d"), texto)  # passa do limite
+    restantes = {conteudo for conteudo in "abcd" if cache._caminho(_chave(conteudo)).exists()}
+    assert restantes == {"a", "c", "d"}
+    assert cache.estatisticas()["bytes_disco"] <= 3500 * 0.9
+    assert cache.estatisticas()["bytes_disco"] == sum(
+        cache._caminho(_chave(conteudo)).stat().st_size for conteudo in restantes
+    )
+
+
+def test_sem_disco_fica_so_em_memoria(tmp_path) -> None:
+    cache = CacheLLM(tmp_path, max_bytes_disco=0)
+    cache.guardar(_chave(), "resposta")
+    assert cache.obter_memoria(_chave()) == "resposta"
+    assert not any(tmp_path.iterdir())
+
+
+def test_saude_mostra_os_contadores(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = CacheLLM(tmp_path)
+    monkeypatch.setattr(llm_cache, "_cache", cache)
+    monkeypatch.setattr(llm_cache, "_cache_iniciado", True)
+    cache.guardar(_chave(), "resposta")
+    cache.obter_memoria(_chave())
+    cache.obter_disco(_chave("outra"))
+
+    with TestClient(app) as cliente:
+        dados = cliente.get("/saude").json()
+    assert dados["cache_llm"] == cache.estatisticas()
+    assert dados["cache_llm"]["acertos_memoria"] == 1
+    assert dados["cache_llm"]["falhas"] == 1
+    assert dados["cache_llm"]["bytes_disco"] > 0
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from app.adapters import llm_client
+from app.adapters.llm_client import LLMClient, _HistoricoLatencias
+from app.adapters.llm_fake import TransporteLLMFake
+from app.core.admissao import controle_admissao
+from app.core.errors import ErroLLM
+from app.core.settings import Settings, settings
+
+MENSAGENS = [{"role": "system", "content": "Responda em JSON."}, {"role": "user", "content": "oi"}]
+
+
+class TransporteContado(TransporteLLMFake):
+    """Provedor fake que conta as requisições recebidas."""
+
+    def __init__(self, **campos: object) -> None:
+        super().__init__(Settings(**campos))
+        self.chamadas = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.chamadas += 1
+        return await super().handle_async_request(request)
+
+
+class TransporteRoteirizado(TransporteContado):
+    """
+    Fake com roteiro por chamada: as `limitadas` primeiras respondem 429 com `retry_after`
+    e a chamada i espera `latencias[i]` segundos. Registra cancelamentos e vagas em uso.
+    """
+
+    def __init__(
+        self, latencias: tuple[float, ...] = (), limitadas: int = 0, retry_after: str = "0"
+    ) -> None:
+        super().__init__()
+        self.latencias = latencias
+        self.limitadas = limitadas
+        self.retry_after = retry_after
+        self.canceladas = 0
+        self.vagas_em_uso: list[int] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        indice = self.chamadas
+        self.chamadas += 1
+        self.vagas_em_uso.append(controle_admissao.resumo()["em_execucao"])
+        if indice < self.limitadas:
+            return httpx.Response(429, headers={"Retry-After": self.retry_after})
+        try:
+            if indice < len(self.latencias):
+                await asyncio.sleep(self.latencias[indice])
+            return await TransporteLLMFake.handle_async_request(self, request)
+        except asyncio.CancelledError:
+            self.canceladas += 1
+            raise
+
+
+@pytest.fixture
+def hedging(monkeypatch: pytest.MonkeyPatch) -> _HistoricoLatencias:
+    """Liga o hedging com um histórico de latências vazio (atraso padrão de 50 ms)."""
+    historico = _HistoricoLatencias()
+    monkeypatch.setattr(llm_client, "_latencias", historico)
+    monkeypatch.setattr(settings, "llm_hedging", True)
+    monkeypatch.setattr(settings, "llm_hedging_atraso_padrao", 0.05)
+    return historico
+
+
+def _executar(transporte: TransporteContado, chamada):
+    async def cenario():
+        async with httpx.AsyncClient(transport=transporte) as client:
+            return await chamada(LLMClient(client))
+
+    return asyncio.run(cenario())
+
+
+def test_resposta_deterministica() -> None:
+    primeira = _executar(TransporteContado(), lambda llm: llm.chat(MENSAGENS))
+    segunda = _executar(TransporteContado(), lambda llm: llm.chat(MENSAGENS))
+    assert primeira == segunda
+
+
+def test_falha_5xx_repete_ate_esgotar() -> None:
+    transporte = TransporteContado(llm_fake_taxa_5xx=1.0)
+    with pytest.raises(ErroLLM) as erro:
+        _executar(transporte, lambda llm: llm.chat(MENSAGENS))
+    assert erro.value.status_code == 502
+    assert erro.value.tentativas_esgotadas
+    assert transporte.chamadas == settings.llm_tentativas
+
+
+def test_chamadas_identicas_simultaneas_dividem_uma_requisicao() -> None:
+    transporte = TransporteContado()
+
+    async def varias(llm: LLMClient) -> list[str]:
+        return await asyncio.gather(*[llm.chat(MENSAGENS) for _ in range(5)])
+
+    respostas = _executar(transporte, varias)
+    assert len(set(respostas)) == 1
+    assert transporte.chamadas == 1
+
+
+def test_streaming_entrega_o_mesmo_texto() -> None:
+    async def em_trechos(llm: LLMClient) -> list[str]:
+        return [trecho async for trecho in llm.chat_stream(MENSAGENS)]
+
+    trechos = _executar(TransporteContado(llm_fake_trecho_caracteres=16), em_trechos)
+    assert len(trechos) > 1
+    assert "".join(trechos) == _executar(TransporteContado(), lambda llm: llm.chat(MENSAGENS))
+
+
+def test_429_respeita_retry_after(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "llm_backoff_base", 5.0)  # o backoff sozinho esperaria mais
+    transporte = TransporteRoteirizado(limitadas=1, retry_after="0.2")
+    inicio = time.perf_counter()
+    _executar(transporte, lambda llm: llm.chat(MENSAGENS, usar_cache=False))
+    assert 0.2 <= time.perf_counter() - inicio < 1.0
+    assert transporte.chamadas == 2
+
+
+def test_retry_after_limitado_pelo_backoff_maximo(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "llm_backoff_maximo", 0.05)
+    transporte = TransporteRoteirizado(limitadas=2, retry_after="3600")
+    inicio = time.perf_counter()
+    _executar(transporte, lambda llm: llm.chat(MENSAGENS, usar_cache=False))
+    assert time.perf_counter() - inicio < 1.0
+    assert transporte.chamadas == 3
+
+
+def test_retry_after_como_data_http() -> None:
+    data = formatdate(time.time() + 30, usegmt=True)
+    resposta = httpx.Response(429, headers={"Retry-After": data})
+    assert 25 < llm_client._tempo_retry_after(resposta) <= 30
+    assert llm_client._tempo_retry_after(httpx.Response(429, headers={"Retry-After": "x"})) is None
+
+
+def test_hedge_disparado_no_p95_e_perdedora_cancelada(hedging: _HistoricoLatencias) -> None:
+    for _ in range(20):
+        hedging.registrar(0.05)
+    hedging.registrar(0.06)
+    assert hedging.p95() == 0.05
+    transporte = TransporteRoteirizado(latencias=(5.0, 0.0))
+
+    async def hedge(llm: LLMClient) -> str:
+        inicio = time.perf_counter()
+        texto = await llm.chat(MENSAGENS, usar_cache=False)
+        assert time.perf_counter() - inicio < 1.0
+        await asyncio.sleep(0.01)  # deixa o cancelamento da original chegar ao transporte
+        return texto
+
+    assert _executar(transporte, hedge)
+    assert transporte.chamadas == 2
+    assert transporte.canceladas == 1
+    # original e hedge ocupam uma vaga cada; ao fim, as duas foram devolvidas
+    assert transporte.vagas_em_uso == [1, 2]
+    assert controle_admissao.resumo()["em_execucao"] == 0
+
+
+def test_hedge_nao_disparado_sem_vaga_livre(
+    hedging: _HistoricoLatencias, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "admissao_max_concorrencia", 1)
+    transporte = TransporteRoteirizado(latencias=(0.2,))
+    _executar(transporte, lambda llm: llm.chat(MENSAGENS, usar_cache=False))
+    assert transporte.chamadas == 1
+    assert transporte.canceladas == 0
+
+
+def test_hedge_nao_disparado_quando_a_original_e_rapida(hedging: _HistoricoLatencias) -> None:
+    transporte = TransporteRoteirizado()
+    _executar(transporte, lambda llm: llm.chat(MENSAGENS, usar_cache=False))
+    assert transporte.chamadas == 1
@@ -0,0 +1,123 @@
+import io
+import logging
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from loguru import logger
+
+from app.core.logging_config import (
+    MiddlewareContextoLog,
+    _Amostragem,
+    _regras_amostragem,
+    configurar_logging,
+    vincular_contexto,
+)
+from app.core.settings import Settings
+
+CAMPOS = {"time", "level", "message", "name", "function", "line", "extra"}
+
+
+@pytest.fixture
+def saida():
+    """Logs em JSON, síncronos, gravados num buffer; devolve `linhas()`."""
+    buffer = io.BytesIO()
+    # httpx=0 descarta os logs das requisições do próprio TestClient
+    cfg = Settings(log_formato="json", log_assincrono=False, log_amostragem="httpx=0")
+    configurar_logging(cfg, destino=buffer)
+
+    def linhas() -> list[dict]:
+        return [orjson.loads(linha) for linha in buffer.getvalue().splitlines()]
+
+    yield linhas
+    logger.remove()
+
+
+def _cliente() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/conversa")
+    async def conversa() -> dict:
+        vincular_contexto(conversa_id="c1")
+        logger.info("dentro da rota")
+        return {"ok": True}
+
+    @app.get("/falha")
+    async def falha() -> None:
+        raise RuntimeError("quebrou")
+
+    app.add_middleware(MiddlewareContextoLog)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_linha_json_tem_o_formato_esperado(saida) -> None:
+    try:
+        raise ValueError("ruim")
+    except ValueError:
+        logger.bind(job_id="j1").exception("deu erro")
+    [linha] = saida()
+    assert set(linha) == CAMPOS | {"exception"}
+    assert (linha["level"], linha["message"]) == ("ERROR", "deu erro")
+    assert linha["name"] == __name__
+    assert linha["function"] == "test_linha_json_tem_o_formato_esperado"
+    assert linha["extra"] == {"job_id": "j1"}
+    assert "ValueError: ruim" in linha["exception"]
+
+
+def test_middleware_vincula_request_id_e_latencia(saida) -> None:
+    resposta = _cliente().get("/conversa", headers={"X-Request-ID": "req-123"})
+    assert resposta.headers["x-request-id"] == "req-123"
+
+    rota, acesso = saida()
+    assert set(rota) == CAMPOS
+    assert rota["message"] == "dentro da rota"
+    assert rota["extra"] == {"request_id": "req-123", "conversa_id": "c1"}
+    assert acesso["level"] == "INFO"
+    assert acesso["message"].startswith("GET /conversa 200 ")
+    extra = acesso["extra"]
+    assert extra["request_id"] == "req-123"
+    assert extra["conversa_id"] == "c1"
+    assert (extra["metodo"], extra["rota"], extra["status"]) == ("GET", "/conversa", 200)
+    assert isinstance(extra["latencia_ms"], float) and extra["latencia_ms"] >= 0
+
+
+def test_request_id_gerado_e_contexto_isolado(saida) -> None:
+    cliente = _cliente()
+    primeira = cliente.get("/conversa").headers["x-request-id"]
+    segunda = cliente.get("/conversa").headers["x-request-id"]
+    assert len(primeira) == 32 and primeira != segunda
+    ids = [linha["extra"]["request_id"] for linha in saida()]
+    assert ids == [primeira, primeira, segunda, segunda]
+
+    logger.info("fora de requisição")
+    assert saida()[-1]["extra"] == {}
+
+
+def test_erro_500_sai_como_warning(saida) -> None:
+    assert _cliente().get("/falha").status_code == 500
+    acesso = [linha for linha in saida() if linha["message"].startswith("GET /falha")]
+    assert [linha["level"] for linha in acesso] == ["WARNING"]
+    assert acesso[0]["extra"]["status"] == 500
+
+
+def test_logging_padrao_redirecionado(saida) -> None:
+    logging.getLogger("uvicorn.error").info("servidor no ar")
+    logging.getLogger("httpx").info("descartado pela amostragem")
+    logging.getLogger("httpx").warning("mantido")
+    assert [(linha["level"], linha["message"]) for linha in saida()] == [
+        ("INFO", "servidor no ar"),
+        ("WARNING", "mantido"),
+    ]
+
+
+def test_regras_de_amostragem() -> None:
+    regras = _regras_amostragem("httpx=0, app.adapters=0.5,ruim=x,sem_valor, =1,uvicorn=7")
+    assert regras == {"httpx": 0.0, "app.adapters": 0.5, "uvicorn": 1.0}
+
+    amostragem = _Amostragem(regras)
+    assert amostragem.taxa("httpx._client") == 0.0  # vale o prefixo mais longo
+    assert amostragem.taxa("app.adapters.llm_client") == 0.5
+    assert amostragem.taxa("app.api") == 1.0
+    assert not amostragem.manter("httpx._client", logging.INFO)
+    assert amostragem.manter("httpx._client", logging.WARNING)  # WARNING nunca é descartado
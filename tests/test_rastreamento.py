@@ -0,0 +1,140 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.rastreamento import (
+    MiddlewareRastreamento,
+    cabecalhos_propagacao,
+    rastreador,
+    span_atual,
+)
+from app.core.settings import Settings
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PAI_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def rastreamento(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Liga o rastreador global exportando para um arquivo; devolve `ativar(amostragem)`."""
+    arquivo = tmp_path / "traces.jsonl"
+
+    def ativar(amostragem: float = 1.0):
+        cfg = Settings(
+            rastreamento_ativo=True,
+            rastreamento_amostragem=amostragem,
+            rastreamento_arquivo=str(arquivo),
+            rastreamento_servico="testes",
+        )
+        monkeypatch.setattr(rastreador, "settings", cfg)
+        monkeypatch.setattr(rastreador, "ativo", True)
+        return arquivo
+
+    yield ativar
+    rastreador.parar()
+
+
+def _spans(arquivo) -> list[dict]:
+    """Spans exportados (depois de `parar`, que esvazia a fila de exportação)."""
+    rastreador.parar()
+    if not arquivo.exists():
+        return []
+    spans = []
+    for linha in arquivo.read_text(encoding="utf-8").splitlines():
+        for recurso in json.loads(linha)["resourceSpans"]:
+            servico = recurso["resource"]["attributes"][0]["value"]["stringValue"]
+            assert servico == "testes"
+            for escopo in recurso["scopeSpans"]:
+                spans.extend(escopo["spans"])
+    return spans
+
+
+def _atributos(span: dict) -> dict:
+    return {item["key"]: next(iter(item["value"].values())) for item in span["attributes"]}
+
+
+def _cliente() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/eco")
+    async def eco() -> dict:
+        # o que uma chamada HTTP de saída feita aqui levaria no `traceparent`
+        return {**cabecalhos_propagacao(), "span_id": span_atual().span_id}
+
+    app.add_middleware(MiddlewareRastreamento)
+    return TestClient(app)
+
+
+def test_traceparent_recebido_e_propagado(rastreamento) -> None:
+    arquivo = rastreamento()
+    resposta = _cliente().get("/eco", headers={"traceparent": f"00-{TRACE_ID}-{PAI_ID}-01"})
+    corpo = resposta.json()
+
+    assert corpo["traceparent"] == f"00-{TRACE_ID}-{corpo['span_id']}-01"
+    assert resposta.headers["traceparent"] == corpo["traceparent"]
+    [span] = _spans(arquivo)
+    assert (span["traceId"], span["spanId"]) == (TRACE_ID, corpo["span_id"])
+    assert span["parentSpanId"] == PAI_ID
+    assert span["name"] == "GET /eco"
+    assert span["kind"] == 2  # SERVER
+    assert _atributos(span)["http.status_code"] == "200"
+    assert span["status"] == {"code": 1}
+
+
+def test_traceparent_invalido_abre_trace_novo(rastreamento) -> None:
+    arquivo = rastreamento()
+    resposta = _cliente().get("/eco", headers={"traceparent": f"00-{'0' * 32}-{PAI_ID}-01"})
+    [span] = _spans(arquivo)
+    assert span["traceId"] != "0" * 32
+    assert "parentSpanId" not in span
+    assert resposta.headers["traceparent"].startswith(f"00-{span['traceId']}-")
+    assert rastreador.extrair("lixo") is None
+
+
+def test_amostragem_na_raiz(rastreamento) -> None:
+    arquivo = rastreamento(amostragem=0.0)
+    cliente = _cliente()
+    resposta = cliente.get("/eco")
+    # fora da amostra: ids para propagação, mas nada exportado
+    assert resposta.headers["traceparent"].endswith("-00")
+    assert _spans(arquivo) == []
+
+    # quem chama decidiu amostrar: o trace segue a decisão do pai
+    cliente.get("/eco", headers={"traceparent": f"00-{TRACE_ID}-{PAI_ID}-01"})
+    assert [span["traceId"] for span in _spans(arquivo)] == [TRACE_ID]
+
+
+def test_pai_fora_da_amostra_nao_e_exportado(rastreamento) -> None:
+    arquivo = rastreamento(amostragem=1.0)
+    resposta = _cliente().get("/eco", headers={"traceparent": f"00-{TRACE_ID}-{PAI_ID}-00"})
+    assert resposta.headers["traceparent"].endswith("-00")
+    assert _spans(arquivo) == []
+
+
+def test_exportador_grava_spans_filhos_e_erros(rastreamento) -> None:
+    arquivo = rastreamento()
+    with rastreador.span("pai", atributo=1) as pai:
+        with pytest.raises(ValueError):
+            with rastreador.span("filho", "CLIENT", ok=True):
+                raise ValueError("quebrou")
+    assert span_atual() is None
+
+    filho, raiz = _spans(arquivo)
+    assert (filho["name"], raiz["name"]) == ("filho", "pai")
+    assert filho["traceId"] == raiz["traceId"] == pai.trace_id
+    assert filho["parentSpanId"] == raiz["spanId"]
+    assert filho["kind"] == 3
+    assert filho["status"] == {"code": 2, "message": "ValueError: quebrou"}
+    assert filho["attributes"] == [{"key": "ok", "value": {"boolValue": True}}]
+    assert raiz["attributes"] == [{"key": "atributo", "value": {"intValue": "1"}}]
+    assert int(raiz["endTimeUnixNano"]) >= int(filho["endTimeUnixNano"])
+
+
+def test_desligado_nao_cria_spans(tmp_path) -> None:
+    assert not rastreador.ativo
+    with rastreador.span("nada") as span:
+        span.definir("ignorado", 1)
+        assert span_atual() is None
+        assert cabecalhos_propagacao() == {}